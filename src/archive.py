@@ -0,0 +1,296 @@
+"""
+QuickMed Calc - Retention and Archival
+Moves old patient_notes rows into compressed monthly archive databases.
+
+Rows older than the retention period are copied, a chunk at a time, into
+<archive dir>/notes-YYYY-MM.db (UTC month of ts_epoch) and deleted from the
+live database. Free-text columns are stored zlib-compressed; the score,
+category and timestamp columns stay plain so archives can still be filtered
+and aggregated. Each chunk is a short transaction, and the live file is then
+shrunk with small incremental-vacuum steps, so the GUI can run retention on
+its persistence worker without stalling inserts.
+
+History can span the live file and the archives: query_history_all()
+attaches the monthly partitions one at a time, newest first.
+
+    python src/archive.py --retention-days 365 [--db quickmed_data.db] [--compact]
+
+The copy is written and committed before the live rows are deleted, and
+archive rows keep their original id, so an interrupted run is simply
+repeated (INSERT OR REPLACE) without losing or duplicating rows.
+"""
+
+import argparse
+import calendar
+import glob
+import os
+import sqlite3
+import sys
+import time
+import zlib
+
+import history
+import rollups
+import schema
+import storage
+
+ARCHIVE_DIR_NAME = 'quickmed_archive'
+PARTITION_PATTERN = 'notes-????-??.db'
+
+# Bumped if the archive layout or compression dictionary ever changes
+ARCHIVE_FORMAT = 1
+
+# Preset dictionary: the short, repetitive texts calculators save compress
+# poorly on their own. Never edit; archives depend on it (see ARCHIVE_FORMAT).
+_ZDICT = (
+    b'{"inputs":{"weight":,"height_cm":,"age":,"creatinine":,"gender":"male""female",'
+    b'"eye":,"verbal":,"motor":,"criteria":[0,1,],"scores":[,"dose_per_kg":,"frequency":},'
+    b'"outputs":{"value":,"category":"","recommendation":"","single_dose":,"daily_dose":}}'
+    b'Weight: kg, Height: cm, Age: SCr: mg/dL, x/day No criteria selected No risk factors '
+    b'BMI: | Category: Normal weight Overweight Obese Underweight BSA: m\xc2\xb2 (Mosteller formula)'
+    b'CrCl: mL/min (Mild decrease Moderate decrease Severe decrease Kidney failure Normal) '
+    b'GCS: /15 (E V M ) | Mild brain injury Moderate brain injury Severe brain injury '
+    b'Wells Score: | Risk: Low (DVT unlikely) High (DVT likely - consider imaging) '
+    b'APGAR Score: /10 | Status: Moderately depressed Severely depressed '
+    b'Single dose: mg, Daily: mg CHADS\xe2\x82\x82 Score: | Risk: Low-Moderate (% annual stroke risk) '
+    b'Aspirin or no therapy Aspirin or anticoagulation Anticoagulation recommended strongly'
+)
+
+_WBITS = 11
+
+# Columns stored compressed in the archives
+COMPRESSED_COLUMNS = ('patient_info', 'calculation_result', 'notes', 'payload')
+
+ARCHIVE_COLUMNS = ('id', 'timestamp', 'ts_epoch', 'calculator_type', 'patient_info',
+                   'calculation_result', 'notes', 'score', 'category', 'payload')
+
+# HISTORY_COLUMNS as read from an attached partition
+ARCHIVE_HISTORY_COLUMNS = ('id, ts_epoch, timestamp, calculator_type, unzip_text(patient_info), '
+                           'unzip_text(calculation_result), unzip_text(notes)')
+
+# Pages freed per incremental-vacuum step (4 KiB pages: 1 MiB)
+VACUUM_STEP_PAGES = 256
+
+DAY_SECONDS = 24 * 60 * 60
+
+
+def zip_text(text):
+    """Compressed BLOB for a text value, or the text itself when that is smaller"""
+    if text is None:
+        return None
+    raw = text.encode('utf-8')
+    # A 2 KiB window holds the dictionary and keeps per-call setup cheap
+    compressor = zlib.compressobj(9, zlib.DEFLATED, _WBITS, 2, zdict=_ZDICT)
+    packed = compressor.compress(raw) + compressor.flush()
+    return packed if len(packed) < len(raw) else text
+
+
+def unzip_text(value):
+    """Inverse of zip_text (also registered as the SQL function unzip_text)"""
+    if isinstance(value, bytes):
+        decompressor = zlib.decompressobj(_WBITS, zdict=_ZDICT)
+        return (decompressor.decompress(value) + decompressor.flush()).decode('utf-8')
+    return value
+
+
+def register_functions(conn):
+    """Make unzip_text() available in SQL on this connection"""
+    conn.create_function('unzip_text', 1, unzip_text)
+
+
+def default_archive_dir(db_path):
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), ARCHIVE_DIR_NAME)
+
+
+def partition_name(ts_epoch):
+    return time.strftime('notes-%Y-%m.db', time.gmtime(ts_epoch))
+
+
+def partition_bounds(path):
+    """(first, end) epoch seconds of the UTC month a partition file covers"""
+    year, month = map(int, os.path.basename(path)[len('notes-'):-len('.db')].split('-'))
+    first = calendar.timegm((year, month, 1, 0, 0, 0))
+    year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return first, calendar.timegm((year, month, 1, 0, 0, 0))
+
+
+def list_partitions(archive_dir):
+    """Partition files, newest month first"""
+    return sorted(glob.glob(os.path.join(archive_dir, PARTITION_PATTERN)), reverse=True)
+
+
+def _open_partition(path):
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS patient_notes (
+            id INTEGER PRIMARY KEY,
+            timestamp TEXT,
+            ts_epoch INTEGER,
+            calculator_type TEXT,
+            patient_info,
+            calculation_result,
+            notes,
+            score REAL,
+            category TEXT,
+            payload
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_notes_ts ON patient_notes (ts_epoch, id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_notes_type_ts ON patient_notes (calculator_type, ts_epoch, id)')
+    conn.execute(f'PRAGMA user_version = {ARCHIVE_FORMAT}')
+    conn.commit()
+    return conn
+
+
+def _compress_row(row):
+    return tuple(zip_text(value) if column in COMPRESSED_COLUMNS else value
+                 for column, value in zip(ARCHIVE_COLUMNS, row))
+
+
+def archive_chunk(conn, archive_dir, cutoff, chunk_size=500):
+    """
+    Move up to chunk_size of the oldest rows with ts_epoch < cutoff into the
+    archive; returns the number of rows moved (0 when done)
+    """
+    # Rows the rollups have not counted yet (rollups.backfill_step) stay live
+    rows = conn.execute(f'''
+        SELECT {", ".join(ARCHIVE_COLUMNS)} FROM patient_notes
+        WHERE ts_epoch < ?
+          AND (SELECT id <= done_id OR id > end_id FROM rollup_backfill)
+        ORDER BY ts_epoch, id LIMIT ?
+    ''', (cutoff, chunk_size)).fetchall()
+    if not rows:
+        return 0
+
+    by_partition = {}
+    for row in rows:
+        by_partition.setdefault(partition_name(row[2]), []).append(_compress_row(row))
+
+    os.makedirs(archive_dir, exist_ok=True)
+    placeholders = ', '.join('?' * len(ARCHIVE_COLUMNS))
+    for name, partition_rows in by_partition.items():
+        partition = _open_partition(os.path.join(archive_dir, name))
+        try:
+            with partition:
+                partition.executemany(f'INSERT OR REPLACE INTO patient_notes VALUES ({placeholders})',
+                                      partition_rows)
+        finally:
+            partition.close()
+
+    # Only delete once every copy is committed
+    with conn:
+        conn.executemany('DELETE FROM patient_notes WHERE id = ?', [(row[0],) for row in rows])
+    return len(rows)
+
+
+def vacuum_step(conn, pages=VACUUM_STEP_PAGES):
+    """Return up to `pages` free pages to the file system; returns free pages left"""
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:  # not INCREMENTAL
+        return 0
+    # execute() would step the pragma once and free a single page
+    conn.executescript(f'PRAGMA incremental_vacuum({int(pages)})')
+    return conn.execute('PRAGMA freelist_count').fetchone()[0]
+
+
+def enable_incremental_vacuum(conn):
+    """
+    Switch an existing database to auto_vacuum=INCREMENTAL
+
+    Needs one full VACUUM (rewrites the file): run it from the command line
+    (--compact), not while the GUI is open. New databases are created in
+    this mode by storage.connect().
+    """
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+        return False
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    conn.execute('VACUUM')
+    return True
+
+
+def apply_retention(conn, archive_dir, retention_days, chunk_size=500, now=None, progress=None):
+    """Archive every row older than retention_days, then compact; returns rows moved"""
+    cutoff = int(time.time() if now is None else now) - retention_days * DAY_SECONDS
+    moved = 0
+    while True:
+        count = archive_chunk(conn, archive_dir, cutoff, chunk_size)
+        if not count:
+            break
+        moved += count
+        if progress is not None:
+            progress(moved)
+    while vacuum_step(conn):
+        pass
+    return moved
+
+
+def query_history_all(conn, archive_dir, calculator_type=None, start=None, end=None, cursor=None, limit=50):
+    """
+    history.query_history over the live table and then the archive partitions
+
+    Archived rows are older than every live row, and partitions are read
+    newest first, so the (ts_epoch, id) cursor keeps working across sources.
+    """
+    need = limit + 1
+    rows = []
+
+    page = history.query_history(conn, calculator_type, start, end, cursor, need)
+    rows.extend(page.rows)
+
+    if len(rows) < need and os.path.isdir(archive_dir):
+        register_functions(conn)
+        for path in list_partitions(archive_dir):
+            first, last = partition_bounds(path)
+            if start is not None and last <= start or end is not None and first >= end:
+                continue
+            if cursor is not None and first > cursor[0]:
+                continue
+            if rows:
+                cursor = (rows[-1].ts_epoch, rows[-1].id)
+            conn.execute('ATTACH DATABASE ? AS archive_part', (path,))
+            try:
+                page = history.query_history(conn, calculator_type, start, end, cursor, need - len(rows),
+                                             source='archive_part.patient_notes',
+                                             columns=ARCHIVE_HISTORY_COLUMNS)
+            finally:
+                conn.execute('DETACH DATABASE archive_part')
+            rows.extend(page.rows)
+            if len(rows) >= need:
+                break
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = (rows[-1].ts_epoch, rows[-1].id)
+    return history.HistoryPage(rows, next_cursor)
+
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Archive old QuickMed Calc history")
+    parser.add_argument('--db', default=storage.DEFAULT_DB_PATH, help="database path")
+    parser.add_argument('--retention-days', type=int, required=True,
+                        help="keep this many days in the live database")
+    parser.add_argument('--archive-dir', help=f"default: {ARCHIVE_DIR_NAME}/ next to the database")
+    parser.add_argument('--compact', action='store_true',
+                        help="first switch the database to incremental vacuum (one full VACUUM)")
+    args = parser.parse_args(argv)
+
+    archive_dir = args.archive_dir or default_archive_dir(args.db)
+    conn = storage.connect(args.db)
+    schema.migrate(conn)
+    try:
+        # Count old history in the rollups before it leaves the live database
+        while rollups.backfill_step(conn):
+            pass
+        if args.compact and enable_incremental_vacuum(conn):
+            print("Database switched to incremental vacuum", file=sys.stderr)
+        moved = apply_retention(conn, archive_dir, args.retention_days,
+                                progress=lambda moved: print(f"\r{moved} rows archived", end='',
+                                                             file=sys.stderr, flush=True))
+    finally:
+        conn.close()
+    print(f"\r{moved} rows archived to {archive_dir}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
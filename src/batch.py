@@ -0,0 +1,151 @@
+"""
+QuickMed Calc - Vectorized Batch Scoring
+NumPy implementations of the continuous calculators (BMI, BSA and
+Cockcroft-Gault) for re-scoring whole ward or cohort extracts at once.
+
+Every function takes array-likes (lists, NumPy arrays, pandas Series, ...)
+and returns a BatchResult. Rows that the scalar engine would reject with
+ValueError are masked instead: their value is NaN, their category code is -1
+and `valid` is False. Valid rows use the same floating-point operations as
+engine.py, so they match the scalar path exactly.
+
+NumPy is an optional dependency: `pip install numpy`.
+"""
+
+from typing import NamedTuple
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+import engine
+
+INVALID = -1
+
+
+def _ascending(bands):
+    """Turn top-down engine bands into ascending (bounds, labels)"""
+    ordered = tuple(reversed(bands))
+    return tuple(lower for lower, _ in ordered), tuple(label for _, label in ordered)
+
+
+# Category codes index into these label tuples (lowest band first)
+_BMI_BOUNDS, BMI_LABELS = _ascending(engine.BMI_CATEGORIES)
+_CRCL_BOUNDS, CRCL_LABELS = _ascending(engine.CRCL_CATEGORIES)
+
+
+class BatchResult(NamedTuple):
+    """Vectorized result: float64 values, int8 category codes and a validity mask"""
+    values: "np.ndarray"
+    codes: "np.ndarray"
+    valid: "np.ndarray"
+
+
+def require_numpy():
+    """Raise a helpful ImportError when NumPy is not installed"""
+    if np is None:
+        raise ImportError("Batch scoring requires NumPy: pip install numpy")
+
+
+def _as_float(column):
+    """Convert a column to float64, turning missing or unparsable cells into NaN"""
+    try:
+        return np.asarray(column, dtype=np.float64)
+    except (TypeError, ValueError):
+        return np.array([_to_float(cell) for cell in column], dtype=np.float64)
+
+
+def _to_float(cell):
+    try:
+        return float(cell)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _positive(values):
+    return np.isfinite(values) & (values > 0)
+
+
+def _codes(values, valid, bounds):
+    codes = np.searchsorted(np.asarray(bounds, dtype=np.float64), values, side='right') - 1
+    return np.where(valid, codes, INVALID).astype(np.int8)
+
+
+def _result(values, valid, bounds=None):
+    values = np.where(valid, values, np.nan)
+    if bounds is None:
+        codes = np.where(valid, 0, INVALID).astype(np.int8)
+    else:
+        codes = _codes(values, valid, bounds)
+    return BatchResult(values, codes, valid)
+
+
+def decode(codes, labels):
+    """Map category codes back to labels (None for masked rows)"""
+    require_numpy()
+    lookup = np.array(tuple(labels) + (None,), dtype=object)
+    return lookup[np.asarray(codes)]
+
+
+def bmi_batch(weight, height_cm):
+    """BMI for every row; codes index into BMI_LABELS"""
+    require_numpy()
+    weight = _as_float(weight)
+    height_cm = _as_float(height_cm)
+    valid = _positive(weight) & _positive(height_cm)
+
+    with np.errstate(all='ignore'):
+        height = height_cm / 100
+        bmi = weight / (height * height)
+
+    return _result(bmi, valid, _BMI_BOUNDS)
+
+
+def bsa_batch(weight, height_cm):
+    """Mosteller BSA for every row; BSA has no categories, so codes are 0 or -1"""
+    require_numpy()
+    weight = _as_float(weight)
+    height_cm = _as_float(height_cm)
+    valid = _positive(weight) & _positive(height_cm)
+
+    with np.errstate(all='ignore'):
+        bsa = np.sqrt((weight * height_cm) / 3600)
+
+    return _result(bsa, valid)
+
+
+def _female_mask(sex):
+    """
+    Parse a sex column into (is_female, is_valid) boolean arrays
+
+    Strings must be exactly 'male' or 'female', as engine.calculate_creatinine
+    requires; 'Male' or ' female' is an invalid row.
+    """
+    sex = np.asarray(sex)
+    if sex.dtype == np.bool_:
+        return sex, np.ones(sex.shape, dtype=bool)
+    sex = sex.astype(str)
+    female = sex == "female"
+    return female, female | (sex == "male")
+
+
+def crcl_batch(age, weight, creatinine, sex):
+    """
+    Cockcroft-Gault creatinine clearance for every row; codes index into CRCL_LABELS
+
+    sex: 'male'/'female' strings, or booleans where True means female
+    """
+    require_numpy()
+    age = _as_float(age)
+    weight = _as_float(weight)
+    creatinine = _as_float(creatinine)
+    female, sex_valid = _female_mask(sex)
+    valid = ((age >= 0) & (age < 140) & _positive(weight) & _positive(creatinine)
+             & sex_valid)
+
+    with np.errstate(all='ignore'):
+        clcr = ((140 - age) * weight) / (72 * creatinine)
+        clcr = np.where(female, clcr * 0.85, clcr)
+
+    return _result(clcr, valid, _CRCL_BOUNDS)
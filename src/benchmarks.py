@@ -0,0 +1,341 @@
+"""
+QuickMed Calc - Benchmark Suite
+Reproducible timings for the engine, persistence and UI paths.
+
+    python src/benchmarks.py -o results.json
+    python src/benchmarks.py --compare baseline.json --threshold 0.25
+
+Every metric is written as {"value", "unit", "better", "samples"} under its
+dotted name, so two result files can be compared mechanically. Each section
+runs --repeat times and "value" is the median of the per-run "samples", so
+one slow run (a GC pause, a busy CI neighbour) does not move it. --compare
+exits non-zero when any median is worse than the baseline's by more than the
+threshold.
+
+The UI benchmarks need a display. Run them headless under Xvfb:
+
+    xvfb-run -a python src/benchmarks.py
+
+Without a display they are reported as skipped and the rest still runs.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+import registry
+import search_index
+import storage
+
+SECTIONS = ('engine', 'persistence', 'search', 'ui')
+
+# Runs per section; each metric reports the median of these
+DEFAULT_REPEAT = 3
+
+# Allowed relative regression of a median before --compare fails
+DEFAULT_THRESHOLD = 0.2
+
+# Typical inputs per calculator key, as typed into the form
+SAMPLE_INPUTS = {
+    'bmi': {'weight': '72.5', 'height_cm': '176'},
+    'bsa': {'weight': '72.5', 'height_cm': '176'},
+    'creatinine': {'age': '67', 'weight': '72.5', 'creatinine': '1.3', 'gender': 'female'},
+    'gcs': {'eye': 3, 'verbal': 4, 'motor': 6},
+    'wells': {'criteria': [1, 0, 0, 1, 0, 1, 0, 0, 0, 1]},
+    'apgar': {'scores': [2, 1, 2, 1, 2]},
+    'pediatric': {'weight': '14.2', 'dose_per_kg': '40', 'frequency': '3'},
+    'chads2': {'criteria': [1, 1, 0, 0, 1]},
+}
+
+# (synchronous, batch_size) combinations for the persistence benchmark
+PERSISTENCE_SETTINGS = (
+    ('OFF', 50),
+    ('NORMAL', 1),
+    ('NORMAL', 50),
+    ('FULL', 1),
+    ('FULL', 50),
+)
+
+CATALOG_SIZES = (8, 100, 1000, 5000)
+
+# Typed one keystroke at a time in the search benchmarks
+SEARCH_QUERIES = ('creatinine', 'wells dvt', 'apagr')
+
+_WORDS = ('acute', 'renal', 'cardiac', 'risk', 'score', 'index', 'pediatric', 'dose', 'sepsis',
+          'stroke', 'bleeding', 'liver', 'lung', 'clearance', 'pressure', 'fluid', 'trauma',
+          'neonatal', 'anion', 'gap', 'osmolality', 'sodium', 'deficit', 'ideal', 'weight')
+
+
+def _metric(value, unit, better):
+    return {'value': value, 'unit': unit, 'better': better}
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _best_rate(fn, number, repeat=3):
+    """Best calls per second of fn() over `repeat` runs of `number` calls"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return number / best
+
+
+def synthetic_catalog(size, seed=0):
+    """(key, name, synonyms) for `size` calculators: the real ones, then generated names"""
+    catalog = [(info.key, info.name, info.synonyms) for info in registry.default_registry()]
+    rng = random.Random(seed)
+    while len(catalog) < size:
+        words = rng.sample(_WORDS, 3)
+        catalog.append((f'synthetic{len(catalog)}', ' '.join(words).title(),
+                        (''.join(word[0] for word in words).upper(),)))
+    return catalog[:size]
+
+
+def bench_engine(quick=False):
+    """Scoring throughput per calculator, including input parsing"""
+    results = {}
+    number = 2000 if quick else 20000
+    calculators = registry.default_registry()
+    for info in calculators:
+        raw = SAMPLE_INPUTS.get(info.key)
+        if raw is None:
+            continue
+        spec = calculators.spec(info.key)
+        results[f'engine.{info.key}.calc_per_s'] = _metric(
+            _best_rate(lambda: spec.calculate(raw), number), 'calc/s', 'higher')
+
+    try:
+        import batch
+        batch.require_numpy()
+    except ImportError:
+        return results
+    import numpy as np
+    rows = 10000 if quick else 100000
+    rng = np.random.default_rng(0)
+    weight = rng.uniform(40, 120, rows)
+    height = rng.uniform(145, 200, rows)
+    rate = _best_rate(lambda: batch.bmi_batch(weight, height), 1) * rows
+    results['batch.bmi.rows_per_s'] = _metric(rate, 'rows/s', 'higher')
+    return results
+
+
+def bench_persistence(quick=False):
+    """save_calculation enqueue latency and committed inserts/s per SQLite setting"""
+    import records
+
+    results = {}
+    count = 500 if quick else 5000
+    spec = registry.default_registry().spec('bmi')
+    values, outcome = spec.calculate(SAMPLE_INPUTS['bmi'])
+    record = records.make_record(values, outcome)
+    summary = spec.summarize(values)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for synchronous, batch_size in PERSISTENCE_SETTINGS:
+            name = f'persistence.sync_{synchronous.lower()}.batch_{batch_size}'
+            worker = storage.PersistenceWorker(os.path.join(tmp, f'{name}.db'), batch_size=batch_size,
+                                               synchronous=synchronous)
+            worker.start()
+            worker.flush(wait=True)  # connected and migrated
+
+            latencies = []
+            started = time.perf_counter()
+            for _ in range(count):
+                call = time.perf_counter()
+                worker.add_calculation('BMI', summary, outcome.text, record=record)
+                latencies.append(time.perf_counter() - call)
+            worker.flush(wait=True)
+            elapsed = time.perf_counter() - started
+            worker.close()
+
+            results[f'{name}.inserts_per_s'] = _metric(count / elapsed, 'rows/s', 'higher')
+            results[f'{name}.save_p50_us'] = _metric(1e6 * _percentile(latencies, 0.5), 'us', 'lower')
+            results[f'{name}.save_p99_us'] = _metric(1e6 * _percentile(latencies, 0.99), 'us', 'lower')
+    return results
+
+
+def _keystrokes(query):
+    return [query[:end] for end in range(1, len(query) + 1)]
+
+
+def bench_search(quick=False):
+    """Search index latency per keystroke as the catalog grows"""
+    results = {}
+    for size in CATALOG_SIZES[:3] if quick else CATALOG_SIZES:
+        index = search_index.SearchIndex()
+        for key, name, synonyms in synthetic_catalog(size):
+            index.add(key, name, synonyms)
+        samples = []
+        for _ in range(3):
+            for query in SEARCH_QUERIES:
+                for text in _keystrokes(query):
+                    started = time.perf_counter()
+                    index.search(text)
+                    samples.append(time.perf_counter() - started)
+        results[f'search.n{size}.keystroke_p50_ms'] = _metric(1000 * statistics.median(samples), 'ms', 'lower')
+        results[f'search.n{size}.keystroke_max_ms'] = _metric(1000 * max(samples), 'ms', 'lower')
+    return results
+
+
+def bench_ui(quick=False):
+    """View switch latency and filter_calculators latency (needs a display)"""
+    import tkinter as tk
+    import main as gui
+
+    try:
+        tk.Tk().destroy()
+    except tk.TclError as exc:
+        raise RuntimeError(f"no display ({exc}); run under xvfb-run") from None
+
+    results = {}
+    for label, stats in gui.measure_view_switches(rounds=2 if quick else 5).items():
+        results[f'ui.switch.{label}.mean_ms'] = _metric(stats['mean_ms'], 'ms', 'lower')
+        results[f'ui.switch.{label}.max_ms'] = _metric(stats['max_ms'], 'ms', 'lower')
+
+    for size in CATALOG_SIZES[:2] if quick else CATALOG_SIZES[:3]:
+        app = gui.QuickMedCalc(db_path=':memory:')
+        app.root.withdraw()
+        for key, name, synonyms in synthetic_catalog(size):
+            if key not in app.calculators:
+                app.calculators[key] = name
+                app.search_index.add(key, name, synonyms)
+                app.add_calculator_button(key, name)
+        app.filter_calculators()
+        app.root.update_idletasks()
+
+        samples = []
+        for query in SEARCH_QUERIES:
+            for text in _keystrokes(query) + ['']:
+                app.search_var.set(text)
+                started = time.perf_counter()
+                app.filter_calculators()
+                app.root.update_idletasks()
+                samples.append(time.perf_counter() - started)
+        app.on_close()
+        results[f'ui.filter.n{size}.keystroke_p50_ms'] = _metric(1000 * statistics.median(samples), 'ms', 'lower')
+        results[f'ui.filter.n{size}.keystroke_max_ms'] = _metric(1000 * max(samples), 'ms', 'lower')
+    return results
+
+
+BENCHMARKS = {
+    'engine': bench_engine,
+    'persistence': bench_persistence,
+    'search': bench_search,
+    'ui': bench_ui,
+}
+
+
+def _median_metrics(runs):
+    """One metric per name from several runs: the median value, with every sample"""
+    merged = {}
+    for name, metric in runs[0].items():
+        samples = [run[name]['value'] for run in runs if name in run]
+        merged[name] = dict(_metric(statistics.median(samples), metric['unit'], metric['better']),
+                            samples=samples)
+    return merged
+
+
+def run(sections=SECTIONS, quick=False, log=None, repeat=DEFAULT_REPEAT):
+    """Run the selected sections `repeat` times each; returns the JSON-ready report"""
+    report = {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sqlite': sqlite3.sqlite_version,
+            'quick': quick,
+            'repeat': repeat,
+        },
+        'metrics': {},
+        'skipped': {},
+    }
+    for section in sections:
+        if log is not None:
+            log(f"Running {section} benchmarks...")
+        try:
+            runs = [BENCHMARKS[section](quick) for _ in range(repeat)]
+            report['metrics'].update(_median_metrics(runs))
+        except RuntimeError as exc:
+            report['skipped'][section] = str(exc)
+    return report
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    (name, baseline, current, change) for metrics worse than baseline by more
+    than threshold (a fraction); change is the relative change in value
+
+    Values are the medians written by run(), not single samples, so a
+    threshold of DEFAULT_THRESHOLD is not tripped by run-to-run noise.
+    """
+    regressions = []
+    for name, metric in current['metrics'].items():
+        base = baseline.get('metrics', {}).get(name)
+        if base is None or not base['value']:
+            continue
+        change = (metric['value'] - base['value']) / base['value']
+        worse = -change if metric['better'] == 'higher' else change
+        if worse > threshold:
+            regressions.append((name, base['value'], metric['value'], change))
+    return regressions
+
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Run the QuickMed Calc benchmark suite")
+    parser.add_argument('-o', '--output', help="write results JSON here")
+    parser.add_argument('--only', help=f"comma-separated sections ({', '.join(SECTIONS)})")
+    parser.add_argument('--quick', action='store_true', help="fewer iterations, smaller catalogs")
+    parser.add_argument('--compare', metavar='BASELINE', help="baseline results JSON to compare against")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help=f"runs per section; metrics are their median (default {DEFAULT_REPEAT})")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f"allowed relative regression for --compare (default {DEFAULT_THRESHOLD})")
+    args = parser.parse_args(argv)
+
+    sections = args.only.split(',') if args.only else SECTIONS
+    unknown = set(sections) - set(SECTIONS)
+    if unknown:
+        parser.error(f"unknown sections: {', '.join(sorted(unknown))}")
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    report = run(sections, args.quick, log=lambda message: print(message, file=sys.stderr),
+                 repeat=args.repeat)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+    for section, reason in report['skipped'].items():
+        print(f"Skipped {section}: {reason}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for name, before, after, change in regressions:
+            print(f"REGRESSION {name}: {before:.4g} -> {after:.4g} ({change:+.1%})", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,6 @@
+"""
+QuickMed Calc - Calculator Implementations
+
+One module per calculator, each defining SPEC (a registry.CalculatorSpec).
+Modules are listed in manifest.json and imported only when first opened.
+"""
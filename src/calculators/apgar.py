@@ -0,0 +1,24 @@
+"""APGAR Score Calculator"""
+
+import engine
+from registry import CalculatorSpec, ChoiceList
+
+
+def _summary(values):
+    return "; ".join(f"{criterion}: {score}"
+                     for score, (criterion, _) in zip(values['scores'], engine.APGAR_CRITERIA))
+
+
+SPEC = CalculatorSpec(
+    title="APGAR Score",
+    calculator_type='APGAR',
+    inputs=(
+        ChoiceList('scores', tuple(
+            (f"{criterion}:", tuple((score, f"{score}: {option}") for score, option in enumerate(options)))
+            for criterion, options in engine.APGAR_CRITERIA)),
+    ),
+    formula=engine.calculate_apgar,
+    placeholder="APGAR Score: -- | Status: --",
+    button_text="Calculate APGAR",
+    summary=_summary,
+)
@@ -0,0 +1,17 @@
+"""BMI Calculator"""
+
+import engine
+from registry import CalculatorSpec, Number
+
+SPEC = CalculatorSpec(
+    title="BMI Calculator",
+    calculator_type='BMI',
+    inputs=(
+        Number('weight', "Weight (kg):", 0.2, 650),
+        Number('height_cm', "Height (cm):", 20, 280),
+    ),
+    formula=engine.calculate_bmi,
+    placeholder="BMI: -- | Category: --",
+    button_text="Calculate BMI",
+    summary=lambda v: f"Weight: {v['weight']}kg, Height: {v['height_cm']}cm",
+)
@@ -0,0 +1,17 @@
+"""Body Surface Area Calculator (Mosteller formula)"""
+
+import engine
+from registry import CalculatorSpec, Number
+
+SPEC = CalculatorSpec(
+    title="Body Surface Area (BSA)",
+    calculator_type='BSA',
+    inputs=(
+        Number('weight', "Weight (kg):", 0.2, 650),
+        Number('height_cm', "Height (cm):", 20, 280),
+    ),
+    formula=engine.calculate_bsa,
+    placeholder="BSA: -- m²",
+    button_text="Calculate BSA",
+    summary=lambda v: f"Weight: {v['weight']}kg, Height: {v['height_cm']}cm",
+)
@@ -0,0 +1,24 @@
+"""CHADS₂ Score Calculator for Stroke Risk"""
+
+import engine
+from registry import CalculatorSpec, Checklist
+
+
+def _summary(values):
+    selected = [description for flag, (description, _) in zip(values['criteria'], engine.CHADS2_CRITERIA)
+                if flag]
+    return "; ".join(selected) if selected else "No risk factors"
+
+
+SPEC = CalculatorSpec(
+    title="CHADS₂ Score (Stroke Risk)",
+    calculator_type='CHADS2',
+    inputs=(
+        Checklist('criteria', engine.CHADS2_CRITERIA),
+    ),
+    formula=engine.calculate_chads2,
+    placeholder="CHADS₂ Score: -- | Risk: --",
+    button_text="Calculate CHADS₂",
+    summary=_summary,
+    saved=lambda result: f"{result.text} | {result.recommendation}",
+)
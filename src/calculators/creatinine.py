@@ -0,0 +1,19 @@
+"""Creatinine Clearance Calculator (Cockcroft-Gault)"""
+
+import engine
+from registry import CalculatorSpec, Choice, Number
+
+SPEC = CalculatorSpec(
+    title="Creatinine Clearance (Cockcroft-Gault)",
+    calculator_type='Creatinine Clearance',
+    inputs=(
+        Number('age', "Age (years):", 0, 130),
+        Number('weight', "Weight (kg):", 0.2, 650),
+        Number('creatinine', "Serum Creatinine (mg/dL):", 0.1, 30),
+        Choice('gender', "Gender:", (('male', "Male"), ('female', "Female")), default='male', inline=True),
+    ),
+    formula=engine.calculate_creatinine,
+    placeholder="Creatinine Clearance: -- mL/min",
+    button_text="Calculate CrCl",
+    summary=lambda v: f"Age: {v['age']}, Weight: {v['weight']}kg, SCr: {v['creatinine']}mg/dL, {v['gender']}",
+)
@@ -0,0 +1,24 @@
+"""Glasgow Coma Scale Calculator"""
+
+import engine
+from registry import CalculatorSpec, Choice
+
+
+def _options(options):
+    return tuple((score, f"{score}: {description}") for score, description in options)
+
+
+SPEC = CalculatorSpec(
+    title="Glasgow Coma Scale (GCS)",
+    calculator_type='GCS',
+    inputs=(
+        Choice('eye', "Eye Opening:", _options(engine.GCS_EYE_OPTIONS)),
+        Choice('verbal', "Verbal Response:", _options(engine.GCS_VERBAL_OPTIONS)),
+        Choice('motor', "Motor Response:", _options(engine.GCS_MOTOR_OPTIONS)),
+    ),
+    formula=engine.calculate_gcs,
+    placeholder="GCS: -- | Interpretation: --",
+    button_text="Calculate GCS",
+    layout='columns',
+    summary=lambda v: f"E{v['eye']}V{v['verbal']}M{v['motor']}",
+)
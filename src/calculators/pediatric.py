@@ -0,0 +1,40 @@
+"""Pediatric Weight-Based Dosing Calculator"""
+
+import formulary
+from registry import Autocomplete, CalculatorSpec, Number
+
+
+def _summary(values):
+    text = f"Weight: {values['weight']}kg, {values['dose_per_kg']}mg/kg, {values['frequency']}x/day"
+    return f"{text}, {values['drug']}" if values.get('drug') else text
+
+
+def _render(dose, values):
+    drug = formulary.default_formulary().get(values['drug']) if values.get('drug') else None
+    limits = f"\nFormulary: {drug.describe()}" if drug else ""
+    return f"""Pediatric Dosing Calculation:
+
+Child's Weight: {values['weight']} kg
+Dose: {values['dose_per_kg']} mg/kg{limits}
+
+Single Dose: {dose.single_dose:.1f} mg
+Total Daily Dose: {dose.daily_dose:.1f} mg
+Frequency: {dose.frequency} times per day
+
+Note: {dose.recommendation}"""
+
+
+SPEC = CalculatorSpec(
+    title="Pediatric Dosing Calculator",
+    calculator_type='Pediatric Dosing',
+    inputs=(
+        Autocomplete('drug', "Drug (optional, from formulary):", formulary.default_formulary()),
+        Number('weight', "Child's Weight (kg):", 0.2, 150),
+        Number('dose_per_kg', "Dose per kg (mg/kg):", 0.001, 1000),
+        Number('frequency', "Frequency (doses per day):", 1, 24, integer=True),
+    ),
+    formula=formulary.pediatric_dose,
+    button_text="Calculate Dose",
+    summary=_summary,
+    render=_render,
+)
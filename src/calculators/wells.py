@@ -0,0 +1,23 @@
+"""Wells Score for DVT Calculator"""
+
+import engine
+from registry import CalculatorSpec, Checklist
+
+
+def _summary(values):
+    selected = [description for flag, (description, _) in zip(values['criteria'], engine.WELLS_CRITERIA)
+                if flag]
+    return "; ".join(selected) if selected else "No criteria selected"
+
+
+SPEC = CalculatorSpec(
+    title="Wells Score for DVT",
+    calculator_type='Wells DVT',
+    inputs=(
+        Checklist('criteria', engine.WELLS_CRITERIA, signed=True),
+    ),
+    formula=engine.calculate_wells,
+    placeholder="Wells Score: -- | Risk: --",
+    button_text="Calculate Wells Score",
+    summary=_summary,
+)
@@ -0,0 +1,296 @@
+"""
+QuickMed Calc - Calculation Engine
+Pure-Python formulas and clinical interpretations for every calculator.
+
+The GUI and any headless caller (scripts, back-end services) share these
+functions, so a result is computed the same way everywhere. This module must
+stay free of tkinter and sqlite3 imports so it can be used without a display
+or a database.
+
+IMPORTANT MEDICAL DISCLAIMER:
+This software is for educational and reference purposes only.
+Always verify calculations independently and consult current medical literature.
+"""
+
+import math
+from typing import NamedTuple, Sequence
+
+
+class CalcResult(NamedTuple):
+    """Structured result of a single calculation"""
+    value: float
+    category: str
+    recommendation: str
+    text: str
+
+
+class DoseResult(NamedTuple):
+    """Structured result of a weight-based dosing calculation"""
+    single_dose: float
+    daily_dose: float
+    frequency: int
+    recommendation: str
+    text: str
+
+
+# Interpretation bands: (lower bound, label), checked from the top down
+BMI_CATEGORIES = (
+    (30, "Obese"),
+    (25, "Overweight"),
+    (18.5, "Normal weight"),
+    (-math.inf, "Underweight"),
+)
+
+CRCL_CATEGORIES = (
+    (90, "Normal"),
+    (60, "Mild decrease"),
+    (30, "Moderate decrease"),
+    (15, "Severe decrease"),
+    (-math.inf, "Kidney failure"),
+)
+
+GCS_CATEGORIES = (
+    (13, "Mild brain injury"),
+    (9, "Moderate brain injury"),
+    (-math.inf, "Severe brain injury"),
+)
+
+WELLS_CATEGORIES = (
+    (2, "High (DVT likely - consider imaging)"),
+    (1, "Moderate"),
+    (-math.inf, "Low (DVT unlikely)"),
+)
+
+APGAR_CATEGORIES = (
+    (7, "Normal"),
+    (4, "Moderately depressed"),
+    (-math.inf, "Severely depressed"),
+)
+
+# Component options: (score, description)
+GCS_EYE_OPTIONS = (
+    (4, "Spontaneous"),
+    (3, "To voice"),
+    (2, "To pain"),
+    (1, "None"),
+)
+
+GCS_VERBAL_OPTIONS = (
+    (5, "Oriented"),
+    (4, "Confused"),
+    (3, "Inappropriate words"),
+    (2, "Incomprehensible"),
+    (1, "None"),
+)
+
+GCS_MOTOR_OPTIONS = (
+    (6, "Obeys commands"),
+    (5, "Localizes pain"),
+    (4, "Withdraws from pain"),
+    (3, "Flexion to pain"),
+    (2, "Extension to pain"),
+    (1, "None"),
+)
+
+# Criteria: (description, points)
+WELLS_CRITERIA = (
+    ("Active cancer (treatment ongoing or within 6 months)", 1),
+    ("Paralysis, paresis, or recent plaster immobilization", 1),
+    ("Recently bedridden for >3 days or major surgery within 12 weeks", 1),
+    ("Localized tenderness along distribution of deep venous system", 1),
+    ("Entire leg swollen", 1),
+    ("Calf swelling >3 cm compared to asymptomatic leg", 1),
+    ("Pitting edema confined to symptomatic leg", 1),
+    ("Collateral superficial veins (non-varicose)", 1),
+    ("Previously documented DVT", 1),
+    ("Alternative diagnosis at least as likely as DVT", -2),
+)
+
+# Criteria: (description, options scored 0, 1, 2)
+APGAR_CRITERIA = (
+    ("Heart Rate", ("Absent", "< 100 bpm", "> 100 bpm")),
+    ("Respiratory Effort", ("Absent", "Weak cry", "Strong cry")),
+    ("Muscle Tone", ("Flaccid", "Some flexion", "Active motion")),
+    ("Reflex Response", ("No response", "Grimace", "Cry/cough")),
+    ("Color", ("Blue/pale", "Body pink, extremities blue", "Completely pink")),
+)
+
+CHADS2_CRITERIA = (
+    ("Congestive heart failure", 1),
+    ("Hypertension", 1),
+    ("Age ≥ 75 years", 1),
+    ("Diabetes mellitus", 1),
+    ("Prior stroke or TIA", 2),
+)
+
+PEDIATRIC_DOSE_NOTE = "Always verify against pediatric dosing guidelines and maximum adult doses."
+
+
+def classify(value, bands):
+    """Return the label of the first band whose lower bound is <= value"""
+    for lower, label in bands:
+        if value >= lower:
+            return label
+    return bands[-1][1]
+
+
+def _require_positive(name, value):
+    if not (value > 0 and math.isfinite(value)):
+        raise ValueError(f"{name} must be a positive number")
+
+
+def _require_flags(name, flags, count):
+    if len(flags) != count:
+        raise ValueError(f"{name} expects {count} criteria, got {len(flags)}")
+
+
+def calculate_bmi(weight: float, height_cm: float) -> CalcResult:
+    """
+    Body Mass Index
+
+    Reference: WHO adult BMI classification
+    """
+    _require_positive("Weight", weight)
+    _require_positive("Height", height_cm)
+
+    height = height_cm / 100  # Convert cm to m
+    bmi = weight / (height * height)  # correctly rounded, unlike pow()
+    category = classify(bmi, BMI_CATEGORIES)
+
+    return CalcResult(bmi, category, "", f"BMI: {bmi:.1f} | Category: {category}")
+
+
+def calculate_bsa(weight: float, height_cm: float) -> CalcResult:
+    """
+    Body Surface Area
+
+    Reference: Mosteller RD, N Engl J Med 1987
+    """
+    _require_positive("Weight", weight)
+    _require_positive("Height", height_cm)
+
+    bsa = math.sqrt((weight * height_cm) / 3600)
+
+    return CalcResult(bsa, "", "", f"BSA: {bsa:.2f} m² (Mosteller formula)")
+
+
+def calculate_creatinine(age: float, weight: float, creatinine: float,
+                         gender: str = "male") -> CalcResult:
+    """
+    Creatinine Clearance
+
+    Reference: Cockcroft & Gault, Nephron 1976
+    """
+    if not (0 <= age < 140):
+        raise ValueError("Age must be between 0 and 140 years")
+    _require_positive("Weight", weight)
+    _require_positive("Serum creatinine", creatinine)
+    if gender not in ("male", "female"):
+        raise ValueError("Gender must be 'male' or 'female'")
+
+    clcr = ((140 - age) * weight) / (72 * creatinine)
+    if gender == "female":
+        clcr *= 0.85
+    interpretation = classify(clcr, CRCL_CATEGORIES)
+
+    return CalcResult(clcr, interpretation, "",
+                      f"CrCl: {clcr:.1f} mL/min ({interpretation})")
+
+
+def calculate_gcs(eye: int, verbal: int, motor: int) -> CalcResult:
+    """
+    Glasgow Coma Scale
+
+    Reference: Teasdale & Jennett, Lancet 1974
+    """
+    if not (1 <= eye <= 4):
+        raise ValueError("Eye opening must be 1-4")
+    if not (1 <= verbal <= 5):
+        raise ValueError("Verbal response must be 1-5")
+    if not (1 <= motor <= 6):
+        raise ValueError("Motor response must be 1-6")
+
+    total = eye + verbal + motor
+    interpretation = classify(total, GCS_CATEGORIES)
+
+    return CalcResult(total, interpretation, "",
+                      f"GCS: {total}/15 (E{eye}V{verbal}M{motor}) | {interpretation}")
+
+
+def calculate_wells(criteria: Sequence[bool]) -> CalcResult:
+    """
+    Wells Score for DVT
+
+    Reference: Wells et al., Lancet 1997
+    criteria: one flag per entry of WELLS_CRITERIA, in order
+    """
+    _require_flags("Wells score", criteria, len(WELLS_CRITERIA))
+
+    total_score = sum(points for flag, (_, points) in zip(criteria, WELLS_CRITERIA) if flag)
+    risk = classify(total_score, WELLS_CATEGORIES)
+
+    return CalcResult(total_score, risk, "", f"Wells Score: {total_score} | Risk: {risk}")
+
+
+def calculate_apgar(scores: Sequence[int]) -> CalcResult:
+    """
+    APGAR Score
+
+    Reference: Apgar V, Curr Res Anesth Analg 1953
+    scores: one 0-2 score per entry of APGAR_CRITERIA, in order
+    """
+    _require_flags("APGAR score", scores, len(APGAR_CRITERIA))
+    if not all(0 <= score <= 2 for score in scores):
+        raise ValueError("APGAR components must be 0-2")
+
+    total_score = sum(scores)
+    status = classify(total_score, APGAR_CATEGORIES)
+
+    return CalcResult(total_score, status, "",
+                      f"APGAR Score: {total_score}/10 | Status: {status}")
+
+
+def calculate_pediatric_dose(weight: float, dose_per_kg: float, frequency: int) -> DoseResult:
+    """
+    Pediatric Weight-Based Dosing
+
+    dose_per_kg is the total daily dose, divided into `frequency` doses
+    """
+    _require_positive("Weight", weight)
+    _require_positive("Dose per kg", dose_per_kg)
+    if frequency < 1:
+        raise ValueError("Frequency must be at least one dose per day")
+
+    total_daily_dose = weight * dose_per_kg
+    single_dose = total_daily_dose / frequency
+
+    return DoseResult(single_dose, total_daily_dose, frequency, PEDIATRIC_DOSE_NOTE,
+                      f"Single dose: {single_dose:.1f}mg, Daily: {total_daily_dose:.1f}mg")
+
+
+def calculate_chads2(criteria: Sequence[bool]) -> CalcResult:
+    """
+    CHADS₂ Score for Stroke Risk in Atrial Fibrillation
+
+    Reference: Gage et al., JAMA 2001
+    criteria: one flag per entry of CHADS2_CRITERIA, in order
+    """
+    _require_flags("CHADS₂ score", criteria, len(CHADS2_CRITERIA))
+
+    total_score = sum(points for flag, (_, points) in zip(criteria, CHADS2_CRITERIA) if flag)
+
+    if total_score == 0:
+        risk = "Low (0.5% annual stroke risk)"
+        recommendation = "Aspirin or no therapy"
+    elif total_score == 1:
+        risk = "Low-Moderate (1.5% annual stroke risk)"
+        recommendation = "Aspirin or anticoagulation"
+    elif total_score == 2:
+        risk = "Moderate (2.5% annual stroke risk)"
+        recommendation = "Anticoagulation recommended"
+    else:
+        risk = f"High ({1.5 + (total_score-1)*1.5:.1f}% annual stroke risk)"
+        recommendation = "Anticoagulation strongly recommended"
+
+    return CalcResult(total_score, risk, recommendation,
+                      f"CHADS₂ Score: {total_score} | Risk: {risk}")
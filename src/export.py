@@ -0,0 +1,141 @@
+"""
+QuickMed Calc - History Export
+Streams patient_notes to CSV or JSONL, optionally gzip-compressed.
+
+Rows are read with fetchmany() and written as they arrive, so memory use is
+bounded by `chunk_size` regardless of table size. Filters match the history
+browser (calculator type, time range) and use the same indexes.
+
+    python src/export.py audit.csv.gz --from 2025-01-01 --to 2025-03-31
+    python src/export.py bmi.jsonl --type BMI --db path/to/quickmed_data.db
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import sys
+import time
+
+import history
+import records
+import schema
+import storage
+
+EXPORT_COLUMNS = ('id', 'timestamp', 'ts_epoch', 'calculator_type', 'patient_info',
+                  'calculation_result', 'notes', 'score', 'category', 'payload')
+
+FORMATS = ('csv', 'jsonl')
+
+
+def iter_history(conn, calculator_type=None, start=None, end=None, chunk_size=5000):
+    """Yield chunks of export rows, oldest first"""
+    clauses, params = history.filter_clauses(calculator_type, start, end)
+    sql = f'SELECT {", ".join(EXPORT_COLUMNS)} FROM patient_notes'
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(clauses)
+    # (ts_epoch, id) order is served by an index, so SQLite never sorts in memory
+    sql += ' ORDER BY ts_epoch, id'
+
+    cursor = conn.execute(sql, params)
+    try:
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+
+class _CsvWriter:
+    def __init__(self, stream):
+        self.writer = csv.writer(stream)
+        self.writer.writerow(EXPORT_COLUMNS)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+
+class _JsonlWriter:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, rows):
+        for row in rows:
+            record = dict(zip(EXPORT_COLUMNS, row))
+            record['payload'] = records.load_payload(record['payload'])
+            self.stream.write(json.dumps(record, ensure_ascii=False))
+            self.stream.write('\n')
+
+
+def open_output(path, compress=None):
+    """Open a text stream for writing; compress defaults to a .gz suffix"""
+    if compress is None:
+        compress = path.endswith('.gz')
+    if compress:
+        return gzip.open(path, 'wt', encoding='utf-8', newline='')
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+def format_for(path):
+    """Guess the export format from a file name"""
+    name = path[:-3] if path.endswith('.gz') else path
+    return 'jsonl' if name.endswith(('.jsonl', '.json')) else 'csv'
+
+
+def export_history(conn, stream, fmt='csv', calculator_type=None, start=None, end=None,
+                   chunk_size=5000, progress=None):
+    """
+    Write matching history rows to an open text stream
+
+    progress: called as progress(rows_written, elapsed_seconds) after each chunk
+    Returns the number of rows written.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    writer = _CsvWriter(stream) if fmt == 'csv' else _JsonlWriter(stream)
+
+    written = 0
+    started = time.monotonic()
+    for rows in iter_history(conn, calculator_type, start, end, chunk_size):
+        writer.write(rows)
+        written += len(rows)
+        if progress is not None:
+            progress(written, time.monotonic() - started)
+    return written
+
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Export QuickMed Calc history to CSV or JSONL")
+    parser.add_argument('output', help="output file; a .gz suffix enables gzip")
+    parser.add_argument('--db', default=storage.DEFAULT_DB_PATH, help="database path")
+    parser.add_argument('--format', choices=FORMATS, help="default: from the output file name")
+    parser.add_argument('--gzip', action='store_true', help="compress even without a .gz suffix")
+    parser.add_argument('--type', dest='calculator_type', help="only this calculator_type")
+    parser.add_argument('--from', dest='start', help="first day to include (YYYY-MM-DD)")
+    parser.add_argument('--to', dest='end', help="last day to include (YYYY-MM-DD)")
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    start = history.day_start(args.start) if args.start else None
+    end = history.day_end(args.end) if args.end else None
+
+    def report(written, elapsed):
+        rate = written / elapsed if elapsed else 0
+        print(f"\r{written} rows exported ({rate:,.0f} rows/s)", end='', file=sys.stderr, flush=True)
+
+    conn = storage.connect(args.db)
+    schema.migrate(conn)
+    try:
+        with open_output(args.output, args.gzip or None) as stream:
+            written = export_history(conn, stream, args.format or format_for(args.output),
+                                     args.calculator_type, start, end, args.chunk_size, report)
+    finally:
+        conn.close()
+    print(f"\r{written} rows exported to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
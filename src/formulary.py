@@ -0,0 +1,300 @@
+"""
+QuickMed Calc - Drug Formulary
+Weight-based dosing limits per drug, with prefix lookup and cap enforcement.
+
+Each drug has an allowed mg/kg/day range, the dosing frequencies it may be
+divided into, and absolute caps on a single dose and on the daily total.
+pediatric_dose() rejects a mg/kg dose or frequency outside the entry and
+limits the result to the caps, so a heavy child is never prescribed more
+than the adult maximum. dose_batch() does the same for a whole ward roster
+in one vectorized pass (NumPy, optional dependency, see batch.py; imported
+only by the batch functions, so the scalar path stays off NumPy).
+
+The bundled formulary.json holds EXAMPLE entries only: replace it with, or
+check it against, your institution's formulary before clinical use.
+
+    python src/formulary.py --search amox
+    python src/formulary.py roster.csv doses.csv   # columns: weight, drug[, dose_per_kg, frequency]
+"""
+
+import argparse
+import bisect
+import csv
+import json
+import math
+import os
+import sys
+from typing import NamedTuple, Tuple
+
+import engine
+
+FORMULARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'formulary.json')
+
+
+class Drug(NamedTuple):
+    name: str
+    synonyms: Tuple[str, ...]
+    min_per_kg: float       # mg/kg/day
+    max_per_kg: float
+    frequencies: Tuple[int, ...]  # doses per day
+    usual_per_kg: float
+    usual_frequency: int
+    max_single_mg: float
+    max_daily_mg: float
+
+    def describe(self):
+        frequencies = '/'.join(str(frequency) for frequency in self.frequencies)
+        return (f"{self.name}: {self.min_per_kg:g}-{self.max_per_kg:g} mg/kg/day in {frequencies} doses, "
+                f"max {self.max_single_mg:g} mg per dose and {self.max_daily_mg:g} mg/day")
+
+
+def _drug(entry):
+    low, high = entry['mg_per_kg_day']
+    drug = Drug(entry['name'], tuple(entry.get('synonyms', ())), float(low), float(high),
+                tuple(int(frequency) for frequency in entry['frequencies']),
+                float(entry['usual_mg_per_kg_day']), int(entry['usual_frequency']),
+                float(entry['max_single_mg']), float(entry['max_daily_mg']))
+    if not 0 < drug.min_per_kg <= drug.usual_per_kg <= drug.max_per_kg:
+        raise ValueError(f"{drug.name}: usual mg/kg/day must lie within its range")
+    if not drug.frequencies or min(drug.frequencies) < 1 or drug.usual_frequency not in drug.frequencies:
+        raise ValueError(f"{drug.name}: invalid frequencies")
+    if not 0 < drug.max_single_mg <= drug.max_daily_mg:
+        raise ValueError(f"{drug.name}: caps must be positive, single dose at most daily")
+    return drug
+
+
+class Formulary:
+    """Drugs by name or synonym, case-insensitive, with prefix completion"""
+
+    def __init__(self, drugs=(), disclaimer=""):
+        self.disclaimer = disclaimer
+        self.drugs = []
+        self._by_key = {}
+        self._keys = []  # sorted (lowercase name or synonym, drug index)
+        for drug in drugs:
+            self.add(drug)
+
+    def add(self, drug):
+        index = len(self.drugs)
+        self.drugs.append(drug)
+        for key in (drug.name,) + drug.synonyms:
+            key = key.lower()
+            if key in self._by_key:
+                raise ValueError(f"Duplicate formulary name: {key}")
+            self._by_key[key] = drug
+            bisect.insort(self._keys, (key, index))
+
+    def get(self, name):
+        """The drug for a name or synonym, or None"""
+        return self._by_key.get(name.strip().lower())
+
+    def complete(self, prefix, limit=10):
+        """Canonical names of drugs with a name or synonym starting with prefix"""
+        prefix = prefix.strip().lower()
+        names = []
+        for key, index in self._keys[bisect.bisect_left(self._keys, (prefix,)):]:
+            if not key.startswith(prefix) or len(names) >= limit:
+                break
+            if self.drugs[index].name not in names:
+                names.append(self.drugs[index].name)
+        return names
+
+    def names(self):
+        return [drug.name for drug in self.drugs]
+
+    def __len__(self):
+        return len(self.drugs)
+
+
+def load(path=FORMULARY_PATH):
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return Formulary([_drug(entry) for entry in data['drugs']], data.get('disclaimer', ""))
+
+
+_default = None
+
+
+def default_formulary():
+    """The bundled formulary, loaded on first use"""
+    global _default
+    if _default is None:
+        _default = load()
+    return _default
+
+
+def capped_dose(weight, dose_per_kg, frequency, drug):
+    """
+    Weight-based dose limited by the drug's caps
+
+    Raises ValueError when dose_per_kg or frequency is outside the formulary
+    entry; the caps themselves only ever lower the dose.
+    """
+    if not drug.min_per_kg <= dose_per_kg <= drug.max_per_kg:
+        raise ValueError(f"{drug.name}: {dose_per_kg:g} mg/kg/day is outside "
+                         f"{drug.min_per_kg:g}-{drug.max_per_kg:g} mg/kg/day")
+    if frequency not in drug.frequencies:
+        raise ValueError(f"{drug.name}: {frequency} doses per day is not allowed "
+                         f"({'/'.join(str(f) for f in drug.frequencies)})")
+    # Same check as the uncapped engine path, so NaN and infinity are rejected too
+    engine._require_positive("Weight", weight)
+
+    requested = weight * dose_per_kg
+    daily = min(requested, drug.max_daily_mg)
+    single = min(daily / frequency, drug.max_single_mg)
+    daily = single * frequency
+    # Compared with the caps themselves: single * frequency need not equal
+    # requested exactly (e.g. 982.5 / 3 * 3) even when nothing was capped
+    capped = requested > drug.max_daily_mg or requested / frequency > drug.max_single_mg
+
+    if capped:
+        recommendation = (f"CAPPED at the {drug.name} maximum of {drug.max_single_mg:g} mg per dose / "
+                          f"{drug.max_daily_mg:g} mg per day.")
+    else:
+        recommendation = f"Within {drug.name} formulary limits."
+    recommendation += " Verify against your local formulary."
+    return engine.DoseResult(single, daily, frequency, recommendation,
+                             f"{drug.name} single dose: {single:.1f}mg, Daily: {daily:.1f}mg"
+                             + (" (capped)" if capped else ""))
+
+
+def pediatric_dose(weight, dose_per_kg, frequency, drug=""):
+    """Pediatric Dosing formula: capped when a formulary drug is named, as before otherwise"""
+    if not drug:
+        return engine.calculate_pediatric_dose(weight, dose_per_kg, frequency)
+    entry = default_formulary().get(drug)
+    if entry is None:
+        raise ValueError(f"{drug} is not in the formulary")
+    return capped_dose(weight, dose_per_kg, frequency, entry)
+
+
+class DoseBatch(NamedTuple):
+    """Vectorized doses: float64 mg arrays, capped and validity masks"""
+    single: "np.ndarray"
+    daily: "np.ndarray"
+    frequency: "np.ndarray"
+    capped: "np.ndarray"
+    valid: "np.ndarray"
+
+
+def dose_batch(weight, drug, dose_per_kg=None, frequency=None, formulary=None):
+    """
+    Capped doses for every row of a roster
+
+    drug: names or synonyms; dose_per_kg/frequency default to each drug's
+    usual dose (a NaN or 0 cell also means usual). Rows that capped_dose()
+    would reject are masked: NaN doses and valid False. Valid rows match
+    the scalar path exactly.
+    """
+    from batch import np, require_numpy
+
+    require_numpy()
+    formulary = formulary or default_formulary()
+    drugs = formulary.drugs
+    # Column tables indexed by drug, with a trailing all-NaN row for unknown names
+    table = np.array([(d.min_per_kg, d.max_per_kg, d.usual_per_kg, d.usual_frequency,
+                       d.max_single_mg, d.max_daily_mg, sum(1 << f for f in d.frequencies if f < 63))
+                      for d in drugs] + [(np.nan,) * 6 + (0,)], dtype=np.float64)
+    positions = {entry.name: i for i, entry in enumerate(drugs)}
+    lookup = {}
+    for name in drug:
+        if name not in lookup:
+            entry = formulary.get(str(name))
+            lookup[name] = len(drugs) if entry is None else positions[entry.name]
+    index = np.array([lookup[name] for name in drug], dtype=np.intp)
+    rows = table[index]
+    min_per_kg, max_per_kg, usual_per_kg, usual_frequency, max_single, max_daily = rows[:, :6].T
+    allowed = rows[:, 6].astype(np.int64)
+
+    weight = np.asarray(weight, dtype=np.float64)
+    per_kg = usual_per_kg if dose_per_kg is None else np.asarray(dose_per_kg, dtype=np.float64)
+    per_kg = np.where(np.isnan(per_kg) | (per_kg == 0), usual_per_kg, per_kg)
+    freq = usual_frequency if frequency is None else np.asarray(frequency, dtype=np.float64)
+    freq = np.where(np.isnan(freq) | (freq == 0), usual_frequency, freq)
+
+    with np.errstate(all='ignore'):
+        freq_bits = np.where((freq >= 1) & (freq < 63) & (freq == np.floor(freq)), freq, 0).astype(np.int64)
+        valid = ((index < len(drugs)) & np.isfinite(weight) & (weight > 0)
+                 & (per_kg >= min_per_kg) & (per_kg <= max_per_kg) & (freq_bits > 0) & (((allowed >> freq_bits) & 1) == 1))
+        requested = weight * per_kg
+        daily = np.minimum(requested, max_daily)
+        single = np.minimum(daily / freq, max_single)
+        daily = single * freq
+        capped = valid & ((requested > max_daily) | (requested / freq > max_single))
+
+    nan = np.float64(np.nan)
+    return DoseBatch(np.where(valid, single, nan), np.where(valid, daily, nan),
+                     np.where(valid, freq, nan), capped, valid)
+
+
+def _cell(row, column):
+    value = row.get(column, '') if column else ''
+    return float(value) if value and value.strip() else math.nan
+
+
+def dose_roster(input_path, output_path, formulary=None):
+    """Add single_mg, daily_mg, frequency, capped and error columns to a roster CSV"""
+    from batch import require_numpy
+
+    require_numpy()
+    formulary = formulary or default_formulary()
+    with open(input_path, encoding='utf-8', newline='') as f:
+        rows = list(csv.DictReader(f))
+    weights = [_cell(row, 'weight') for row in rows]
+    names = [row.get('drug', '') for row in rows]
+    doses = dose_batch(weights, names, [_cell(row, 'dose_per_kg') for row in rows],
+                       [_cell(row, 'frequency') for row in rows], formulary)
+
+    with open(output_path, 'w', encoding='utf-8', newline='') as f:
+        fields = list(rows[0]) if rows else ['weight', 'drug']
+        writer = csv.DictWriter(f, fields + ['single_mg', 'daily_mg', 'frequency_per_day', 'capped', 'error'])
+        writer.writeheader()
+        for i, row in enumerate(rows):
+            if doses.valid[i]:
+                row.update(single_mg=f'{doses.single[i]:.1f}', daily_mg=f'{doses.daily[i]:.1f}',
+                           frequency_per_day=int(doses.frequency[i]), capped=int(doses.capped[i]), error='')
+            else:
+                row.update(single_mg='', daily_mg='', frequency_per_day='', capped='',
+                           error=_row_error(formulary, weights[i], names[i], row))
+            writer.writerow(row)
+    return len(rows), int(doses.valid.sum()), int(doses.capped.sum())
+
+
+def _row_error(formulary, weight, name, row):
+    """The scalar path's message for an invalid roster row"""
+    drug = formulary.get(name)
+    if drug is None:
+        return f"{name} is not in the formulary"
+    per_kg = _cell(row, 'dose_per_kg')
+    frequency = _cell(row, 'frequency')
+    try:
+        capped_dose(weight, drug.usual_per_kg if math.isnan(per_kg) or not per_kg else per_kg,
+                    drug.usual_frequency if math.isnan(frequency) or not frequency else frequency, drug)
+    except ValueError as exc:
+        return str(exc)
+    return "invalid row"
+
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="QuickMed Calc formulary lookup and roster dosing")
+    parser.add_argument('input', nargs='?', help="roster CSV with weight and drug columns")
+    parser.add_argument('output', nargs='?', help="output CSV")
+    parser.add_argument('--search', metavar='PREFIX', help="list drugs starting with PREFIX")
+    parser.add_argument('--formulary', default=FORMULARY_PATH, help="formulary JSON")
+    args = parser.parse_args(argv)
+
+    formulary = load(args.formulary)
+    print(formulary.disclaimer, file=sys.stderr)
+    if args.search is not None:
+        for name in formulary.complete(args.search, limit=len(formulary)):
+            print(formulary.get(name).describe())
+        return
+    if not (args.input and args.output):
+        parser.error("give a roster and an output file, or --search")
+    total, valid, capped = dose_roster(args.input, args.output, formulary)
+    print(f"{total} rows dosed to {args.output}: {valid} valid, {capped} capped", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
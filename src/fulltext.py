@@ -0,0 +1,166 @@
+"""
+QuickMed Calc - Full-Text Search
+Ranked search over saved notes and calculation history.
+
+patient_info, calculation_result and notes are indexed by the FTS5 table
+notes_fts (schema version 4), which triggers keep in sync with every insert,
+update and delete of patient_notes. Matches are ranked by bm25, patient
+details weighted highest, and returned with the matching terms marked.
+
+    python src/fulltext.py "chest pain" [--type "Manual Note"] [--limit 20]
+    python src/fulltext.py --rebuild [--db quickmed_data.db]
+
+--rebuild re-creates the index from patient_notes (after a restore, or on a
+database that was written by a build without FTS5) and merges it into as
+few segments as possible. Archived rows (archive.py) are not searched.
+"""
+
+import argparse
+import sys
+import time
+from typing import NamedTuple
+
+import history
+import schema
+import storage
+
+# bm25 weights, in column order: patient_info, calculation_result, notes
+RANK_WEIGHTS = (4.0, 1.0, 2.0)
+
+# Matches ranked at most per search, newest first (see search_notes)
+RANK_WINDOW = 10000
+
+# Tokens of context around each match in a notes snippet
+SNIPPET_TOKENS = 16
+
+
+class SearchHit(NamedTuple):
+    id: int
+    ts_epoch: int
+    timestamp: str
+    calculator_type: str
+    patient_info: str        # the marked columns have every match wrapped in
+    calculation_result: str  # the start/end markers passed to search_notes
+    notes: str               # a snippet around the best matches
+    rank: float              # bm25; lower is better
+
+
+def match_query(text):
+    """
+    FTS5 MATCH expression for text typed by a user, or None if it has no terms
+
+    Every word must match; quoting keeps FTS5 operators and punctuation in
+    the input literal, and the last word also matches as a prefix unless it
+    is followed by a space, so results appear while typing.
+    """
+    words = [word.replace('"', '') for word in text.split()]
+    terms = ['"' + word + '"' for word in words if word]
+    if not terms:
+        return None
+    if not text[-1].isspace():
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def is_available(conn):
+    """True when the database has the notes_fts index"""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notes_fts'").fetchone() is not None
+
+
+def search_notes(conn, text, calculator_type=None, start=None, end=None, limit=50,
+                 start_mark='[', end_mark=']'):
+    """
+    Best matches for text, most relevant first
+
+    calculator_type/start/end: the history.filter_clauses filters
+    A term found in more than RANK_WINDOW rows is ranked among its newest
+    RANK_WINDOW matches only.
+    Returns a list of SearchHit (empty when text has no terms).
+    """
+    query = match_query(text)
+    if query is None:
+        return []
+    where = 'notes_fts MATCH ?'
+    params = [query]
+    clauses, filter_params = history.filter_clauses(calculator_type, start, end)
+    if clauses:
+        # Checked per match by primary key, so nothing is materialized
+        where += (' AND EXISTS (SELECT 1 FROM patient_notes WHERE id = notes_fts.rowid AND '
+                  + ' AND '.join(clauses) + ')')
+        params.extend(filter_params)
+
+    # bm25 has to score every match before sorting; for very common terms
+    # only the newest RANK_WINDOW matches (walked in rowid order, unscored)
+    # are ranked, keeping the search interactive on millions of rows
+    floor = conn.execute(f'SELECT rowid FROM notes_fts WHERE {where} ORDER BY rowid DESC LIMIT 1 OFFSET ?',
+                         params + [RANK_WINDOW]).fetchone()
+    if floor is not None:
+        where += ' AND rowid > ?'
+        params.append(floor[0])
+
+    # FTS5 sorts by rank itself, so only the rows within LIMIT are highlighted
+    weights = ', '.join(str(weight) for weight in RANK_WEIGHTS)
+    sql = f'''
+        SELECT p.id, p.ts_epoch, p.timestamp, p.calculator_type,
+               hit.patient_info, hit.calculation_result, hit.notes, hit.rank
+        FROM (
+            SELECT rowid,
+                   highlight(notes_fts, 0, ?, ?) AS patient_info,
+                   highlight(notes_fts, 1, ?, ?) AS calculation_result,
+                   snippet(notes_fts, 2, ?, ?, '...', {SNIPPET_TOKENS}) AS notes,
+                   rank
+            FROM notes_fts
+            WHERE {where} AND rank MATCH 'bm25({weights})'
+            ORDER BY rank LIMIT ?
+        ) hit JOIN patient_notes p ON p.id = hit.rowid
+        ORDER BY hit.rank
+    '''
+    marks = [start_mark, end_mark] * 3
+    return [SearchHit(*row) for row in conn.execute(sql, marks + params + [limit])]
+
+
+def rebuild(conn):
+    """Create the index if missing, re-index every row and merge segments"""
+    with conn:
+        if not schema.create_fulltext_index(conn):
+            raise RuntimeError("This SQLite build has no FTS5 support")
+        conn.execute("INSERT INTO notes_fts (notes_fts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO notes_fts (notes_fts) VALUES ('optimize')")
+
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Search QuickMed Calc notes and history")
+    parser.add_argument('query', nargs='?', help="words to find (the last one also as a prefix)")
+    parser.add_argument('--db', default=storage.DEFAULT_DB_PATH, help="database path")
+    parser.add_argument('--type', help="only this calculator type")
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--rebuild', action='store_true', help="re-create the index from patient_notes")
+    args = parser.parse_args(argv)
+    if not args.rebuild and not args.query:
+        parser.error("give a query or --rebuild")
+
+    conn = storage.connect(args.db)
+    try:
+        schema.migrate(conn)
+        if args.rebuild:
+            started = time.perf_counter()
+            rebuild(conn)
+            print(f"Index rebuilt in {time.perf_counter() - started:.1f} s", file=sys.stderr)
+        if args.query:
+            if not is_available(conn):
+                parser.exit(1, "No full-text index; this SQLite build has no FTS5 support\n")
+            started = time.perf_counter()
+            hits = search_notes(conn, args.query, args.type, limit=args.limit)
+            elapsed = time.perf_counter() - started
+            for hit in hits:
+                text = ' | '.join(part for part in (hit.patient_info, hit.calculation_result, hit.notes) if part)
+                print(f"{hit.timestamp}  {hit.calculator_type}: {text}")
+            print(f"{len(hits)} matches in {1000 * elapsed:.1f} ms", file=sys.stderr)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+QuickMed Calc - Calculation History Queries
+Filtered, keyset-paginated reads of the patient_notes table.
+
+Pages are ordered newest first by (ts_epoch, id). Instead of OFFSET, each
+page returns a cursor holding the (ts_epoch, id) of its last row and the next
+page starts strictly after it, so every page is a short range scan of
+idx_notes_ts or idx_notes_type_ts no matter how deep the user browses.
+"""
+
+import time
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional, Tuple
+
+
+class HistoryRow(NamedTuple):
+    id: int
+    ts_epoch: int
+    timestamp: str
+    calculator_type: str
+    patient_info: str
+    calculation_result: str
+    notes: str
+
+
+class HistoryPage(NamedTuple):
+    rows: list
+    next_cursor: Optional[Tuple[int, int]]  # None on the last page
+
+
+HISTORY_COLUMNS = 'id, ts_epoch, timestamp, calculator_type, patient_info, calculation_result, notes'
+
+
+def day_start(date_text):
+    """Epoch seconds at local midnight of a 'YYYY-MM-DD' date"""
+    return int(time.mktime(datetime.strptime(date_text, '%Y-%m-%d').timetuple()))
+
+
+def day_end(date_text):
+    """Epoch seconds at local midnight after a 'YYYY-MM-DD' date (exclusive end)"""
+    day = datetime.strptime(date_text, '%Y-%m-%d') + timedelta(days=1)
+    return int(time.mktime(day.timetuple()))
+
+
+def filter_clauses(calculator_type, start, end):
+    """SQL WHERE clauses and parameters for the type and time-range filters"""
+    clauses, params = [], []
+    if calculator_type:
+        clauses.append('calculator_type = ?')
+        params.append(calculator_type)
+    if start is not None:
+        clauses.append('ts_epoch >= ?')
+        params.append(int(start))
+    if end is not None:
+        clauses.append('ts_epoch < ?')
+        params.append(int(end))
+    return clauses, params
+
+
+def query_history(conn, calculator_type=None, start=None, end=None, cursor=None, limit=50,
+                  source='patient_notes', columns=HISTORY_COLUMNS):
+    """
+    One page of history, newest first
+
+    start/end: epoch seconds, start inclusive and end exclusive
+    cursor: next_cursor of the previous page, or None for the first page
+    source/columns: table and select list producing HISTORY_COLUMNS (used
+    for archive partitions, see archive.py)
+    """
+    clauses, params = filter_clauses(calculator_type, start, end)
+    if cursor is not None:
+        clauses.append('(ts_epoch, id) < (?, ?)')
+        params.extend(cursor)
+
+    sql = f'SELECT {columns} FROM {source}'
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(clauses)
+    sql += ' ORDER BY ts_epoch DESC, id DESC LIMIT ?'
+    params.append(limit + 1)
+
+    rows = [HistoryRow(*row) for row in conn.execute(sql, params)]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = (rows[-1].ts_epoch, rows[-1].id)
+    return HistoryPage(rows, next_cursor)
@@ -0,0 +1,337 @@
+"""
+QuickMed Calc - Persistence Load Test
+Simulated clinicians saving a realistic calculation mix to one database.
+
+    python src/loadtest.py --clinicians 4,8,16,32 --rate 0.5 --duration 20
+    python src/loadtest.py --clinicians 16 --rate 0 --mix "bmi=3,gcs=1,note=1"
+
+Each clinician is a process running its own PersistenceWorker with the
+app's batch settings, like one open QuickMed Calc window. It saves at
+--rate saves per second (Poisson arrivals; 0 saves as fast as it can)
+for --duration seconds, through the same calls as save_calculation and
+save_notes: spec.calculate on generated form input, records.make_record,
+add_calculation or add_note.
+
+For every clinician count the report gives the offered and committed
+saves per second, the enqueue and commit latency percentiles (submit to
+transaction committed, so batching delay is included), writes retried
+after "database is locked" and saves that failed outright. Runs against a
+temporary database unless --db is given; no display is needed. Exits 1 if
+any save failed or, with --max-p99-ms, if the commit p99 exceeded it.
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import records
+import registry
+import schema
+import storage
+from metrics import METRICS
+
+# Free-text notes in the mix, alongside registry keys
+NOTE = 'note'
+
+# Relative frequency of each save, roughly as seen on a general ward
+DEFAULT_MIX = {
+    'bmi': 20, 'gcs': 15, 'wells': 10, 'chads2': 10, 'creatinine': 10,
+    'bsa': 5, 'apgar': 3, 'pediatric': 7, NOTE: 20,
+}
+
+_NOTES = (
+    "Reviewed with patient, BP {}/{}. Plan: repeat bloods in {} days.",
+    "Discussed risks and benefits; patient agrees to plan. Follow-up in {} weeks, review {} and {}.",
+    "Handover: obs stable overnight, HR {}, RR {}, pain score {}/10.",
+    "Family updated by phone. Weight {} kg, fluid balance +{} mL, urine output {} mL/h.",
+)
+
+
+def _clamp(value, low, high):
+    return min(max(value, low), high)
+
+
+def _adult(rng):
+    return {'weight': f'{_clamp(rng.gauss(78, 17), 35, 200):.1f}',
+            'height_cm': f'{_clamp(rng.gauss(170, 10), 140, 205):.0f}'}
+
+
+def _creatinine(rng):
+    return {'age': str(rng.randint(18, 95)), 'weight': _adult(rng)['weight'],
+            'creatinine': f'{_clamp(rng.lognormvariate(0, 0.45), 0.3, 12):.2f}'}
+
+
+def _pediatric(rng):
+    import formulary
+
+    weight = f'{rng.uniform(3, 45):.1f}'
+    if rng.random() < 0.2:
+        return {'drug': '', 'weight': weight, 'dose_per_kg': str(rng.choice((10, 15, 20, 30, 40))),
+                'frequency': str(rng.choice((2, 3, 4)))}
+    drug = rng.choice(formulary.default_formulary().drugs)
+    return {'drug': rng.choice((drug.name,) + drug.synonyms), 'weight': weight,
+            'dose_per_kg': f'{drug.usual_per_kg:g}', 'frequency': str(drug.usual_frequency)}
+
+
+# Typed-in values per calculator key; other inputs are drawn from their fields
+REALISTIC_INPUTS = {
+    'bmi': _adult,
+    'bsa': _adult,
+    'creatinine': _creatinine,
+    'pediatric': _pediatric,
+}
+
+
+def _random_field(field, rng):
+    if isinstance(field, registry.Number):
+        value = rng.uniform(field.minimum or 0, field.maximum if field.maximum is not None else 100)
+        return str(round(value)) if field.integer else f'{value:.1f}'
+    if isinstance(field, registry.Choice):
+        return rng.choice(field.options)[0]
+    if isinstance(field, registry.Checklist):
+        return [int(rng.random() < 0.25) for _ in field.criteria]
+    if isinstance(field, registry.ChoiceList):
+        return [rng.choice(options)[0] for _, options in field.groups]
+    return ''
+
+
+def random_inputs(key, spec, rng):
+    """Raw form input for one calculation, as the GUI would submit it"""
+    raw = {field.name: _random_field(field, rng) for field in spec.inputs}
+    generate = REALISTIC_INPUTS.get(key)
+    if generate is not None:
+        raw.update(generate(rng))
+    return raw
+
+
+def random_note(rng):
+    template = rng.choice(_NOTES)
+    return template.format(*(rng.randint(2, 160) for _ in range(template.count('{}'))))
+
+
+def parse_mix(text):
+    """'bmi=3,gcs=1,note=1' -> {'bmi': 3.0, 'gcs': 1.0, 'note': 1.0}"""
+    mix = {}
+    for part in text.split(','):
+        key, _, weight = part.partition('=')
+        mix[key.strip()] = float(weight) if weight else 1.0
+    return mix
+
+
+def _percentile(ordered, fraction):
+    if not ordered:
+        return float('nan')
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _clinician(db_path, clinician, mix, rate, duration, start_at, seed, batch_size, flush_interval,
+               writer_socket):
+    """One simulated app instance; returns its raw measurements"""
+    METRICS.enabled = True
+    rng = random.Random(seed * 100003 + clinician)
+    calculators = registry.default_registry()
+    specs = {key: calculators.spec(key) for key in mix if key != NOTE}
+    keys = list(mix)
+    cum_weights = []
+    for key in keys:
+        cum_weights.append((cum_weights[-1] if cum_weights else 0) + mix[key])
+
+    enqueue = []
+    commit = []
+    errors = []
+    store = storage.PersistenceWorker(db_path, batch_size=batch_size, flush_interval=flush_interval,
+                                      on_error=lambda exc: errors.append(exc), writer_socket=writer_socket)
+    store.start()
+    store.flush(wait=True)  # connected and migrated before the clock starts
+
+    # Callbacks are run as soon as they are queued, so commit latency is not
+    # inflated by a GUI-style dispatch poll
+    def drain():
+        while True:
+            item = store.completed.get()
+            if item is None:
+                return
+            callback, args = item
+            callback(*args)
+
+    drainer = threading.Thread(target=drain, daemon=True)
+    drainer.start()
+
+    def committed(started):
+        return lambda: commit.append(time.perf_counter() - started)
+
+    def failed(exc):
+        errors.append(exc)
+
+    time.sleep(max(0.0, start_at - time.time()))
+    began = time.time()
+    stop = time.perf_counter() + duration
+    next_at = time.perf_counter()
+    saves = 0
+    while True:
+        if rate > 0:
+            next_at += rng.expovariate(rate)
+            if next_at >= stop:
+                break
+            time.sleep(max(0.0, next_at - time.perf_counter()))
+        elif time.perf_counter() >= stop:
+            break
+
+        key = rng.choices(keys, cum_weights=cum_weights)[0]
+        if key == NOTE:
+            note = random_note(rng)
+            started = time.perf_counter()
+            store.add_note(note, on_done=committed(started), on_error=failed)
+        else:
+            spec = specs[key]
+            values, result = spec.calculate(random_inputs(key, spec, rng))
+            started = time.perf_counter()
+            store.add_calculation(spec.calculator_type, spec.summarize(values), spec.saved_text(result),
+                                  f'load-{clinician}', records.make_record(values, result),
+                                  on_done=committed(started), on_error=failed)
+        enqueue.append(time.perf_counter() - started)
+        saves += 1
+
+    store.close(timeout=None)
+    store.completed.put(None)
+    drainer.join()
+    finished = time.time()
+
+    counters = METRICS.snapshot()['counters']
+    return {
+        'saves': saves,
+        'began': began,
+        'finished': finished,
+        'enqueue': enqueue,
+        'commit': commit,
+        'lock_retries': sum(series['value'] for series in counters.get('db_lock_retries_total', ())),
+        'writer_fallbacks': sum(series['value'] for series in counters.get('writer_fallbacks_total', ())),
+        'lock_errors': sum(1 for exc in errors if storage.is_locked(exc)),
+        'errors': [str(exc) for exc in errors],
+    }
+
+
+def run(db_path, clinicians=8, rate=0.5, duration=20.0, mix=None, seed=0,
+        batch_size=50, flush_interval=2.0, writer_socket=None):
+    """One load step against db_path; returns the report dict"""
+    mix = dict(mix or DEFAULT_MIX)
+    calculators = registry.default_registry()
+    unknown = [key for key in mix if key != NOTE and key not in calculators]
+    if unknown:
+        raise ValueError(f"Unknown calculator(s) in mix: {', '.join(unknown)}")
+
+    conn = storage.connect(db_path)
+    schema.migrate(conn)
+    rows_before = conn.execute('SELECT COUNT(*) FROM patient_notes').fetchone()[0]
+    conn.close()
+
+    # Give every process time to start and load its calculators before the clock starts
+    start_at = time.time() + 1.0 + 0.05 * clinicians
+    with ProcessPoolExecutor(clinicians) as pool:
+        futures = [pool.submit(_clinician, db_path, clinician, mix, rate, duration, start_at, seed,
+                               batch_size, flush_interval, writer_socket)
+                   for clinician in range(clinicians)]
+        results = [future.result() for future in futures]
+
+    conn = sqlite3.connect(db_path)
+    rows_added = conn.execute('SELECT COUNT(*) FROM patient_notes').fetchone()[0] - rows_before
+    conn.close()
+
+    enqueue = sorted(sample for result in results for sample in result['enqueue'])
+    commit = sorted(sample for result in results for sample in result['commit'])
+    saves = sum(result['saves'] for result in results)
+    errors = [message for result in results for message in result['errors']]
+    elapsed = max(result['finished'] for result in results) - min(result['began'] for result in results)
+    return {
+        'clinicians': clinicians,
+        'duration_s': duration,
+        'offered_per_s': clinicians * rate if rate > 0 else None,
+        'saves': saves,
+        'committed': len(commit),
+        'rows_added': rows_added,
+        'committed_per_s': len(commit) / elapsed,
+        'enqueue_p50_us': 1e6 * _percentile(enqueue, 0.5),
+        'enqueue_p99_us': 1e6 * _percentile(enqueue, 0.99),
+        'commit_p50_ms': 1000 * _percentile(commit, 0.5),
+        'commit_p99_ms': 1000 * _percentile(commit, 0.99),
+        'commit_max_ms': 1000 * commit[-1] if commit else float('nan'),
+        'lock_retries': sum(result['lock_retries'] for result in results),
+        'lock_retries_per_1k': 1000 * sum(result['lock_retries'] for result in results) / max(saves, 1),
+        'lock_errors': sum(result['lock_errors'] for result in results),
+        'writer_fallbacks': sum(result['writer_fallbacks'] for result in results),
+        'failed': len(errors),
+        'error_rate': len(errors) / max(saves, 1),
+        'error_kinds': sorted(set(errors)),
+    }
+
+
+def _print_report(report):
+    offered = f"{report['offered_per_s']:.1f}" if report['offered_per_s'] is not None else 'max'
+    print(f"{report['clinicians']:>10} {offered:>8} {report['committed_per_s']:>10.1f} "
+          f"{report['enqueue_p99_us']:>10.0f} {report['commit_p50_ms']:>9.1f} {report['commit_p99_ms']:>9.1f} "
+          f"{report['lock_retries']:>8} {report['lock_errors']:>7} {report['failed']:>7}")
+    for message in report['error_kinds']:
+        print(f"{'':>10} {message}")
+
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Load-test saves from many simulated clinicians")
+    parser.add_argument('--clinicians', default='8', help="comma-separated counts, one step each (default 8)")
+    parser.add_argument('--rate', type=float, default=0.5,
+                        help="saves per second per clinician; 0 for as fast as possible (default 0.5)")
+    parser.add_argument('--duration', type=float, default=20.0, help="seconds per step (default 20)")
+    parser.add_argument('--mix', help=f"weights, e.g. 'bmi=3,gcs=1,{NOTE}=1' (default: a ward mix)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--batch-size', type=int, default=50, help="PersistenceWorker batch size")
+    parser.add_argument('--flush-interval', type=float, default=2.0, help="PersistenceWorker flush interval")
+    parser.add_argument('--writer-socket', help="send writes through this writer.py socket")
+    parser.add_argument('--db', help="database to write to, shared by all steps (default: a fresh "
+                                     "temporary file per step)")
+    parser.add_argument('--max-p99-ms', type=float, help="exit 1 if a step's commit p99 is higher")
+    parser.add_argument('-o', '--output', help="write the reports as JSON here")
+    args = parser.parse_args(argv)
+
+    try:
+        steps = [int(count) for count in args.clinicians.split(',')]
+        mix = parse_mix(args.mix) if args.mix else DEFAULT_MIX
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    print(f"{'clinicians':>10} {'offered':>8} {'commit/s':>10} {'enq p99us':>10} {'p50 ms':>9} {'p99 ms':>9} "
+          f"{'retries':>8} {'locked':>7} {'failed':>7}")
+    reports = []
+    for clinicians in steps:
+        with tempfile.TemporaryDirectory() as tmp:
+            try:
+                report = run(args.db or os.path.join(tmp, 'loadtest.db'), clinicians, args.rate, args.duration,
+                             mix, args.seed, args.batch_size, args.flush_interval, args.writer_socket)
+            except ValueError as exc:
+                parser.error(str(exc))
+        reports.append(report)
+        _print_report(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2)
+
+    failed = False
+    for report in reports:
+        if report['failed'] or report['committed'] != report['saves']:
+            failed = True
+        if args.max_p99_ms is not None and report['commit_p99_ms'] > args.max_p99_ms:
+            print(f"{report['clinicians']} clinicians: commit p99 {report['commit_p99_ms']:.1f} ms "
+                  f"exceeds {args.max_p99_ms:g} ms", file=sys.stderr)
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
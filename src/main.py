@@ -11,66 +11,255 @@ Users are responsible for ensuring accuracy before making clinical decisions.
 """
 
 import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext
-import sqlite3
+from tkinter import messagebox
 import os
-import json
-from datetime import datetime
-import math
+import sys
+import time
+from collections import OrderedDict
+
+# fulltext, history, records, rollups, tkinter.ttk and tkinter.scrolledtext are imported where
+# first used, keeping them off the cold-start path
+import metrics
+import registry
+import search_index
+import session
+import storage
+
+HISTORY_ALL = 'All calculators'
+HISTORY_PAGE_SIZE = 100
+HISTORY_SEARCH_LIMIT = 200
+
+# Median time from process launch to first painted frame that
+# `--measure-startup` accepts
+STARTUP_BUDGET_S = 1.0
+
+# Delay after the last keystroke before the calculator list is filtered
+SEARCH_DEBOUNCE_MS = 150
+
+# With live results, how long inputs must stay unchanged before the result is saved
+LIVE_SAVE_DELAY_MS = 2000
+
+# Periods offered by the usage dashboard, in days (the second is the default)
+DASHBOARD_DAYS = (7, 30, 90, 365)
+
+# Calculations kept in the session's recent-calculations list
+SESSION_HISTORY_SIZE = 50
+
+
+def iter_widgets(widget):
+    """Yield every descendant of a widget, depth first"""
+    for child in widget.winfo_children():
+        yield child
+        yield from iter_widgets(child)
+
+
+class CalculatorView:
+    """A built calculator view, kept in the view cache between switches"""
+    
+    def __init__(self, calc_type, frame, cleanups=()):
+        self.calc_type = calc_type
+        self.frame = frame
+        self.cleanups = list(cleanups)  # run on destroy, e.g. to remove variable traces
+        self.initial = {}
+        self.initial_vars = {}
+        
+    def capture(self):
+        """Record the freshly built state of every input and output widget"""
+        for widget in iter_widgets(self.frame):
+            if isinstance(widget, tk.Entry):
+                self.initial[widget] = widget.get()
+            elif isinstance(widget, tk.Text):
+                self.initial[widget] = widget.get('1.0', 'end-1c')
+            elif isinstance(widget, tk.Label):
+                self.initial[widget] = widget.cget('text')
+            elif isinstance(widget, (tk.Radiobutton, tk.Checkbutton)):
+                name = str(widget.cget('variable'))
+                self.initial_vars.setdefault(name, widget.getvar(name))
+                self.initial[widget] = None
+            else:
+                self.initial[widget] = None
+                
+    def reset(self):
+        """Restore the captured state and drop widgets added since (e.g. result labels)"""
+        for name, value in self.initial_vars.items():
+            self.frame.setvar(name, value)
+        for widget in list(iter_widgets(self.frame)):
+            if widget not in self.initial:
+                widget.destroy()
+                continue
+            value = self.initial[widget]
+            if isinstance(widget, tk.Entry):
+                widget.delete(0, 'end')
+                widget.insert(0, value)
+            elif isinstance(widget, tk.Text):
+                widget.delete('1.0', 'end')
+                widget.insert('1.0', value)
+            elif isinstance(widget, tk.Label):
+                widget.config(text=value)
+                
+    def destroy(self):
+        """
+        Destroy the view's widgets and release what Tk still references
+        
+        A variable trace is a Tcl command holding its Python callback, so a
+        traced variable and everything its callback reaches would outlive
+        the destroyed frame unless the trace is removed first.
+        """
+        for cleanup in self.cleanups:
+            cleanup()
+        self.cleanups = []
+        self.initial.clear()
+        self.frame.destroy()
+
 
 class QuickMedCalc:
-    def __init__(self):
+    def __init__(self, db_path=storage.DEFAULT_DB_PATH, view_cache_size=8, keep_view_state=True,
+                 retention_days=None, archive_dir=None, writer_socket=None, live_results=False):
+        """
+        db_path: SQLite database for history and notes
+        view_cache_size: calculator views kept built (least recently used are
+        destroyed first; 0 rebuilds on every switch)
+        keep_view_state: keep inputs and results when returning to a view
+        retention_days: if set, older history is moved to the archive after startup
+        archive_dir: monthly archive databases (default: next to db_path)
+        writer_socket: send saves to this writer.py process (shared terminals)
+        live_results: start with "Live results" on (recalculate while typing)
+        """
         self.root = tk.Tk()
         self.root.title("QuickMed Calc - Clinical Calculator")
         self.root.geometry("900x700")
         self.root.configure(bg='#f0f0f0')
         
-        # Initialize database
-        self.init_database()
-        
-        # Calculator registry - must be defined before creating interface
-        self.calculators = {
-            'bmi': 'BMI Calculator',
-            'bsa': 'Body Surface Area',
-            'creatinine': 'Creatinine Clearance',
-            'gcs': 'Glasgow Coma Scale',
-            'wells': 'Wells Score (DVT)',
-            'apgar': 'APGAR Score',
-            'pediatric': 'Pediatric Dosing',
-            'chads2': 'CHADS₂ Score'
-        }
+        # The persistence worker is created now (saves queue up) but started
+        # only after the first frame is painted
+        self.db_path = db_path
+        self.store = storage.PersistenceWorker(db_path, on_error=self.show_database_error,
+                                               writer_socket=writer_socket)
+        self.retention_days = retention_days
+        self.archive_dir = archive_dir
+        
+        # Built calculator views, least recently used first
+        self.view_cache = OrderedDict()
+        self.view_cache_size = view_cache_size
+        self.keep_view_state = keep_view_state
+        self.current_frame = None
+        self.view_switch_listeners = []  # called as listener(calc_type, seconds, cached)
+        self.live_results = live_results
+        self.live_suspended = False  # set while a view is reset, so no result is saved
+        self.pending_saves = {}      # calculator_type -> saves its settled live result now
+        
+        # This session's calculations, in memory, and the form fillers that
+        # recall them: calculator key -> fill(values)
+        self.session = session.SessionHistory(SESSION_HISTORY_SIZE)
+        self.form_fillers = {}
+        self.lag_probe = None
+        if metrics.METRICS.enabled:
+            self.view_switch_listeners.append(
+                lambda calc_type, seconds, cached: metrics.METRICS.observe(
+                    'view_switch_seconds', seconds, cached=cached))
+        
+        # Calculator metadata - implementations are imported when first opened;
+        # installed plug-in calculators are added after the first frame
+        self.registry = registry.Registry()
+        self.registry.load_manifest()
+        self.calculators = {info.key: info.name for info in self.registry}
+        self.calculator_synonyms = {info.key: info.synonyms for info in self.registry}
+        self.search_index = search_index.SearchIndex()
+        for calc_key, calc_name in self.calculators.items():
+            self.search_index.add(calc_key, calc_name, self.calculator_synonyms.get(calc_key, ()))
+        self.search_after_id = None
         
         # Create main interface
         self.create_main_interface()
         
+        # Flush pending saves on close; everything else waits for the first frame
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after(0, self.finish_startup)
+        
+    def finish_startup(self):
+        """Deferred startup work, run once the main window is on screen"""
+        # Paint anything still pending before starting background work
+        self.root.update_idletasks()
+        self.init_database()
+        self.poll_persistence()
+        self.load_plugin_calculators()
+        # Rollups count older history before retention may archive it
+        import rollups
+        self.run_steps(rollups.backfill_step,
+                       then=self.start_retention if self.retention_days is not None else None)
+        if metrics.METRICS.enabled:
+            self.lag_probe = metrics.LagProbe(self.root)
+            self.lag_probe.start()
+        
     def init_database(self):
-        """Initialize SQLite database for notes and data storage"""
-        self.db_path = 'quickmed_data.db'
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Create notes table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS patient_notes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT,
-                calculator_type TEXT,
-                patient_info TEXT,
-                calculation_result TEXT,
-                notes TEXT
-            )
-        ''')
-        
-        # Create favorites table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS favorites (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                calculator_name TEXT UNIQUE
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        """Start the background worker that owns the SQLite database (connect and migrate run on it)"""
+        if not self.store.is_alive():
+            self.store.start()
+        
+    def load_plugin_calculators(self):
+        """Add calculators registered by installed packages (entry points)"""
+        known = set(self.registry.infos)
+        self.registry.load_entry_points()
+        added = [info for info in self.registry if info.key not in known]
+        for info in added:
+            self.calculators[info.key] = info.name
+            self.calculator_synonyms[info.key] = info.synonyms
+            self.search_index.add(info.key, info.name, info.synonyms)
+            self.add_calculator_button(info.key, info.name)
+        if added:
+            self.filter_calculators()
+        
+    def run_steps(self, step, then=None):
+        """
+        Run step(conn) on the persistence worker until it returns 0, then call then()
+        
+        Each step is a separate job, chained through its completion callback,
+        so saves queued in between are written without waiting for the rest.
+        """
+        def next_step(left=None):
+            if left == 0:
+                if then is not None:
+                    then()
+            else:
+                self.store.submit(step, on_done=next_step)
+                
+        next_step()
+        
+    def get_archive_dir(self):
+        import archive
+        return self.archive_dir or archive.default_archive_dir(self.db_path)
+        
+    def start_retention(self):
+        """
+        Archive history older than retention_days, then compact the file
+        
+        Runs on the persistence worker one small chunk or vacuum step at a
+        time, chained through completion callbacks, so saves keep flowing.
+        """
+        import archive
+        cutoff = int(time.time()) - self.retention_days * archive.DAY_SECONDS
+        archive_dir = self.get_archive_dir()
+        self.run_steps(lambda conn: archive.archive_chunk(conn, archive_dir, cutoff),
+                       then=lambda: self.run_steps(archive.vacuum_step))
+        
+    def poll_persistence(self):
+        """Run completion and error callbacks posted by the persistence worker"""
+        # Rescheduled first, so polling continues whatever a callback does
+        self.root.after(50, self.poll_persistence)
+        self.store.dispatch()
+        
+    def show_database_error(self, exc):
+        """Report a failed database operation"""
+        messagebox.showerror("Database Error", f"A database operation failed:\n{exc}")
+        
+    def on_close(self):
+        """Flush pending saves before the window is destroyed"""
+        if self.lag_probe is not None:
+            self.lag_probe.stop()
+        for save_now in list(self.pending_saves.values()):
+            save_now()
+        self.store.close()
+        self.root.destroy()
         
     def create_main_interface(self):
         """Create the main application interface"""
@@ -83,15 +272,30 @@ class QuickMedCalc:
                               font=('Arial', 20, 'bold'), fg='white', bg='#2c3e50')
         title_label.pack(pady=15)
         
+        header_buttons = tk.Frame(header_frame, bg='#2c3e50')
+        header_buttons.place(relx=1.0, rely=0.5, anchor='e', x=-15)
+        tk.Button(header_buttons, text="History", command=self.show_history,
+                 font=('Arial', 10), bg='#34495e', fg='white',
+                 relief='flat').pack(side='right')
+        tk.Button(header_buttons, text="Dashboard", command=self.show_dashboard,
+                 font=('Arial', 10), bg='#34495e', fg='white',
+                 relief='flat').pack(side='right', padx=(0, 10))
+        
+        self.live_var = tk.BooleanVar(value=self.live_results)
+        tk.Checkbutton(header_frame, text="Live results", variable=self.live_var,
+                       font=('Arial', 10), bg='#2c3e50', fg='white', selectcolor='#34495e',
+                       activebackground='#2c3e50').place(relx=0.0, rely=0.5, anchor='w', x=15)
+        
         # Search frame
         search_frame = tk.Frame(self.root, bg='#f0f0f0')
         search_frame.pack(fill='x', padx=10, pady=10)
         
         tk.Label(search_frame, text="Quick Search:", font=('Arial', 12)).pack(anchor='w')
         self.search_var = tk.StringVar()
-        self.search_var.trace('w', self.filter_calculators)
+        self.search_var.trace('w', self.schedule_filter)
         search_entry = tk.Entry(search_frame, textvariable=self.search_var, font=('Arial', 11))
         search_entry.pack(fill='x', pady=5)
+        search_entry.bind('<Return>', self.open_top_match)
         
         # Main content frame
         main_frame = tk.Frame(self.root, bg='#f0f0f0')
@@ -104,6 +308,18 @@ class QuickMedCalc:
         
         tk.Label(left_panel, text="Medical Calculators", font=('Arial', 12, 'bold')).pack(pady=10)
         
+        # Recent calculations of this session (packed first so the list keeps its space)
+        recent_frame = tk.Frame(left_panel, bg='white')
+        recent_frame.pack(side='bottom', fill='x', padx=10, pady=(0, 10))
+        tk.Label(recent_frame, text="Recent Calculations", font=('Arial', 10, 'bold'),
+                 bg='white').pack(anchor='w')
+        self.recent_list = tk.Listbox(recent_frame, height=6, font=('Arial', 9), activestyle='none')
+        self.recent_list.pack(fill='x', pady=(2, 5))
+        self.recent_list.bind('<Double-Button-1>', self.recall_selected)
+        self.recent_list.bind('<Return>', self.recall_selected)
+        tk.Button(recent_frame, text="Recall into Form", command=self.recall_selected,
+                  font=('Arial', 9)).pack(fill='x')
+        
         # Calculator buttons frame
         self.calc_frame = tk.Frame(left_panel, bg='white')
         self.calc_frame.pack(fill='both', expand=True, padx=10)
@@ -119,29 +335,49 @@ class QuickMedCalc:
         self.show_welcome()
         
     def create_calculator_buttons(self):
-        """Create buttons for all calculators"""
-        for widget in self.calc_frame.winfo_children():
-            widget.destroy()
-            
+        """Create buttons for all calculators (once; filtering shows and hides them)"""
+        self.calc_buttons = {}
+        self.visible_calculators = []
         for calc_key, calc_name in self.calculators.items():
-            if not self.search_var.get() or self.search_var.get().lower() in calc_name.lower():
-                btn = tk.Button(self.calc_frame, text=calc_name,
-                              command=lambda k=calc_key: self.load_calculator(k),
-                              font=('Arial', 10), bg='#3498db', fg='white',
-                              relief='flat', pady=8)
-                btn.pack(fill='x', pady=2)
-                
+            self.add_calculator_button(calc_key, calc_name)
+        self.filter_calculators()
+        
+    def add_calculator_button(self, calc_key, calc_name):
+        """Create (but do not show) the button for one calculator"""
+        self.calc_buttons[calc_key] = tk.Button(self.calc_frame, text=calc_name,
+                                                command=lambda k=calc_key: self.load_calculator(k),
+                                                font=('Arial', 10), bg='#3498db', fg='white',
+                                                relief='flat', pady=8)
+        
+    def schedule_filter(self, *args):
+        """Debounce keystrokes: filter once typing pauses"""
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(SEARCH_DEBOUNCE_MS, self.filter_calculators)
+        
     def filter_calculators(self, *args):
-        """Filter calculator list based on search"""
-        self.create_calculator_buttons()
+        """Show matching calculator buttons, best match first"""
+        self.search_after_id = None
+        with metrics.METRICS.timer('search_seconds'):
+            matches = self.search_index.search(self.search_var.get())
+            if matches == self.visible_calculators:
+                return
+            for calc_key in self.visible_calculators:
+                self.calc_buttons[calc_key].pack_forget()
+            for calc_key in matches:
+                self.calc_buttons[calc_key].pack(fill='x', pady=2)
+            self.visible_calculators = matches
+        
+    def open_top_match(self, event=None):
+        """Open the best match for the current search (Enter in the search box)"""
+        self.filter_calculators()
+        if self.visible_calculators:
+            self.load_calculator(self.visible_calculators[0])
         
     def show_welcome(self):
         """Show welcome message"""
-        for widget in self.right_panel.winfo_children():
-            widget.destroy()
-            
         welcome_frame = tk.Frame(self.right_panel, bg='white')
-        welcome_frame.pack(fill='both', expand=True, padx=20, pady=20)
+        self.show_frame(welcome_frame)
         
         tk.Label(welcome_frame, text="Welcome to QuickMed Calc", 
                 font=('Arial', 18, 'bold')).pack(pady=20)
@@ -162,33 +398,69 @@ class QuickMedCalc:
             "All calculations should be validated against current clinical guidelines.")
         disclaimer.config(state='disabled')
         
+    def show_frame(self, frame):
+        """Swap the frame shown in the right panel"""
+        if self.current_frame is not None:
+            self.current_frame.pack_forget()
+        frame.pack(fill='both', expand=True, padx=20, pady=20)
+        self.current_frame = frame
+        
     def load_calculator(self, calc_type):
-        """Load specific calculator interface"""
-        # Clear right panel
-        for widget in self.right_panel.winfo_children():
-            widget.destroy()
+        """Show a calculator interface, building it only on first use"""
+        started = time.perf_counter()
+        
+        view = self.view_cache.get(calc_type)
+        cached = view is not None
+        if cached:
+            self.view_cache.move_to_end(calc_type)
+            if not self.keep_view_state:
+                self.live_suspended = True
+                try:
+                    view.reset()
+                finally:
+                    self.live_suspended = False
+        else:
+            view = self.build_view(calc_type)
+            self.view_cache[calc_type] = view
+            
+        self.show_frame(view.frame)
+        self.evict_views()
+        
+        if self.view_switch_listeners:
+            # Include geometry and layout so the figure matches what the user waits for
+            self.root.update_idletasks()
+            elapsed = time.perf_counter() - started
+            for listener in self.view_switch_listeners:
+                listener(calc_type, elapsed, cached)
+                
+    def evict_views(self):
+        """Destroy least recently used views beyond view_cache_size"""
+        for calc_type in list(self.view_cache):
+            if len(self.view_cache) <= self.view_cache_size:
+                break
+            view = self.view_cache[calc_type]
+            if view.frame is self.current_frame:
+                continue
+            del self.view_cache[calc_type]
+            view.destroy()
             
-        if calc_type == 'bmi':
-            self.create_bmi_calculator()
-        elif calc_type == 'bsa':
-            self.create_bsa_calculator()
-        elif calc_type == 'creatinine':
-            self.create_creatinine_calculator()
-        elif calc_type == 'gcs':
-            self.create_gcs_calculator()
-        elif calc_type == 'wells':
-            self.create_wells_calculator()
-        elif calc_type == 'apgar':
-            self.create_apgar_calculator()
-        elif calc_type == 'pediatric':
-            self.create_pediatric_calculator()
-        elif calc_type == 'chads2':
-            self.create_chads2_calculator()
+    def build_view(self, calc_type):
+        """Build the widgets of one calculator"""
+        spec = self.registry.spec(calc_type)
+        if spec.view is not None:
+            spec.view(self, spec)
+        else:
+            self.create_form_calculator(spec, calc_type)
             
+        view = CalculatorView(calc_type, self.view_frame, self.view_cleanups)
+        view.capture()
+        return view
+        
     def create_calculator_frame(self, title):
-        """Create common calculator frame structure"""
+        """Create common calculator frame structure (shown later by load_calculator)"""
         main_frame = tk.Frame(self.right_panel, bg='white')
-        main_frame.pack(fill='both', expand=True, padx=20, pady=20)
+        self.view_frame = main_frame
+        self.view_cleanups = []
         
         # Title
         tk.Label(main_frame, text=title, font=('Arial', 16, 'bold')).pack(pady=(0, 20))
@@ -207,465 +479,428 @@ class QuickMedCalc:
         
         return calc_frame, result_frame, notes_frame
         
-    def create_bmi_calculator(self):
-        """BMI Calculator"""
-        calc_frame, result_frame, notes_frame = self.create_calculator_frame("BMI Calculator")
-        
-        # Input fields
-        tk.Label(calc_frame, text="Weight (kg):").grid(row=0, column=0, sticky='w', pady=5)
-        weight_entry = tk.Entry(calc_frame)
-        weight_entry.grid(row=0, column=1, padx=10, pady=5)
-        
-        tk.Label(calc_frame, text="Height (cm):").grid(row=1, column=0, sticky='w', pady=5)
-        height_entry = tk.Entry(calc_frame)
-        height_entry.grid(row=1, column=1, padx=10, pady=5)
-        
-        # Result display
-        result_label = tk.Label(result_frame, text="BMI: -- | Category: --", 
-                               font=('Arial', 12, 'bold'))
-        result_label.pack(pady=10)
-        
-        def calculate_bmi():
-            try:
-                weight = float(weight_entry.get())
-                height = float(height_entry.get()) / 100  # Convert cm to m
-                bmi = weight / (height ** 2)
-                
-                # Determine category
-                if bmi < 18.5:
-                    category = "Underweight"
-                elif 18.5 <= bmi < 25:
-                    category = "Normal weight"
-                elif 25 <= bmi < 30:
-                    category = "Overweight"
+    def create_form_calculator(self, spec, calc_key=None):
+        """Build a calculator form from its declarative spec"""
+        import records
+        
+        calc_frame, result_frame, notes_frame = self.create_calculator_frame(spec.title)
+        
+        # Input fields: name -> function returning the raw value, and
+        # name -> function showing a typed value; live_vars are traced to
+        # recalculate as the inputs change
+        getters = {}
+        setters = {}
+        live_vars = []
+        traces = []  # (variable, callback name), removed when the view is destroyed
+        row = column = 0
+        base_row = 0
+        for field in spec.inputs:
+            if isinstance(field, registry.Number):
+                tk.Label(calc_frame, text=field.label).grid(row=row, column=0, sticky='w', pady=5)
+                var = tk.StringVar()
+                entry = tk.Entry(calc_frame, textvariable=var)
+                entry.grid(row=row, column=1, padx=10, pady=5)
+                getters[field.name] = entry.get
+                setters[field.name] = lambda value, var=var: var.set(_entry_text(value))
+                live_vars.append(var)
+                row += 1
+            elif isinstance(field, registry.Autocomplete):
+                from tkinter import ttk
+
+                tk.Label(calc_frame, text=field.label).grid(row=row, column=0, sticky='w', pady=5)
+                var = tk.StringVar()
+                combo = ttk.Combobox(calc_frame, textvariable=var, values=field.source.complete(''))
+                combo.grid(row=row, column=1, padx=10, pady=5)
+                traces.append((var, var.trace('w', lambda *args, var=var, combo=combo, source=field.source:
+                                              combo.config(values=source.complete(var.get())))))
+                getters[field.name] = var.get
+                setters[field.name] = lambda value, var=var: var.set(value or '')
+                live_vars.append(var)
+                row += 1
+                disclaimer = getattr(field.source, 'disclaimer', '')
+                if disclaimer:
+                    tk.Label(calc_frame, text=disclaimer, font=('Arial', 8), fg='#c0392b', bg='white',
+                             wraplength=420, justify='left').grid(row=row, column=0, columnspan=2,
+                                                                  sticky='w', pady=(0, 5))
+                    row += 1
+            elif isinstance(field, registry.Choice) and field.inline:
+                var = tk.StringVar(value=field.default) if isinstance(field.default, str) else tk.IntVar(value=field.default)
+                tk.Label(calc_frame, text=field.label).grid(row=row, column=0, sticky='w', pady=5)
+                choice_frame = tk.Frame(calc_frame, bg='white')
+                choice_frame.grid(row=row, column=1, sticky='w', padx=10, pady=5)
+                for value, text in field.options:
+                    tk.Radiobutton(choice_frame, text=text, variable=var, value=value, bg='white').pack(side='left')
+                getters[field.name] = var.get
+                setters[field.name] = var.set
+                live_vars.append(var)
+                row += 1
+            elif isinstance(field, registry.Choice):
+                # Heading with one option per row; 'columns' layout puts groups side by side
+                var = tk.StringVar(value=field.default) if isinstance(field.default, str) else tk.IntVar(value=field.default)
+                padx = (20, 0) if column else 0
+                tk.Label(calc_frame, text=field.label, font=('Arial', 10, 'bold')).grid(
+                    row=row, column=column, sticky='w', pady=(10, 5), padx=padx)
+                for i, (value, text) in enumerate(field.options):
+                    tk.Radiobutton(calc_frame, text=text, variable=var, value=value,
+                                   bg='white').grid(row=row + i + 1, column=column, sticky='w', padx=padx)
+                getters[field.name] = var.get
+                setters[field.name] = var.set
+                live_vars.append(var)
+                if spec.layout == 'columns':
+                    base_row = max(base_row, row + len(field.options) + 1)
+                    column += 1
                 else:
-                    category = "Obese"
-                    
-                result_text = f"BMI: {bmi:.1f} | Category: {category}"
-                result_label.config(text=result_text)
-                
-                # Save to database
-                self.save_calculation('BMI', f"Weight: {weight}kg, Height: {height_entry.get()}cm", result_text)
-                
-            except ValueError:
-                messagebox.showerror("Error", "Please enter valid numbers")
-                
-        tk.Button(calc_frame, text="Calculate BMI", command=calculate_bmi,
-                 bg='#2ecc71', fg='white', font=('Arial', 10)).grid(row=2, column=0, columnspan=2, pady=10)
-        
-        # Notes section
-        self.create_notes_section(notes_frame)
-        
-    def create_bsa_calculator(self):
-        """Body Surface Area Calculator (Mosteller formula)"""
-        calc_frame, result_frame, notes_frame = self.create_calculator_frame("Body Surface Area (BSA)")
-        
-        tk.Label(calc_frame, text="Weight (kg):").grid(row=0, column=0, sticky='w', pady=5)
-        weight_entry = tk.Entry(calc_frame)
-        weight_entry.grid(row=0, column=1, padx=10, pady=5)
-        
-        tk.Label(calc_frame, text="Height (cm):").grid(row=1, column=0, sticky='w', pady=5)
-        height_entry = tk.Entry(calc_frame)
-        height_entry.grid(row=1, column=1, padx=10, pady=5)
+                    row += len(field.options) + 1
+            elif isinstance(field, registry.Checklist):
+                criterion_vars = []
+                for criterion, points in field.criteria:
+                    var = tk.IntVar()
+                    criterion_vars.append(var)
+                    if field.signed:
+                        text = f"{criterion} ({points:+d} point{'s' if abs(points) != 1 else ''})"
+                    else:
+                        text = f"{criterion} ({points} point{'s' if points > 1 else ''})"
+                    tk.Checkbutton(calc_frame, text=text, variable=var, bg='white', anchor='w',
+                                   justify='left').grid(row=row, column=0, sticky='w', pady=2, padx=5)
+                    row += 1
+                getters[field.name] = lambda criterion_vars=criterion_vars: [var.get() for var in criterion_vars]
+                setters[field.name] = lambda flags, criterion_vars=criterion_vars: [
+                    var.set(flag) for var, flag in zip(criterion_vars, flags)]
+                live_vars.extend(criterion_vars)
+            elif isinstance(field, registry.ChoiceList):
+                group_vars = []
+                for label, options in field.groups:
+                    tk.Label(calc_frame, text=label, font=('Arial', 10, 'bold')).grid(
+                        row=row, column=0, sticky='w', pady=(10, 0))
+                    var = tk.IntVar()
+                    group_vars.append(var)
+                    for i, (value, text) in enumerate(options):
+                        tk.Radiobutton(calc_frame, text=text, variable=var, value=value,
+                                       bg='white').grid(row=row + i + 1, column=0, sticky='w', padx=20)
+                    row += len(options) + 1
+                getters[field.name] = lambda group_vars=group_vars: [var.get() for var in group_vars]
+                setters[field.name] = lambda scores, group_vars=group_vars: [
+                    var.set(score) for var, score in zip(group_vars, scores)]
+                live_vars.extend(group_vars)
+            else:
+                raise TypeError(f"Unsupported input field: {field!r}")
+        row = max(row, base_row)
         
-        result_label = tk.Label(result_frame, text="BSA: -- m²", font=('Arial', 12, 'bold'))
+        result_label = tk.Label(result_frame, text=spec.placeholder, font=('Arial', 12, 'bold'),
+                                justify='left')
         result_label.pack(pady=10)
         
-        def calculate_bsa():
-            try:
-                weight = float(weight_entry.get())
-                height = float(height_entry.get())
-                # Mosteller formula
-                bsa = math.sqrt((weight * height) / 3600)
-                
-                result_text = f"BSA: {bsa:.2f} m² (Mosteller formula)"
-                result_label.config(text=result_text)
-                
-                self.save_calculation('BSA', f"Weight: {weight}kg, Height: {height}cm", result_text)
-                
-            except ValueError:
-                messagebox.showerror("Error", "Please enter valid numbers")
-                
-        tk.Button(calc_frame, text="Calculate BSA", command=calculate_bsa,
-                 bg='#2ecc71', fg='white', font=('Arial', 10)).grid(row=2, column=0, columnspan=2, pady=10)
-        
-        self.create_notes_section(notes_frame)
-        
-    def create_creatinine_calculator(self):
-        """Creatinine Clearance Calculator (Cockcroft-Gault)"""
-        calc_frame, result_frame, notes_frame = self.create_calculator_frame("Creatinine Clearance (Cockcroft-Gault)")
-        
-        tk.Label(calc_frame, text="Age (years):").grid(row=0, column=0, sticky='w', pady=5)
-        age_entry = tk.Entry(calc_frame)
-        age_entry.grid(row=0, column=1, padx=10, pady=5)
-        
-        tk.Label(calc_frame, text="Weight (kg):").grid(row=1, column=0, sticky='w', pady=5)
-        weight_entry = tk.Entry(calc_frame)
-        weight_entry.grid(row=1, column=1, padx=10, pady=5)
-        
-        tk.Label(calc_frame, text="Serum Creatinine (mg/dL):").grid(row=2, column=0, sticky='w', pady=5)
-        creat_entry = tk.Entry(calc_frame)
-        creat_entry.grid(row=2, column=1, padx=10, pady=5)
-        
-        gender_var = tk.StringVar(value="male")
-        tk.Label(calc_frame, text="Gender:").grid(row=3, column=0, sticky='w', pady=5)
-        gender_frame = tk.Frame(calc_frame, bg='white')
-        gender_frame.grid(row=3, column=1, sticky='w', padx=10, pady=5)
-        tk.Radiobutton(gender_frame, text="Male", variable=gender_var, value="male", bg='white').pack(side='left')
-        tk.Radiobutton(gender_frame, text="Female", variable=gender_var, value="female", bg='white').pack(side='left')
+        # Inputs of the last saved result, so the same calculation is saved once
+        # however often Calculate is pressed; after_id: pending live save
+        state = {'saved': None, 'after_id': None}
         
-        result_label = tk.Label(result_frame, text="Creatinine Clearance: -- mL/min", 
-                               font=('Arial', 12, 'bold'))
-        result_label.pack(pady=10)
-        
-        def calculate_creatinine():
-            try:
-                age = float(age_entry.get())
-                weight = float(weight_entry.get())
-                creatinine = float(creat_entry.get())
-                gender = gender_var.get()
+        def evaluate():
+            with metrics.METRICS.timer('calculation_seconds', calculator_type=spec.calculator_type):
+                return spec.calculate({name: get() for name, get in getters.items()})
                 
-                # Cockcroft-Gault formula
-                clcr = ((140 - age) * weight) / (72 * creatinine)
-                if gender == "female":
-                    clcr *= 0.85
-                    
-                # Interpretation
-                if clcr >= 90:
-                    interpretation = "Normal"
-                elif clcr >= 60:
-                    interpretation = "Mild decrease"
-                elif clcr >= 30:
-                    interpretation = "Moderate decrease"
-                elif clcr >= 15:
-                    interpretation = "Severe decrease"
-                else:
-                    interpretation = "Kidney failure"
-                
-                result_text = f"CrCl: {clcr:.1f} mL/min ({interpretation})"
-                result_label.config(text=result_text)
-                
-                self.save_calculation('Creatinine Clearance', 
-                                    f"Age: {age}, Weight: {weight}kg, SCr: {creatinine}mg/dL, {gender}", 
-                                    result_text)
+        def save(values, result):
+            if values == state['saved']:
+                return
+            state['saved'] = values
+            self.save_calculation(spec.calculator_type, spec.summarize(values), spec.saved_text(result),
+                                  record=records.make_record(values, result),
+                                  values=values, calc_key=calc_key)
+            
+        def cancel_pending_save():
+            if state['after_id'] is not None:
+                self.root.after_cancel(state['after_id'])
+                state['after_id'] = None
+                self.pending_saves.pop(spec.calculator_type, None)
                 
-            except ValueError:
-                messagebox.showerror("Error", "Please enter valid numbers")
+        def calculate():
+            cancel_pending_save()
+            try:
+                values, result = evaluate()
+            except ValueError as exc:
+                metrics.METRICS.inc('calculation_errors_total', calculator_type=spec.calculator_type)
+                messagebox.showerror("Error", str(exc))
+                return
                 
-        tk.Button(calc_frame, text="Calculate CrCl", command=calculate_creatinine,
-                 bg='#2ecc71', fg='white', font=('Arial', 10)).grid(row=4, column=0, columnspan=2, pady=10)
-        
-        self.create_notes_section(notes_frame)
-        
-    def create_gcs_calculator(self):
-        """Glasgow Coma Scale Calculator"""
-        calc_frame, result_frame, notes_frame = self.create_calculator_frame("Glasgow Coma Scale (GCS)")
-        
-        # Eye Opening
-        tk.Label(calc_frame, text="Eye Opening:", font=('Arial', 10, 'bold')).grid(row=0, column=0, sticky='w', pady=(10,5))
-        eye_var = tk.IntVar()
-        eye_options = [
-            (4, "Spontaneous"),
-            (3, "To voice"),
-            (2, "To pain"),
-            (1, "None")
-        ]
-        
-        for i, (score, description) in enumerate(eye_options):
-            tk.Radiobutton(calc_frame, text=f"{score}: {description}", 
-                          variable=eye_var, value=score, bg='white').grid(row=i+1, column=0, sticky='w')
-        
-        # Verbal Response
-        tk.Label(calc_frame, text="Verbal Response:", font=('Arial', 10, 'bold')).grid(row=0, column=1, sticky='w', pady=(10,5), padx=(20,0))
-        verbal_var = tk.IntVar()
-        verbal_options = [
-            (5, "Oriented"),
-            (4, "Confused"),
-            (3, "Inappropriate words"),
-            (2, "Incomprehensible"),
-            (1, "None")
-        ]
-        
-        for i, (score, description) in enumerate(verbal_options):
-            tk.Radiobutton(calc_frame, text=f"{score}: {description}", 
-                          variable=verbal_var, value=score, bg='white').grid(row=i+1, column=1, sticky='w', padx=(20,0))
-        
-        # Motor Response
-        tk.Label(calc_frame, text="Motor Response:", font=('Arial', 10, 'bold')).grid(row=0, column=2, sticky='w', pady=(10,5), padx=(20,0))
-        motor_var = tk.IntVar()
-        motor_options = [
-            (6, "Obeys commands"),
-            (5, "Localizes pain"),
-            (4, "Withdraws from pain"),
-            (3, "Flexion to pain"),
-            (2, "Extension to pain"),
-            (1, "None")
-        ]
-        
-        for i, (score, description) in enumerate(motor_options):
-            tk.Radiobutton(calc_frame, text=f"{score}: {description}", 
-                          variable=motor_var, value=score, bg='white').grid(row=i+1, column=2, sticky='w', padx=(20,0))
-        
-        result_label = tk.Label(result_frame, text="GCS: -- | Interpretation: --", 
-                               font=('Arial', 12, 'bold'))
-        result_label.pack(pady=10)
-        
-        def calculate_gcs():
-            eye = eye_var.get()
-            verbal = verbal_var.get()
-            motor = motor_var.get()
+            result_label.config(text=spec.display(result, values))
+            save(values, result)
             
-            if eye == 0 or verbal == 0 or motor == 0:
-                messagebox.showwarning("Warning", "Please select all GCS components")
+        def recalculate(*args):
+            if not self.live_var.get() or self.live_suspended:
                 return
-                
-            total = eye + verbal + motor
+            cancel_pending_save()
+            try:
+                values, result = evaluate()
+            except ValueError:
+                # Incomplete input while typing: no dialog, just no result yet
+                result_label.config(text=spec.placeholder)
+                return
+            result_label.config(text=spec.display(result, values))
             
-            # Interpretation
-            if total >= 13:
-                interpretation = "Mild brain injury"
-            elif total >= 9:
-                interpretation = "Moderate brain injury"
-            else:
-                interpretation = "Severe brain injury"
+            def settle():
+                state['after_id'] = None
+                self.pending_saves.pop(spec.calculator_type, None)
+                save(values, result)
                 
-            result_text = f"GCS: {total}/15 (E{eye}V{verbal}M{motor}) | {interpretation}"
-            result_label.config(text=result_text)
+            state['after_id'] = self.root.after(LIVE_SAVE_DELAY_MS, settle)
+            self.pending_saves[spec.calculator_type] = settle
             
-            self.save_calculation('GCS', f"E{eye}V{verbal}M{motor}", result_text)
-            
-        tk.Button(calc_frame, text="Calculate GCS", command=calculate_gcs,
-                 bg='#2ecc71', fg='white', font=('Arial', 10)).grid(row=7, column=0, columnspan=3, pady=20)
-        
-        self.create_notes_section(notes_frame)
-        
-    def create_wells_calculator(self):
-        """Wells Score for DVT Calculator"""
-        calc_frame, result_frame, notes_frame = self.create_calculator_frame("Wells Score for DVT")
-        
-        # Create variables for each criterion
-        criteria = [
-            ("Active cancer (treatment ongoing or within 6 months)", 1),
-            ("Paralysis, paresis, or recent plaster immobilization", 1),
-            ("Recently bedridden for >3 days or major surgery within 12 weeks", 1),
-            ("Localized tenderness along distribution of deep venous system", 1),
-            ("Entire leg swollen", 1),
-            ("Calf swelling >3 cm compared to asymptomatic leg", 1),
-            ("Pitting edema confined to symptomatic leg", 1),
-            ("Collateral superficial veins (non-varicose)", 1),
-            ("Previously documented DVT", 1),
-            ("Alternative diagnosis at least as likely as DVT", -2)
-        ]
-        
-        criterion_vars = []
-        for i, (criterion, points) in enumerate(criteria):
-            var = tk.IntVar()
-            criterion_vars.append((var, points))
-            cb = tk.Checkbutton(calc_frame, text=f"{criterion} ({points:+d} point{'s' if abs(points) != 1 else ''})",
-                               variable=var, bg='white', anchor='w', justify='left')
-            cb.grid(row=i, column=0, sticky='w', pady=2, padx=5)
-        
-        result_label = tk.Label(result_frame, text="Wells Score: -- | Risk: --", 
-                               font=('Arial', 12, 'bold'))
-        result_label.pack(pady=10)
-        
-        def calculate_wells():
-            total_score = sum(var.get() * points for var, points in criterion_vars)
+        for var in live_vars:
+            traces.append((var, var.trace('w', recalculate)))
             
-            # Risk interpretation
-            if total_score >= 2:
-                risk = "High (DVT likely - consider imaging)"
-            elif total_score >= 1:
-                risk = "Moderate"
-            else:
-                risk = "Low (DVT unlikely)"
-                
-            result_text = f"Wells Score: {total_score} | Risk: {risk}"
-            result_label.config(text=result_text)
+        def fill(values):
+            """Show recalled inputs and their result; already saved, so not saved again"""
+            cancel_pending_save()
+            self.live_suspended = True
+            try:
+                for name, value in values.items():
+                    setters[name](value)
+            finally:
+                self.live_suspended = False
+            result_label.config(text=spec.display(spec.compute(values), values))
+            state['saved'] = values
             
-            # Create summary of selected criteria
-            selected = [criteria[i][0] for i, (var, _) in enumerate(criterion_vars) if var.get()]
-            summary = "; ".join(selected) if selected else "No criteria selected"
+        if calc_key is not None:
+            self.form_fillers[calc_key] = fill
             
-            self.save_calculation('Wells DVT', summary, result_text)
+        def release():
+            # A live result still waiting to settle is saved now rather than dropped
+            save_now = self.pending_saves.get(spec.calculator_type) if state['after_id'] is not None else None
+            cancel_pending_save()
+            if save_now is not None:
+                save_now()
+            for var, callback in traces:
+                var.trace_vdelete('w', callback)
+            if self.form_fillers.get(calc_key) is fill:
+                del self.form_fillers[calc_key]
+                
+        self.view_cleanups.append(release)
             
-        tk.Button(calc_frame, text="Calculate Wells Score", command=calculate_wells,
-                 bg='#2ecc71', fg='white', font=('Arial', 10)).grid(row=len(criteria), column=0, pady=20)
+        tk.Button(calc_frame, text=spec.button_text, command=calculate,
+                 bg='#2ecc71', fg='white', font=('Arial', 10)).grid(row=row, column=0, columnspan=max(column, 2),
+                                                                    pady=10)
         
         self.create_notes_section(notes_frame)
         
-    def create_apgar_calculator(self):
-        """APGAR Score Calculator"""
-        calc_frame, result_frame, notes_frame = self.create_calculator_frame("APGAR Score")
-        
-        # APGAR criteria
-        criteria = [
-            ("Heart Rate", ["Absent", "< 100 bpm", "> 100 bpm"]),
-            ("Respiratory Effort", ["Absent", "Weak cry", "Strong cry"]),
-            ("Muscle Tone", ["Flaccid", "Some flexion", "Active motion"]),
-            ("Reflex Response", ["No response", "Grimace", "Cry/cough"]),
-            ("Color", ["Blue/pale", "Body pink, extremities blue", "Completely pink"])
-        ]
-        
-        apgar_vars = []
-        for i, (criterion, options) in enumerate(criteria):
-            tk.Label(calc_frame, text=f"{criterion}:", font=('Arial', 10, 'bold')).grid(row=i*4, column=0, sticky='w', pady=(10,0))
+    def history_types(self):
+        """Filter choices for the history browser: every calculator_type plus notes"""
+        types = [info.calculator_type for info in self.registry]
+        return (HISTORY_ALL,) + tuple(dict.fromkeys(types)) + (storage.NOTE_TYPE,)
+        
+    def show_history(self):
+        """
+        Browse saved calculations, newest first, filtered by type and date;
+        with search words, the best full-text matches instead
+        """
+        from tkinter import ttk
+        import fulltext
+        import history
+        
+        window = tk.Toplevel(self.root)
+        window.title("Calculation History")
+        window.geometry("850x500")
+        
+        # Filters
+        filter_frame = tk.Frame(window)
+        filter_frame.pack(fill='x', padx=10, pady=10)
+        
+        tk.Label(filter_frame, text="Calculator:").pack(side='left')
+        type_var = tk.StringVar(value=HISTORY_ALL)
+        ttk.Combobox(filter_frame, textvariable=type_var, values=self.history_types(),
+                     state='readonly', width=22).pack(side='left', padx=5)
+        
+        tk.Label(filter_frame, text="From (YYYY-MM-DD):").pack(side='left', padx=(10, 0))
+        from_entry = tk.Entry(filter_frame, width=12)
+        from_entry.pack(side='left', padx=5)
+        
+        tk.Label(filter_frame, text="To:").pack(side='left')
+        to_entry = tk.Entry(filter_frame, width=12)
+        to_entry.pack(side='left', padx=5)
+        
+        search_frame = tk.Frame(window)
+        search_frame.pack(fill='x', padx=10, pady=(0, 10))
+        tk.Label(search_frame, text="Search notes:").pack(side='left')
+        search_entry = tk.Entry(search_frame, width=40)
+        search_entry.pack(side='left', padx=5)
+        
+        # Results
+        columns = ('time', 'calculator', 'result', 'details')
+        tree = ttk.Treeview(window, columns=columns, show='headings')
+        for column, heading, width in zip(columns, ("Time", "Calculator", "Result", "Inputs / Notes"),
+                                          (140, 130, 300, 260)):
+            tree.heading(column, text=heading)
+            tree.column(column, width=width, anchor='w')
+        tree.pack(fill='both', expand=True, padx=10)
+        
+        # Keyset pagination: cursors[i] is the cursor that loads page i
+        nav_frame = tk.Frame(window)
+        nav_frame.pack(fill='x', padx=10, pady=10)
+        page_label = tk.Label(nav_frame, text="")
+        state = {'cursors': [None], 'next': None, 'filters': {}, 'search': ''}
+        
+        def show_page(page):
+            if not window.winfo_exists():
+                return
+            tree.delete(*tree.get_children())
+            for row in page.rows:
+                tree.insert('', 'end', values=(row.timestamp, row.calculator_type,
+                                               row.calculation_result or '', row.notes or ''))
+            state['next'] = page.next_cursor
+            page_label.config(text=f"Page {len(state['cursors'])}")
+            newer_button.config(state='normal' if len(state['cursors']) > 1 else 'disabled')
+            older_button.config(state='normal' if page.next_cursor else 'disabled')
             
-            var = tk.IntVar()
-            apgar_vars.append(var)
+        def show_matches(hits):
+            if not window.winfo_exists():
+                return
+            tree.delete(*tree.get_children())
+            for hit in hits:
+                details = ' | '.join(part for part in (hit.patient_info, hit.notes) if part)
+                tree.insert('', 'end', values=(hit.timestamp, hit.calculator_type,
+                                               hit.calculation_result or '', details))
+            page_label.config(text=f"{len(hits)} best matches")
+            newer_button.config(state='disabled')
+            older_button.config(state='disabled')
             
-            for j, option in enumerate(options):
-                tk.Radiobutton(calc_frame, text=f"{j}: {option}", 
-                              variable=var, value=j, bg='white').grid(row=i*4+j+1, column=0, sticky='w', padx=20)
-        
-        result_label = tk.Label(result_frame, text="APGAR Score: -- | Status: --", 
-                               font=('Arial', 12, 'bold'))
-        result_label.pack(pady=10)
-        
-        def calculate_apgar():
-            total_score = sum(var.get() for var in apgar_vars)
+        def search_failed(exc):
+            messagebox.showerror("Search Error", f"Full-text search is not available: {exc}", parent=window)
             
-            # Interpretation
-            if total_score >= 7:
-                status = "Normal"
-            elif total_score >= 4:
-                status = "Moderately depressed"
+        def load_page():
+            filters = state['filters']
+            if state['search']:
+                text = state['search']
+                self.store.submit(lambda conn: fulltext.search_notes(conn, text, limit=HISTORY_SEARCH_LIMIT,
+                                                                     start_mark='\u00ab', end_mark='\u00bb',
+                                                                     **filters),
+                                  on_done=show_matches, on_error=search_failed)
+                return
+            cursor = state['cursors'][-1]
+            if archived_var.get():
+                import archive
+                archive_dir = self.get_archive_dir()
+                query = lambda conn: archive.query_history_all(conn, archive_dir, cursor=cursor,
+                                                               limit=HISTORY_PAGE_SIZE, **filters)
             else:
-                status = "Severely depressed"
-                
-            result_text = f"APGAR Score: {total_score}/10 | Status: {status}"
-            result_label.config(text=result_text)
-            
-            # Create detailed breakdown
-            breakdown = [f"{criteria[i][0]}: {var.get()}" for i, var in enumerate(apgar_vars)]
-            summary = "; ".join(breakdown)
-            
-            self.save_calculation('APGAR', summary, result_text)
+                query = lambda conn: history.query_history(conn, cursor=cursor,
+                                                           limit=HISTORY_PAGE_SIZE, **filters)
+            self.store.submit(query, on_done=show_page)
             
-        tk.Button(calc_frame, text="Calculate APGAR", command=calculate_apgar,
-                 bg='#2ecc71', fg='white', font=('Arial', 10)).grid(row=len(criteria)*4+1, column=0, pady=20)
-        
-        self.create_notes_section(notes_frame)
-        
-    def create_pediatric_calculator(self):
-        """Pediatric Weight-Based Dosing Calculator"""
-        calc_frame, result_frame, notes_frame = self.create_calculator_frame("Pediatric Dosing Calculator")
-        
-        tk.Label(calc_frame, text="Child's Weight (kg):").grid(row=0, column=0, sticky='w', pady=5)
-        weight_entry = tk.Entry(calc_frame)
-        weight_entry.grid(row=0, column=1, padx=10, pady=5)
-        
-        tk.Label(calc_frame, text="Dose per kg (mg/kg):").grid(row=1, column=0, sticky='w', pady=5)
-        dose_entry = tk.Entry(calc_frame)
-        dose_entry.grid(row=1, column=1, padx=10, pady=5)
-        
-        tk.Label(calc_frame, text="Frequency (doses per day):").grid(row=2, column=0, sticky='w', pady=5)
-        freq_entry = tk.Entry(calc_frame)
-        freq_entry.grid(row=2, column=1, padx=10, pady=5)
-        
-        result_text = tk.Text(result_frame, height=6, width=50)
-        result_text.pack(pady=10)
-        
-        def calculate_pediatric_dose():
+        def apply_filters():
             try:
-                weight = float(weight_entry.get())
-                dose_per_kg = float(dose_entry.get())
-                frequency = int(freq_entry.get())
-                
-                total_daily_dose = weight * dose_per_kg
-                single_dose = total_daily_dose / frequency
-                
-                results = f"""Pediatric Dosing Calculation:
-                
-Child's Weight: {weight} kg
-Dose: {dose_per_kg} mg/kg
-
-Single Dose: {single_dose:.1f} mg
-Total Daily Dose: {total_daily_dose:.1f} mg
-Frequency: {frequency} times per day
-
-Note: Always verify against pediatric dosing guidelines and maximum adult doses."""
-                
-                result_text.delete(1.0, tk.END)
-                result_text.insert(1.0, results)
-                
-                summary = f"Weight: {weight}kg, {dose_per_kg}mg/kg, {frequency}x/day"
-                calc_result = f"Single dose: {single_dose:.1f}mg, Daily: {total_daily_dose:.1f}mg"
-                self.save_calculation('Pediatric Dosing', summary, calc_result)
-                
+                start = from_entry.get().strip()
+                end = to_entry.get().strip()
+                state['filters'] = {
+                    'calculator_type': None if type_var.get() == HISTORY_ALL else type_var.get(),
+                    'start': history.day_start(start) if start else None,
+                    'end': history.day_end(end) if end else None,
+                }
             except ValueError:
-                messagebox.showerror("Error", "Please enter valid numbers")
-                
-        tk.Button(calc_frame, text="Calculate Dose", command=calculate_pediatric_dose,
-                 bg='#2ecc71', fg='white', font=('Arial', 10)).grid(row=3, column=0, columnspan=2, pady=10)
-        
-        self.create_notes_section(notes_frame)
-        
-    def create_chads2_calculator(self):
-        """CHADS₂ Score Calculator for Stroke Risk"""
-        calc_frame, result_frame, notes_frame = self.create_calculator_frame("CHADS₂ Score (Stroke Risk)")
-        
-        criteria = [
-            ("Congestive heart failure", 1),
-            ("Hypertension", 1),
-            ("Age ≥ 75 years", 1),
-            ("Diabetes mellitus", 1),
-            ("Prior stroke or TIA", 2)
-        ]
-        
-        chads_vars = []
-        for i, (criterion, points) in enumerate(criteria):
-            var = tk.IntVar()
-            chads_vars.append((var, points))
-            cb = tk.Checkbutton(calc_frame, text=f"{criterion} ({points} point{'s' if points > 1 else ''})",
-                               variable=var, bg='white')
-            cb.grid(row=i, column=0, sticky='w', pady=5, padx=5)
-        
-        result_label = tk.Label(result_frame, text="CHADS₂ Score: -- | Risk: --", 
-                               font=('Arial', 12, 'bold'))
-        result_label.pack(pady=10)
-        
-        def calculate_chads2():
-            total_score = sum(var.get() * points for var, points in chads_vars)
+                messagebox.showerror("Error", "Please enter dates as YYYY-MM-DD", parent=window)
+                return
+            state['search'] = search_entry.get().strip()
+            state['cursors'] = [None]
+            load_page()
             
-            # Risk interpretation and recommendation
-            if total_score == 0:
-                risk = "Low (0.5% annual stroke risk)"
-                recommendation = "Aspirin or no therapy"
-            elif total_score == 1:
-                risk = "Low-Moderate (1.5% annual stroke risk)"
-                recommendation = "Aspirin or anticoagulation"
-            elif total_score == 2:
-                risk = "Moderate (2.5% annual stroke risk)"
-                recommendation = "Anticoagulation recommended"
-            else:
-                risk = f"High ({1.5 + (total_score-1)*1.5:.1f}% annual stroke risk)"
-                recommendation = "Anticoagulation strongly recommended"
+        def older():
+            if state['next']:
+                state['cursors'].append(state['next'])
+                load_page()
+                
+        def newer():
+            if len(state['cursors']) > 1:
+                state['cursors'].pop()
+                load_page()
                 
-            result_text = f"CHADS₂ Score: {total_score} | Risk: {risk}"
-            result_label.config(text=result_text)
+        archived_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(filter_frame, text="Include archive", variable=archived_var).pack(side='left', padx=5)
+        tk.Button(filter_frame, text="Apply", command=apply_filters).pack(side='left', padx=5)
+        tk.Button(search_frame, text="Search", command=apply_filters).pack(side='left', padx=5)
+        search_entry.bind('<Return>', lambda event: apply_filters())
+        newer_button = tk.Button(nav_frame, text="< Newer", command=newer, state='disabled')
+        newer_button.pack(side='left')
+        page_label.pack(side='left', padx=10)
+        older_button = tk.Button(nav_frame, text="Older >", command=older, state='disabled')
+        older_button.pack(side='left')
+        
+        apply_filters()
+        
+    def show_dashboard(self):
+        """Usage per day and score mix, read from the rollup tables only"""
+        from tkinter import ttk
+        import rollups
+        
+        window = tk.Toplevel(self.root)
+        window.title("Usage Dashboard")
+        window.geometry("900x600")
+        
+        controls = tk.Frame(window)
+        controls.pack(fill='x', padx=10, pady=10)
+        tk.Label(controls, text="Period (days):").pack(side='left')
+        days_var = tk.StringVar(value=str(DASHBOARD_DAYS[1]))
+        ttk.Combobox(controls, textvariable=days_var, values=[str(days) for days in DASHBOARD_DAYS],
+                     state='readonly', width=6).pack(side='left', padx=5)
+        status_label = tk.Label(controls, text="")
+        
+        # Calculations per day, one column per calculator type
+        usage_tree = ttk.Treeview(window, show='headings', height=12)
+        usage_tree.pack(fill='both', expand=True, padx=10)
+        
+        tk.Label(window, text="Score distribution", font=('Arial', 11, 'bold')).pack(anchor='w', padx=10,
+                                                                                    pady=(10, 0))
+        mix_tree = ttk.Treeview(window, columns=('calculator', 'band', 'count', 'share'), show='headings',
+                                height=8)
+        for column, heading, width in zip(('calculator', 'band', 'count', 'share'),
+                                          ("Calculator", "Category", "Count", "Share"), (150, 300, 80, 80)):
+            mix_tree.heading(column, text=heading)
+            mix_tree.column(column, width=width, anchor='w')
+        mix_tree.pack(fill='x', padx=10, pady=(5, 10))
+        
+        def show(report, elapsed):
+            if not window.winfo_exists():
+                return
+            columns = ['day'] + report.calculator_types
+            usage_tree.config(columns=columns)
+            usage_tree.heading('day', text="Day")
+            usage_tree.column('day', width=100, anchor='w')
+            for calc_type in report.calculator_types:
+                usage_tree.heading(calc_type, text=calc_type)
+                usage_tree.column(calc_type, width=90, anchor='e')
+            usage_tree.delete(*usage_tree.get_children())
+            for day in reversed(report.days):
+                usage_tree.insert('', 'end', values=[day] + [report.usage.get((day, calc_type), '')
+                                                            for calc_type in report.calculator_types])
+            usage_tree.insert('', 'end', values=["Total"] + [report.totals[calc_type]
+                                                             for calc_type in report.calculator_types])
             
-            # Show recommendation
-            rec_label = tk.Label(result_frame, text=f"Recommendation: {recommendation}", 
-                               font=('Arial', 10), fg='#2c3e50')
-            # Clear previous recommendation labels
-            for widget in result_frame.winfo_children():
-                if isinstance(widget, tk.Label) and "Recommendation" in widget.cget("text"):
-                    widget.destroy()
-            rec_label.pack()
+            mix_tree.delete(*mix_tree.get_children())
+            for calc_type, bands in report.mix.items():
+                total = sum(count for _, count in bands)
+                for band, count in bands:
+                    mix_tree.insert('', 'end', values=(calc_type, band, count, f"{100 * count / total:.0f}%"))
+                    
+            text = f"Read in {1000 * elapsed:.0f} ms"
+            if report.backfill_remaining:
+                text += " (older history is still being added)"
+            status_label.config(text=text)
             
-            selected = [criteria[i][0] for i, (var, _) in enumerate(chads_vars) if var.get()]
-            summary = "; ".join(selected) if selected else "No risk factors"
+        def refresh():
+            days = int(days_var.get())
             
-            self.save_calculation('CHADS2', summary, f"{result_text} | {recommendation}")
+            def read(conn):
+                started = time.perf_counter()
+                report = rollups.dashboard(conn, days)
+                return report, time.perf_counter() - started
+                
+            self.store.submit(read, on_done=lambda result: show(*result))
             
-        tk.Button(calc_frame, text="Calculate CHADS₂", command=calculate_chads2,
-                 bg='#2ecc71', fg='white', font=('Arial', 10)).grid(row=len(criteria), column=0, pady=20)
+        tk.Button(controls, text="Refresh", command=refresh).pack(side='left', padx=5)
+        status_label.pack(side='left', padx=10)
         
-        self.create_notes_section(notes_frame)
+        refresh()
         
     def create_notes_section(self, parent_frame):
         """Create notes section for patient information"""
+        from tkinter import scrolledtext
+        
         tk.Label(parent_frame, text="Patient Notes:", font=('Arial', 10, 'bold')).pack(anchor='w', pady=(10,5))
         
         notes_text = scrolledtext.ScrolledText(parent_frame, height=8, width=60)
@@ -674,35 +909,165 @@ Note: Always verify against pediatric dosing guidelines and maximum adult doses.
         def save_notes():
             notes = notes_text.get(1.0, tk.END).strip()
             if notes:
-                # Save to database with current timestamp
-                conn = sqlite3.connect(self.db_path)
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO patient_notes (timestamp, calculator_type, patient_info, notes)
-                    VALUES (?, ?, ?, ?)
-                ''', (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'Manual Note', '', notes))
-                conn.commit()
-                conn.close()
-                messagebox.showinfo("Saved", "Notes saved successfully!")
+                # Queue for the next batched write; confirm once committed
+                self.store.add_note(notes, on_done=lambda: messagebox.showinfo(
+                    "Saved", "Notes saved successfully!"))
                 
         tk.Button(parent_frame, text="Save Notes", command=save_notes,
                  bg='#34495e', fg='white', font=('Arial', 9)).pack(pady=5)
         
-    def save_calculation(self, calc_type, inputs, result, patient_info=""):
-        """Save calculation to database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO patient_notes (timestamp, calculator_type, patient_info, calculation_result, notes)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), calc_type, patient_info, result, inputs))
-        conn.commit()
-        conn.close()
+    def save_calculation(self, calc_type, inputs, result, patient_info="", record=None,
+                         values=None, calc_key=None):
+        """
+        Save calculation to database (queued on the persistence worker) and
+        to the session history
+        
+        inputs/result are display text; record is the typed (score, category,
+        payload) from records.make_record; values are the typed inputs and
+        calc_key the registry key, needed to recall the calculation
+        """
+        with metrics.METRICS.timer('save_seconds'):
+            self.store.add_calculation(calc_type, inputs, result, patient_info, record)
+        metrics.METRICS.inc('calculations_total', calculator_type=calc_type)
+        
+        score, category = record[:2] if record else (None, None)
+        self.session.append(session.SessionEntry(calc_key, calc_type, values, inputs, result,
+                                                 score, category))
+        self.recent_list.insert(0, self.session[0].label())
+        if self.recent_list.size() > self.session.capacity:
+            self.recent_list.delete(self.session.capacity, 'end')
+            
+    def recall_selected(self, event=None):
+        """Load the selected recent calculation back into its form"""
+        selection = self.recent_list.curselection()
+        if not selection:
+            return
+        entry = self.session[selection[0]]
+        if entry.calc_key not in self.calculators or entry.values is None:
+            messagebox.showinfo("Recall", "This calculation cannot be recalled into a form.")
+            return
+        self.load_calculator(entry.calc_key)
+        fill = self.form_fillers.get(entry.calc_key)
+        if fill is not None:
+            fill(entry.values)
         
     def run(self):
         """Start the application"""
         self.root.mainloop()
 
+
+def _entry_text(value):
+    """Entry text for a typed number (72.0 -> '72')"""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def measure_view_switches(rounds=5):
+    """
+    Mean and worst calculator switch latency, rebuilding every time (the old
+    behaviour) versus the cached views
+    """
+    report = {}
+    for label, cache_size in (('rebuild', 0), ('cached', 8)):
+        app = QuickMedCalc(db_path=':memory:', view_cache_size=cache_size)
+        app.root.withdraw()
+        samples = []
+        app.view_switch_listeners.append(lambda calc_type, seconds, cached: samples.append(seconds))
+        # First pass builds every view; only later passes are measured
+        for calc_type in app.calculators:
+            app.load_calculator(calc_type)
+        samples.clear()
+        for _ in range(rounds):
+            for calc_type in app.calculators:
+                app.load_calculator(calc_type)
+        report[label] = {'mean_ms': 1000 * sum(samples) / len(samples),
+                         'max_ms': 1000 * max(samples)}
+        app.on_close()
+    return report
+
+
+# Run in a fresh interpreter by measure_startup(): import the app, build it and
+# paint the first frame, then report timings as JSON
+_STARTUP_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+app = main.QuickMedCalc(db_path=sys.argv[1])
+app.root.update_idletasks()
+painted = time.perf_counter()
+print(json.dumps({'painted_at': time.time(), 'import_s': imported - started,
+                  'build_s': painted - imported}))
+app.root.update()
+app.on_close()
+"""
+
+
+def measure_startup(runs=5):
+    """
+    Cold-start timings over several fresh processes, in seconds
+
+    first_frame: process launch (interpreter start included) to first paint
+    imports: importing main and everything it imports at module level
+    build: creating the window and widgets
+    Each run uses a new database file, so schema creation is included in the
+    process but, being deferred, not in the time to first frame.
+    """
+    import json
+    import statistics
+    import subprocess
+    import tempfile
+    
+    samples = {'first_frame': [], 'imports': [], 'build': []}
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as tmp:
+        for run in range(runs):
+            db_path = os.path.join(tmp, f'startup{run}.db')
+            launched = time.time()
+            output = subprocess.run([sys.executable, '-c', _STARTUP_PROBE, db_path], cwd=src_dir,
+                                    stdout=subprocess.PIPE, check=True, universal_newlines=True).stdout
+            timings = json.loads(output.splitlines()[0])
+            samples['first_frame'].append(timings['painted_at'] - launched)
+            samples['imports'].append(timings['import_s'])
+            samples['build'].append(timings['build_s'])
+    return {name: {'median_s': statistics.median(values), 'max_s': max(values)}
+            for name, values in samples.items()}
+
+
+def _option_value(name):
+    """Value following a command-line option, or None"""
+    if name in sys.argv[:-1]:
+        return sys.argv[sys.argv.index(name) + 1]
+    return None
+
+
 if __name__ == "__main__":
-    app = QuickMedCalc()
-    app.run()
\ No newline at end of file
+    if '--measure-switch' in sys.argv:
+        for label, stats in measure_view_switches().items():
+            print(f"{label:>8}: mean {stats['mean_ms']:.2f} ms, max {stats['max_ms']:.2f} ms")
+    elif '--measure-startup' in sys.argv:
+        report = measure_startup()
+        for label, stats in report.items():
+            print(f"{label:>12}: median {1000 * stats['median_s']:.1f} ms, max {1000 * stats['max_s']:.1f} ms")
+        if report['first_frame']['median_s'] > STARTUP_BUDGET_S:
+            print(f"Time to first frame exceeds the {STARTUP_BUDGET_S:.1f} s budget")
+            sys.exit(1)
+    else:
+        metrics_port = _option_value('--metrics-port')
+        metrics_file = _option_value('--metrics-file')
+        exporter = None
+        if metrics_port or metrics_file:
+            metrics.METRICS.enabled = True
+        if metrics_port:
+            metrics.serve_prometheus(int(metrics_port))
+        if metrics_file:
+            exporter = metrics.FileExporter(metrics_file)
+            exporter.start()
+        retention_days = _option_value('--retention-days')
+        app = QuickMedCalc(retention_days=int(retention_days) if retention_days else None,
+                           writer_socket=_option_value('--writer-socket'),
+                           live_results='--live' in sys.argv)
+        app.run()
+        if exporter is not None:
+            exporter.stop()
\ No newline at end of file
@@ -0,0 +1,257 @@
+"""
+QuickMed Calc - Runtime Metrics
+Counters and latency histograms for the hot paths, with local exporters.
+
+Instrumentation is off by default. Disabled, every call returns after a
+single attribute check, so the hooks stay in place permanently. Enable it
+with:
+
+    python src/main.py --metrics-port 9464        # Prometheus text on 127.0.0.1
+    python src/main.py --metrics-file metrics.log # rotating JSON-lines snapshots
+
+Recorded:
+    quickmed_calculation_seconds{calculator_type}  validate + compute
+    quickmed_calculations_total{calculator_type}   saved calculations
+    quickmed_calculation_errors_total{calculator_type}
+    quickmed_save_seconds                          save_calculation (enqueue)
+    quickmed_db_write_seconds                      one batched INSERT on the worker
+    quickmed_db_lock_retries_total                 writes retried after "database is locked"
+    quickmed_writer_fallbacks_total                batches written directly, writer.py unreachable
+    quickmed_callback_errors_total                 persistence callbacks that raised
+    quickmed_view_switch_seconds{cached}           load_calculator, layout included
+    quickmed_search_seconds                        filter_calculators
+    quickmed_tk_lag_seconds                        Tk event-loop lag (after() probe)
+"""
+
+import bisect
+import json
+import threading
+import time
+
+PREFIX = 'quickmed_'
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = key + tuple(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+               for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class _Histogram:
+    __slots__ = ('counts', 'count', 'sum', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'labels', 'started')
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class Metrics:
+    """Thread-safe counters and histograms; no-ops while disabled"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.counters = {}    # name -> {label key: value}
+        self.histograms = {}  # name -> {label key: _Histogram}
+
+    def inc(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram()
+            histogram.observe(seconds)
+
+    def timer(self, name, **labels):
+        """Context manager recording the duration of its block"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        """JSON-ready copy of every series"""
+        with self._lock:
+            counters = {name: [{'labels': dict(key), 'value': value} for key, value in series.items()]
+                        for name, series in self.counters.items()}
+            histograms = {name: [{'labels': dict(key), 'count': h.count, 'sum': h.sum, 'max': h.max}
+                                 for key, h in series.items()]
+                          for name, series in self.histograms.items()}
+        return {'time': time.time(), 'counters': counters, 'histograms': histograms}
+
+    def render_prometheus(self):
+        """Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f'# TYPE {PREFIX}{name} counter')
+                for key, value in series.items():
+                    lines.append(f'{PREFIX}{name}{_format_labels(key)} {value}')
+            for name, series in sorted(self.histograms.items()):
+                lines.append(f'# TYPE {PREFIX}{name} histogram')
+                for key, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS + (float('inf'),), histogram.counts):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else repr(bound)
+                        lines.append(f'{PREFIX}{name}_bucket{_format_labels(key, [("le", le)])} {cumulative}')
+                    lines.append(f'{PREFIX}{name}_sum{_format_labels(key)} {histogram.sum}')
+                    lines.append(f'{PREFIX}{name}_count{_format_labels(key)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide instance used by the instrumented modules
+METRICS = Metrics()
+
+
+class LagProbe:
+    """
+    Measures Tk event-loop lag: an after() callback is scheduled every
+    interval and records how late it actually ran
+    """
+
+    def __init__(self, root, interval_ms=250, metrics=METRICS):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.metrics = metrics
+        self.after_id = None
+        self._expected = None
+
+    def start(self):
+        self._schedule()
+
+    def stop(self):
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+
+    def _schedule(self):
+        self._expected = time.perf_counter() + self.interval_ms / 1000
+        self.after_id = self.root.after(self.interval_ms, self._tick)
+
+    def _tick(self):
+        self.metrics.observe('tk_lag_seconds', max(0.0, time.perf_counter() - self._expected))
+        self._schedule()
+
+
+def serve_prometheus(port, host='127.0.0.1', metrics=METRICS):
+    """Serve GET /metrics from a daemon thread; returns the server (call shutdown() to stop)"""
+    # Imported here: http.server is slow to import and only needed when exporting
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='quickmed-metrics', daemon=True).start()
+    return server
+
+
+class FileExporter(threading.Thread):
+    """Appends a JSON snapshot every interval to a size-rotated file"""
+
+    def __init__(self, path, interval=60.0, max_bytes=1024 * 1024, backup_count=5, metrics=METRICS):
+        # Imported here to keep logging off the startup path when metrics are off
+        import logging
+        import logging.handlers
+
+        super().__init__(name='quickmed-metrics-file', daemon=True)
+        self.interval = interval
+        self.metrics = metrics
+        self._make_record = logging.makeLogRecord
+        self.handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes,
+                                                            backupCount=backup_count, encoding='utf-8')
+        self.handler.setFormatter(logging.Formatter('%(message)s'))
+        self._stopped = threading.Event()
+
+    def write(self):
+        snapshot = json.dumps(self.metrics.snapshot(), separators=(',', ':'))
+        self.handler.emit(self._make_record({'msg': snapshot}))
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.write()
+
+    def stop(self):
+        """Write a final snapshot and close the file"""
+        self._stopped.set()
+        self.write()
+        self.handler.close()
+
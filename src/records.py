@@ -0,0 +1,220 @@
+"""
+QuickMed Calc - Typed Calculation Records
+Structured storage of calculator inputs and outputs.
+
+Each saved calculation carries its numeric score and category in their own
+columns plus a compact JSON payload {"inputs": {...}, "outputs": {...}}.
+Input names match the engine.py arguments, so any record can be re-scored
+with engine.<function>(**inputs). Reporting becomes a plain SQL aggregate:
+
+    SELECT calculator_type, AVG(score) FROM patient_notes GROUP BY calculator_type
+
+Rows saved before typed storage only have display text. The streaming
+migrator below back-parses them in small chunks:
+
+    python src/records.py [quickmed_data.db]
+"""
+
+import json
+import re
+import sys
+
+import engine
+import formulary
+import schema
+import storage
+
+# calculator_type -> engine function taking the typed inputs as keyword arguments
+SCORERS = {
+    'BMI': engine.calculate_bmi,
+    'BSA': engine.calculate_bsa,
+    'Creatinine Clearance': engine.calculate_creatinine,
+    'GCS': engine.calculate_gcs,
+    'Wells DVT': engine.calculate_wells,
+    'APGAR': engine.calculate_apgar,
+    'Pediatric Dosing': formulary.pediatric_dose,
+    'CHADS2': engine.calculate_chads2,
+}
+
+# Stored for legacy rows whose text could not be parsed, so they are not retried
+UNPARSED = 'null'
+
+
+def score_category(outcome):
+    """(score, category) columns for an engine result"""
+    if isinstance(outcome, engine.DoseResult):
+        return outcome.single_dose, ''
+    return outcome.value, outcome.category
+
+
+def make_record(inputs, outcome):
+    """(score, category, payload JSON) for typed inputs and an engine result"""
+    outputs = outcome._asdict()
+    outputs.pop('text', None)
+    score, category = score_category(outcome)
+    payload = json.dumps({'inputs': inputs, 'outputs': outputs},
+                         separators=(',', ':'), ensure_ascii=False)
+    return score, category, payload
+
+
+def load_payload(payload):
+    """Decode a payload column (None for legacy or unparsed rows)"""
+    if not payload:
+        return None
+    return json.loads(payload)
+
+
+def rescore(calc_type, inputs):
+    """Recompute an engine result from stored typed inputs"""
+    return SCORERS[calc_type](**inputs)
+
+
+# Legacy text parsers: notes column -> typed inputs
+
+_NUMBER = r'(-?\d+(?:\.\d+)?)'
+
+_WEIGHT_HEIGHT = re.compile(rf'Weight: {_NUMBER}kg, Height: {_NUMBER}cm')
+_CREATININE = re.compile(rf'Age: {_NUMBER}, Weight: {_NUMBER}kg, SCr: {_NUMBER}mg/dL, (male|female)')
+_GCS = re.compile(r'E(\d)V(\d)M(\d)')
+_PEDIATRIC = re.compile(rf'Weight: {_NUMBER}kg, {_NUMBER}mg/kg, (\d+)x/day')
+
+
+def _parse_weight_height(notes):
+    match = _WEIGHT_HEIGHT.fullmatch(notes)
+    if match:
+        return {'weight': float(match.group(1)), 'height_cm': float(match.group(2))}
+
+
+def _parse_creatinine(notes):
+    match = _CREATININE.fullmatch(notes)
+    if match:
+        age, weight, creatinine, gender = match.groups()
+        return {'age': float(age), 'weight': float(weight),
+                'creatinine': float(creatinine), 'gender': gender}
+
+
+def _parse_gcs(notes):
+    match = _GCS.fullmatch(notes)
+    if match:
+        eye, verbal, motor = map(int, match.groups())
+        return {'eye': eye, 'verbal': verbal, 'motor': motor}
+
+
+def _criteria_parser(criteria, empty_text):
+    index = {description: i for i, (description, _) in enumerate(criteria)}
+
+    def parse(notes):
+        flags = [0] * len(criteria)
+        if notes == empty_text:
+            return {'criteria': flags}
+        for description in notes.split('; '):
+            if description not in index:
+                return None
+            flags[index[description]] = 1
+        return {'criteria': flags}
+
+    return parse
+
+
+def _parse_apgar(notes):
+    parts = notes.split('; ')
+    if len(parts) != len(engine.APGAR_CRITERIA):
+        return None
+    scores = []
+    for part, (criterion, _) in zip(parts, engine.APGAR_CRITERIA):
+        name, _, score = part.partition(': ')
+        if name != criterion or score not in ('0', '1', '2'):
+            return None
+        scores.append(int(score))
+    return {'scores': scores}
+
+
+def _parse_pediatric(notes):
+    match = _PEDIATRIC.fullmatch(notes)
+    if match:
+        weight, dose_per_kg, frequency = match.groups()
+        return {'weight': float(weight), 'dose_per_kg': float(dose_per_kg),
+                'frequency': int(frequency)}
+
+
+LEGACY_PARSERS = {
+    'BMI': _parse_weight_height,
+    'BSA': _parse_weight_height,
+    'Creatinine Clearance': _parse_creatinine,
+    'GCS': _parse_gcs,
+    'Wells DVT': _criteria_parser(engine.WELLS_CRITERIA, "No criteria selected"),
+    'APGAR': _parse_apgar,
+    'Pediatric Dosing': _parse_pediatric,
+    'CHADS2': _criteria_parser(engine.CHADS2_CRITERIA, "No risk factors"),
+}
+
+
+def parse_legacy(calc_type, notes):
+    """Typed record (score, category, payload) for a legacy row, or None"""
+    parser = LEGACY_PARSERS.get(calc_type)
+    if parser is None or not notes:
+        return None
+    inputs = parser(notes.strip())
+    if inputs is None:
+        return None
+    try:
+        return make_record(inputs, rescore(calc_type, inputs))
+    except ValueError:
+        return None
+
+
+def backfill(conn, chunk_size=5000, progress=None):
+    """
+    Back-parse legacy rows in chunks of chunk_size
+
+    Walks patient_notes by id so memory stays bounded and each chunk is its
+    own short transaction. Returns (rows examined, rows converted).
+    """
+    types = tuple(LEGACY_PARSERS)
+    placeholders = ', '.join('?' * len(types))
+    select = f'''
+        SELECT id, calculator_type, notes FROM patient_notes
+        WHERE id > ? AND payload IS NULL AND calculator_type IN ({placeholders})
+        ORDER BY id LIMIT ?
+    '''
+    last_id = 0
+    examined = converted = 0
+    while True:
+        rows = conn.execute(select, (last_id,) + types + (chunk_size,)).fetchall()
+        if not rows:
+            break
+        updates = []
+        for row_id, calc_type, notes in rows:
+            record = parse_legacy(calc_type, notes)
+            if record is None:
+                updates.append((None, None, UNPARSED, row_id))
+            else:
+                updates.append(record + (row_id,))
+                converted += 1
+        with conn:
+            conn.executemany('UPDATE patient_notes SET score = ?, category = ?, payload = ? WHERE id = ?',
+                             updates)
+        examined += len(rows)
+        last_id = rows[-1][0]
+        if progress is not None:
+            progress(examined, converted)
+    return examined, converted
+
+
+def main(argv=None):
+    """Command-line entry point for the legacy-row migrator"""
+    argv = sys.argv[1:] if argv is None else argv
+    db_path = argv[0] if argv else storage.DEFAULT_DB_PATH
+    conn = storage.connect(db_path)
+    schema.migrate(conn)
+
+    def report(examined, converted):
+        print(f"\r{examined} rows examined, {converted} converted", end='', flush=True)
+
+    backfill(conn, progress=report)
+    print()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+QuickMed Calc - Calculator Registry
+Declarative calculator specs with lazy loading.
+
+Only lightweight metadata (key, name, synonyms, module) is read at startup,
+from calculators/manifest.json and from the 'quickmedcalc.calculators'
+entry point group. A calculator's implementation module is imported the
+first time it is opened, so startup time and memory do not grow with the
+size of the catalog.
+
+An implementation module defines SPEC, a CalculatorSpec describing its
+inputs (with validation ranges), formula (which also classifies the
+result) and how the result is displayed and saved. The GUI builds the form
+from the spec; the same spec validates input for headless callers.
+"""
+
+import importlib
+import json
+import math
+import os
+from typing import Any, Callable, NamedTuple, Optional, Sequence, Tuple
+
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'calculators', 'manifest.json')
+
+ENTRY_POINT_GROUP = 'quickmedcalc.calculators'
+
+
+def _label(text):
+    return text.rstrip(':').strip()
+
+
+# Input fields
+
+class Number(NamedTuple):
+    """Numeric entry field with an inclusive validation range"""
+    name: str
+    label: str
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+    integer: bool = False
+
+    def parse(self, raw):
+        if isinstance(raw, str):
+            raw = raw.strip()
+        if raw is None or raw == '':
+            raise ValueError(f"Please enter {_label(self.label)}")
+        if isinstance(raw, bool):
+            raise ValueError(f"Please enter a valid number for {_label(self.label)}")
+        try:
+            value = int(raw) if self.integer else float(raw)
+        except (OverflowError, TypeError, ValueError):  # OverflowError: int(float('inf'))
+            kind = "whole number" if self.integer else "number"
+            raise ValueError(f"Please enter a valid {kind} for {_label(self.label)}") from None
+        # NaN passes both range checks below, and infinity is no measurement
+        if not math.isfinite(value):
+            raise ValueError(f"Please enter a valid number for {_label(self.label)}")
+        if self.minimum is not None and value < self.minimum:
+            raise ValueError(f"{_label(self.label)} must be at least {self.minimum:g}")
+        if self.maximum is not None and value > self.maximum:
+            raise ValueError(f"{_label(self.label)} must be at most {self.maximum:g}")
+        return value
+
+
+class Choice(NamedTuple):
+    """One choice from a list of (value, description) options"""
+    name: str
+    label: str
+    options: Tuple[Tuple[Any, str], ...]
+    default: Any = 0  # value of the unselected control; not a valid option unless listed
+    inline: bool = False  # radio buttons side by side after the label
+
+    def parse(self, raw):
+        for value, _ in self.options:
+            if raw == value or str(raw) == str(value):
+                return value
+        raise ValueError(f"Please select {_label(self.label)}")
+
+
+class Checklist(NamedTuple):
+    """Yes/no criteria; parsed to one 0/1 flag per criterion"""
+    name: str
+    criteria: Tuple[Tuple[str, int], ...]
+    signed: bool = False  # show points as +1/-2 rather than 1/2
+
+    def parse(self, raw):
+        flags = [1 if flag else 0 for flag in raw]
+        if len(flags) != len(self.criteria):
+            raise ValueError(f"Expected {len(self.criteria)} criteria, got {len(flags)}")
+        return flags
+
+
+class ChoiceList(NamedTuple):
+    """Several scored choices; parsed to one value per group"""
+    name: str
+    groups: Tuple[Tuple[str, Tuple[Tuple[int, str], ...]], ...]
+
+    def parse(self, raw):
+        raw = list(raw)
+        if len(raw) != len(self.groups):
+            raise ValueError(f"Expected {len(self.groups)} scores, got {len(raw)}")
+        return [Choice(self.name, label, options).parse(value)
+                for value, (label, options) in zip(raw, self.groups)]
+
+
+class Autocomplete(NamedTuple):
+    """Free-text entry completed from a source with complete(prefix) and get(name)"""
+    name: str
+    label: str
+    source: Any  # e.g. formulary.Formulary; get() returns an object with .name, or None
+    required: bool = False
+
+    def parse(self, raw):
+        text = str(raw).strip() if raw is not None else ''
+        if not text:
+            if self.required:
+                raise ValueError(f"Please enter {_label(self.label)}")
+            return ''
+        entry = self.source.get(text)
+        if entry is None:
+            raise ValueError(f"Unknown {_label(self.label)}: {text}")
+        return entry.name
+
+
+# Calculator specs
+
+class CalculatorSpec(NamedTuple):
+    """Declarative description of one calculator"""
+    title: str
+    calculator_type: str  # stored in patient_notes.calculator_type
+    inputs: Sequence[Any]
+    formula: Callable  # engine function taking the parsed inputs as keywords
+    placeholder: str = ""
+    button_text: str = "Calculate"
+    layout: str = 'rows'  # 'columns' places non-inline choices side by side
+    summary: Optional[Callable] = None  # values -> inputs text for the notes column
+    render: Optional[Callable] = None  # (result, values) -> display text
+    saved: Optional[Callable] = None  # result -> text for calculation_result
+    view: Optional[Callable] = None  # custom view builder: view(app, spec)
+
+    def parse(self, raw):
+        """Validate raw input values (strings or numbers) into typed inputs"""
+        return {field.name: field.parse(raw.get(field.name)) for field in self.inputs}
+
+    def compute(self, values):
+        return self.formula(**values)
+
+    def calculate(self, raw):
+        """Parse and compute in one step; raises ValueError on invalid input"""
+        values = self.parse(raw)
+        return values, self.compute(values)
+
+    def display(self, result, values):
+        if self.render is not None:
+            return self.render(result, values)
+        if result.recommendation:
+            return f"{result.text}\nRecommendation: {result.recommendation}"
+        return result.text
+
+    def saved_text(self, result):
+        return self.saved(result) if self.saved is not None else result.text
+
+    def summarize(self, values):
+        if self.summary is not None:
+            return self.summary(values)
+        return ", ".join(f"{field.name}: {values[field.name]}" for field in self.inputs)
+
+
+# Registry
+
+class CalculatorInfo(NamedTuple):
+    """Startup metadata for one calculator (no implementation loaded)"""
+    key: str
+    name: str
+    module: str
+    calculator_type: str
+    synonyms: Tuple[str, ...] = ()
+
+
+class Registry:
+    """Calculator metadata by key, with lazily imported specs"""
+
+    def __init__(self):
+        self.infos = {}
+        self._specs = {}
+
+    def register(self, info):
+        self.infos[info.key] = info
+
+    def register_entries(self, entries):
+        """Register manifest-style dicts"""
+        for entry in entries:
+            entry = dict(entry)
+            entry['synonyms'] = tuple(entry.get('synonyms', ()))
+            self.register(CalculatorInfo(**entry))
+
+    def load_manifest(self, path=MANIFEST_PATH):
+        with open(path, encoding='utf-8') as f:
+            self.register_entries(json.load(f))
+
+    def load_entry_points(self, group=ENTRY_POINT_GROUP):
+        """
+        Register calculators from installed packages
+
+        Each entry point must resolve to a list of manifest-style dicts, kept in
+        a lightweight module so only metadata is imported here.
+        """
+        try:
+            from importlib.metadata import entry_points
+        except ImportError:  # Python < 3.8
+            return
+        found = entry_points()
+        found = found.select(group=group) if hasattr(found, 'select') else found.get(group, ())
+        for entry_point in found:
+            self.register_entries(entry_point.load())
+
+    def spec(self, key):
+        """The CalculatorSpec for key, importing its module on first use"""
+        spec = self._specs.get(key)
+        if spec is None:
+            spec = importlib.import_module(self.infos[key].module).SPEC
+            self._specs[key] = spec
+        return spec
+
+    def is_loaded(self, key):
+        return key in self._specs
+
+    def __iter__(self):
+        return iter(self.infos.values())
+
+    def __len__(self):
+        return len(self.infos)
+
+    def __contains__(self, key):
+        return key in self.infos
+
+
+def default_registry():
+    """Registry of the bundled manifest plus installed entry points"""
+    registry = Registry()
+    registry.load_manifest()
+    registry.load_entry_points()
+    return registry
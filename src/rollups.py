@@ -0,0 +1,162 @@
+"""
+QuickMed Calc - Usage Rollups
+Daily counts per calculator type and result category, for dashboards.
+
+daily_rollup (schema version 5) holds one row per local day, calculator
+type and category with its count and score sum. Triggers on patient_notes
+keep it current on every insert, so a dashboard reads a few hundred rollup
+rows instead of scanning the history, however long that has grown.
+Archiving deletes history rows but keeps their counts.
+
+Rows saved before the rollups existed are added once, in id order, by
+backfill_step(): the app runs it in small steps after startup, or run
+
+    python src/rollups.py --backfill [--db quickmed_data.db]
+    python src/rollups.py --days 30          # print the dashboard
+"""
+
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+from typing import NamedTuple
+
+import schema
+import storage
+
+# Calculators whose category mix the dashboard shows
+MIX_TYPES = ('GCS', 'CHADS2', 'Wells DVT')
+
+BACKFILL_CHUNK = 20000
+
+
+class Dashboard(NamedTuple):
+    days: list              # 'YYYY-MM-DD', oldest first
+    calculator_types: list  # most used first
+    usage: dict             # (day, calculator_type) -> count
+    totals: dict            # calculator_type -> count over the period
+    mix: dict               # MIX_TYPES entry -> [(band, count)], most frequent first
+    backfill_remaining: int # ids still to be added by backfill_step (0 when complete)
+
+
+def risk_band(category):
+    """Category without its detail: 'High (4.5% annual stroke risk)' -> 'High'"""
+    return category.split(' (', 1)[0] or 'Uncategorized'
+
+
+def backfill_remaining(conn):
+    done_id, end_id = conn.execute('SELECT done_id, end_id FROM rollup_backfill').fetchone()
+    return max(0, end_id - done_id)
+
+
+def backfill_step(conn, chunk_size=BACKFILL_CHUNK):
+    """
+    Add the next chunk_size ids of pre-rollup history; returns ids left (0 when done)
+
+    Each step is one short transaction that also records its progress, so
+    the backfill can be interrupted and resumed at any time.
+    """
+    done_id, end_id = conn.execute('SELECT done_id, end_id FROM rollup_backfill').fetchone()
+    if done_id >= end_id:
+        return 0
+    upto = min(done_id + chunk_size, end_id)
+    groups = conn.execute('''
+        SELECT COALESCE(date(ts_epoch, 'unixepoch', 'localtime'), '') AS day,
+               COALESCE(calculator_type, '') AS type, COALESCE(category, '') AS cat,
+               COUNT(*), TOTAL(score)
+        FROM patient_notes WHERE id > ? AND id <= ?
+        GROUP BY day, type, cat
+    ''', (done_id, upto)).fetchall()
+    with conn:
+        conn.executemany('INSERT OR IGNORE INTO daily_rollup VALUES (?, ?, ?, 0, 0)',
+                         [group[:3] for group in groups])
+        conn.executemany('''
+            UPDATE daily_rollup SET count = count + ?, score_sum = score_sum + ?
+            WHERE day = ? AND calculator_type = ? AND category = ?
+        ''', [group[3:] + group[:3] for group in groups])
+        conn.execute('UPDATE rollup_backfill SET done_id = ?', (upto,))
+    return end_id - upto
+
+
+def rebuild(conn):
+    """Recount every rollup from patient_notes (e.g. after restoring a backup)"""
+    with conn:
+        conn.execute('DELETE FROM daily_rollup')
+        conn.execute('UPDATE rollup_backfill SET done_id = 0, end_id = '
+                     '(SELECT COALESCE(MAX(id), 0) FROM patient_notes)')
+    while backfill_step(conn):
+        pass
+
+
+def dashboard(conn, days=30, today=None):
+    """Dashboard figures for the last `days` local days, read from the rollups only"""
+    today = today or date.today()
+    first = today - timedelta(days=days - 1)
+    day_list = [(first + timedelta(days=offset)).isoformat() for offset in range(days)]
+
+    usage = {}
+    totals = {}
+    mix = {calc_type: {} for calc_type in MIX_TYPES}
+    rows = conn.execute('''
+        SELECT day, calculator_type, category, count FROM daily_rollup
+        WHERE day >= ? AND day <= ? AND count > 0
+    ''', (day_list[0], day_list[-1]))
+    for day, calc_type, category, count in rows:
+        usage[day, calc_type] = usage.get((day, calc_type), 0) + count
+        totals[calc_type] = totals.get(calc_type, 0) + count
+        if calc_type in mix:
+            band = risk_band(category)
+            mix[calc_type][band] = mix[calc_type].get(band, 0) + count
+
+    return Dashboard(
+        days=day_list,
+        calculator_types=sorted(totals, key=lambda calc_type: (-totals[calc_type], calc_type)),
+        usage=usage,
+        totals=totals,
+        mix={calc_type: sorted(bands.items(), key=lambda item: -item[1]) for calc_type, bands in mix.items()},
+        backfill_remaining=backfill_remaining(conn),
+    )
+
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="QuickMed Calc usage rollups")
+    parser.add_argument('--db', default=storage.DEFAULT_DB_PATH, help="database path")
+    parser.add_argument('--days', type=int, default=30, help="dashboard period")
+    parser.add_argument('--backfill', action='store_true', help="add pre-rollup history now")
+    parser.add_argument('--rebuild', action='store_true', help="recount every rollup from the history")
+    args = parser.parse_args(argv)
+
+    conn = storage.connect(args.db)
+    try:
+        schema.migrate(conn)
+        if args.rebuild:
+            rebuild(conn)
+        elif args.backfill:
+            while True:
+                remaining = backfill_step(conn)
+                print(f"\r{remaining} ids left to backfill ", end='', file=sys.stderr, flush=True)
+                if not remaining:
+                    break
+            print(file=sys.stderr)
+
+        started = time.perf_counter()
+        report = dashboard(conn, args.days)
+        elapsed = time.perf_counter() - started
+    finally:
+        conn.close()
+
+    print(f"Calculations, last {args.days} days")
+    for calc_type in report.calculator_types:
+        print(f"  {calc_type:<24} {report.totals[calc_type]:>8}")
+    for calc_type, bands in report.mix.items():
+        print(f"{calc_type} mix")
+        for band, count in bands:
+            print(f"  {band:<24} {count:>8}")
+    if report.backfill_remaining:
+        print(f"(older history still being added: {report.backfill_remaining} ids left)")
+    print(f"Read in {1000 * elapsed:.1f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
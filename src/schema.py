@@ -0,0 +1,209 @@
+"""
+QuickMed Calc - Database Schema
+Versioned schema migrations for quickmed_data.db.
+
+The current version is recorded in the schema_version table. migrate()
+applies every newer migration in order, each in its own IMMEDIATE
+transaction, so a migration runs exactly once even when several app
+instances start against the same file.
+"""
+
+import sqlite3
+
+
+def _create_base_tables(conn):
+    """Version 1: the original notes and favorites tables"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS patient_notes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT,
+            calculator_type TEXT,
+            patient_info TEXT,
+            calculation_result TEXT,
+            notes TEXT
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS favorites (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            calculator_name TEXT UNIQUE
+        )
+    ''')
+
+
+def _add_epoch_timestamps(conn):
+    """Version 2: integer epoch timestamps and history indexes"""
+    conn.execute('ALTER TABLE patient_notes ADD COLUMN ts_epoch INTEGER')
+
+    # Existing timestamps are local 'YYYY-MM-DD HH:MM:SS' strings
+    conn.execute('''
+        UPDATE patient_notes
+        SET ts_epoch = CAST(strftime('%s', timestamp, 'utc') AS INTEGER)
+        WHERE ts_epoch IS NULL
+    ''')
+
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_notes_ts ON patient_notes (ts_epoch, id)')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_notes_type_ts
+        ON patient_notes (calculator_type, ts_epoch, id)
+    ''')
+
+
+def _add_typed_columns(conn):
+    """Version 3: numeric score, category and JSON payload of typed inputs/outputs"""
+    conn.execute('ALTER TABLE patient_notes ADD COLUMN score REAL')
+    conn.execute('ALTER TABLE patient_notes ADD COLUMN category TEXT')
+    conn.execute('ALTER TABLE patient_notes ADD COLUMN payload TEXT')
+
+
+def create_fulltext_index(conn):
+    """
+    FTS5 index over the free-text columns, kept in sync by triggers
+
+    External-content table: the text is stored once, in patient_notes, and
+    the index only holds the tokens. Returns False when this SQLite build
+    has no FTS5 (search is then unavailable, everything else still works).
+    """
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+                patient_info, calculation_result, notes,
+                content='patient_notes', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )
+        ''')
+    except sqlite3.OperationalError as exc:
+        if 'fts5' in str(exc):
+            return False
+        raise
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS notes_fts_insert AFTER INSERT ON patient_notes BEGIN
+            INSERT INTO notes_fts (rowid, patient_info, calculation_result, notes)
+            VALUES (new.id, new.patient_info, new.calculation_result, new.notes);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON patient_notes BEGIN
+            INSERT INTO notes_fts (notes_fts, rowid, patient_info, calculation_result, notes)
+            VALUES ('delete', old.id, old.patient_info, old.calculation_result, old.notes);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS notes_fts_update
+        AFTER UPDATE OF patient_info, calculation_result, notes ON patient_notes BEGIN
+            INSERT INTO notes_fts (notes_fts, rowid, patient_info, calculation_result, notes)
+            VALUES ('delete', old.id, old.patient_info, old.calculation_result, old.notes);
+            INSERT INTO notes_fts (rowid, patient_info, calculation_result, notes)
+            VALUES (new.id, new.patient_info, new.calculation_result, new.notes);
+        END
+    ''')
+    return True
+
+
+def _add_fulltext_index(conn):
+    """Version 4: full-text index over patient_info, calculation_result and notes"""
+    if create_fulltext_index(conn):
+        # Index the rows saved before this version
+        conn.execute("INSERT INTO notes_fts (notes_fts) VALUES ('rebuild')")
+
+
+# Rollup key of a patient_notes row ({row} is new or old)
+_ROLLUP_KEY = '''
+    COALESCE(date({row}.ts_epoch, 'unixepoch', 'localtime'), ''),
+    COALESCE({row}.calculator_type, ''),
+    COALESCE({row}.category, '')
+'''
+
+_ROLLUP_MATCH = '''
+    day = COALESCE(date({row}.ts_epoch, 'unixepoch', 'localtime'), '')
+    AND calculator_type = COALESCE({row}.calculator_type, '')
+    AND category = COALESCE({row}.category, '')
+'''
+
+
+def _add_rollups(conn):
+    """Version 5: daily counts per calculator type and category, kept by triggers"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS daily_rollup (
+            day TEXT NOT NULL,
+            calculator_type TEXT NOT NULL,
+            category TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            score_sum REAL NOT NULL,
+            PRIMARY KEY (day, calculator_type, category)
+        ) WITHOUT ROWID
+    ''')
+
+    # Rows up to end_id predate the triggers; rollups.backfill_step() adds
+    # them in id order, advancing done_id
+    conn.execute('CREATE TABLE IF NOT EXISTS rollup_backfill (done_id INTEGER NOT NULL, end_id INTEGER NOT NULL)')
+    conn.execute('INSERT INTO rollup_backfill SELECT 0, COALESCE(MAX(id), 0) FROM patient_notes')
+
+    increment = f'''
+        INSERT OR IGNORE INTO daily_rollup VALUES ({_ROLLUP_KEY.format(row='new')}, 0, 0);
+        UPDATE daily_rollup SET count = count + 1, score_sum = score_sum + COALESCE(new.score, 0)
+        WHERE {_ROLLUP_MATCH.format(row='new')};
+    '''
+    conn.execute(f'CREATE TRIGGER IF NOT EXISTS rollup_insert AFTER INSERT ON patient_notes BEGIN {increment} END')
+
+    # Typed columns filled in later (records.backfill) move the row to its
+    # category, once it is counted. Deletes (archiving) keep their counts.
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS rollup_update AFTER UPDATE OF category, score ON patient_notes
+        WHEN (SELECT old.id <= done_id OR old.id > end_id FROM rollup_backfill)
+        BEGIN
+            UPDATE daily_rollup SET count = count - 1, score_sum = score_sum - COALESCE(old.score, 0)
+            WHERE {_ROLLUP_MATCH.format(row='old')};
+            {increment}
+        END
+    ''')
+
+
+def _add_write_batches(conn):
+    """Version 6: ids of batches committed through the writer process, so a resend is ignored"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS write_batches (
+            batch_id TEXT PRIMARY KEY,
+            ts_epoch INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+
+
+# (version, migration), in order
+MIGRATIONS = (
+    (1, _create_base_tables),
+    (2, _add_epoch_timestamps),
+    (3, _add_typed_columns),
+    (4, _add_fulltext_index),
+    (5, _add_rollups),
+    (6, _add_write_batches),
+)
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    """Schema version of an open database (0 when unversioned)"""
+    conn.execute('CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)')
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+
+def migrate(conn):
+    """Bring the database up to SCHEMA_VERSION"""
+    if current_version(conn) >= SCHEMA_VERSION:
+        return
+
+    for version, migration in MIGRATIONS:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Re-check under the write lock in case another instance got here first
+            if current_version(conn) < version:
+                migration(conn)
+                conn.execute('INSERT INTO schema_version (version) VALUES (?)', (version,))
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
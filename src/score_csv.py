@@ -0,0 +1,372 @@
+"""
+QuickMed Calc - CSV Batch Scorer
+Scores CSV extracts of any size across all CPU cores.
+
+    python src/score_csv.py cohort.csv.gz scored.csv --config mapping.json --workers 8
+
+The input is read in chunks of --chunk-size rows; chunks are scored in a
+process pool and written in input order, with at most two chunks per worker
+in flight, so memory stays bounded however long the file is. A row that
+fails validation gets an error message in its <prefix>_error column instead
+of stopping the run. Progress (rows/s) is printed to stderr.
+
+mapping.json names the calculators to run and where their inputs are:
+
+    {
+      "passthrough": ["mrn", "encounter_id"],
+      "scores": [
+        {"calculator": "bmi", "columns": {"weight": "wt_kg", "height_cm": "ht_cm"}},
+        {"calculator": "creatinine", "prefix": "crcl",
+         "columns": {"age": "age", "weight": "wt_kg", "creatinine": "scr", "gender": "sex"},
+         "values": {"gender": {"M": "male", "F": "female"}}},
+        {"calculator": "chads2",
+         "columns": {"criteria": ["chf", "htn", "age_75", "diabetes", "stroke_tia"]}}
+      ]
+    }
+
+"columns" maps each input to a CSV column (a list of columns for checklist
+and multi-choice inputs; yes/no cells accept 1/0, y/n, yes/no, true/false).
+Inputs left out default to a column of the same name; optional inputs (the
+pediatric dosing drug) may have no column at all. "values" recodes raw
+cells before validation. Each calculator adds <prefix>_value,
+<prefix>_category and <prefix>_error columns; the prefix defaults to the
+calculator key.
+
+With NumPy installed, BMI, BSA and creatinine clearance are scored a chunk
+at a time by batch.py, and GCS, Wells, APGAR and CHADS₂ by score_tables.py
+lookups. Other calculators, and rows with blank, unparsable or out-of-range
+cells, are scored through the calculator spec one row at a time, which
+also words their error messages.
+"""
+
+import argparse
+import collections
+import csv
+import gzip
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import batch
+import engine
+import export
+import records
+import registry
+import score_tables
+from batch import np
+
+_YES = frozenset(('1', 'y', 'yes', 'true', 't'))
+_NO = frozenset(('0', 'n', 'no', 'false', 'f', ''))
+
+
+class MappingError(ValueError):
+    """The column mapping does not fit the mapping format or the input header"""
+
+
+def _flag(cell):
+    value = cell.strip().lower()
+    if value in _YES:
+        return 1
+    if value in _NO:
+        return 0
+    raise ValueError(f"Expected yes/no, got {cell!r}")
+
+
+# Vectorized parsing of the cells of one chunk: (parsed column, valid mask)
+
+def _numbers(field, cells):
+    values = batch._as_float(cells)
+    with np.errstate(invalid='ignore'):
+        valid = np.isfinite(values)
+        if field.minimum is not None:
+            valid &= values >= field.minimum
+        if field.maximum is not None:
+            valid &= values <= field.maximum
+    return values, valid
+
+
+def _choices(options, cells):
+    # Same match as Choice.parse: the cell is the option value as text
+    chosen = np.full(len(cells), -1)
+    for index, (value, _) in enumerate(options):
+        chosen[cells == str(value)] = index
+    values = np.array([value for value, _ in options])
+    return values[np.maximum(chosen, 0)], chosen >= 0
+
+
+def _flags(cells):
+    lowered = np.char.lower(cells)
+    yes = np.isin(lowered, list(_YES))
+    return yes.astype(np.int64), yes | np.isin(lowered, list(_NO))
+
+
+def _table(table, *components):
+    result = table.bulk(table.encode_columns(*components))
+    # The discrete scores are whole numbers, as engine.py returns them
+    values = np.where(result.valid, result.values, 0).astype(np.int64)
+    return batch.BatchResult(values, result.codes, result.valid), table.labels
+
+
+def _vectorizable(field, position):
+    """Whether the chunk parsers above read field exactly as field.parse does"""
+    if isinstance(field, registry.Number):
+        return not field.integer and not isinstance(position, list)
+    if isinstance(field, registry.Choice):
+        return not isinstance(position, list)
+    if isinstance(field, registry.Checklist):
+        return isinstance(position, list) and len(position) == len(field.criteria)
+    if isinstance(field, registry.ChoiceList):
+        return isinstance(position, list) and len(position) == len(field.groups)
+    return False
+
+
+# Chunk scorers by calculator formula: parsed columns -> (BatchResult, category labels)
+_VECTORIZED = {
+    engine.calculate_bmi: lambda c: (batch.bmi_batch(c['weight'], c['height_cm']), batch.BMI_LABELS),
+    engine.calculate_bsa: lambda c: (batch.bsa_batch(c['weight'], c['height_cm']), ('',)),
+    engine.calculate_creatinine: lambda c: (batch.crcl_batch(c['age'], c['weight'], c['creatinine'],
+                                                             c['gender'] == 'female'), batch.CRCL_LABELS),
+    engine.calculate_gcs: lambda c: _table(score_tables.GCS, c['eye'], c['verbal'], c['motor']),
+    engine.calculate_wells: lambda c: _table(score_tables.WELLS, *c['criteria']),
+    engine.calculate_apgar: lambda c: _table(score_tables.APGAR, *c['scores']),
+    engine.calculate_chads2: lambda c: _table(score_tables.CHADS2, *c['criteria']),
+}
+
+
+class _Scorer:
+    """One calculator of the mapping, bound to column positions of the header"""
+
+    def __init__(self, spec, entry, header):
+        self.spec = spec
+        self.prefix = entry.get('prefix', entry['calculator'])
+        columns = entry.get('columns', {})
+        self.values = entry.get('values', {})
+        positions = {name: i for i, name in enumerate(header)}
+
+        self.fields = []  # (name, column position or list of positions, is checklist)
+        for field in spec.inputs:
+            mapped = columns.get(field.name, field.name)
+            missing = [column for column in (mapped if isinstance(mapped, list) else [mapped])
+                       if column not in positions]
+            if missing and isinstance(field, registry.Autocomplete) and not field.required:
+                continue  # optional column: parsed as empty
+            if missing:
+                raise MappingError(f"{self.prefix}: input column(s) not found: {', '.join(missing)}")
+            if isinstance(mapped, list):
+                self.fields.append((field.name, [positions[column] for column in mapped],
+                                    isinstance(field, registry.Checklist)))
+            else:
+                self.fields.append((field.name, positions[mapped], False))
+
+        self.by_name = {field.name: field for field in spec.inputs}
+        # Shorter (truncated) rows fail with IndexError on the per-row path
+        self.width = 1 + max((max(position, default=-1) if isinstance(position, list) else position
+                              for _, position, _ in self.fields), default=-1)
+        self.vectorized = _VECTORIZED.get(spec.formula) if np is not None else None
+        if not all(_vectorizable(self.by_name[name], position) for name, position, _ in self.fields):
+            self.vectorized = None
+
+    def output_columns(self):
+        return [f'{self.prefix}_value', f'{self.prefix}_category', f'{self.prefix}_error']
+
+    def _cell(self, name, cell):
+        cell = cell.strip()
+        recode = self.values.get(name)
+        return recode.get(cell, cell) if recode else cell
+
+    def score(self, row):
+        """[value, category, error] for one row"""
+        try:
+            raw = {}
+            for name, position, checklist in self.fields:
+                if isinstance(position, list):
+                    cells = [self._cell(name, row[i]) for i in position]
+                    raw[name] = [_flag(cell) for cell in cells] if checklist else cells
+                else:
+                    raw[name] = self._cell(name, row[position])
+            values, result = self.spec.calculate(raw)
+        except (IndexError, TypeError, ValueError) as exc:
+            return ['', '', str(exc) or type(exc).__name__]
+        score, category = records.score_category(result)
+        return [score, category, '']
+
+    def _column(self, name, rows, position):
+        """The cells of one input column, as _cell reads them"""
+        cells = np.char.strip(np.array([row[position] if position < len(row) else '' for row in rows],
+                                       dtype=str))
+        recode = self.values.get(name)
+        if recode:
+            cells = np.array([recode.get(cell, cell) for cell in cells.tolist()], dtype=str)
+        return cells
+
+    def score_rows(self, rows):
+        """[value, category, error] for each row of a chunk"""
+        if self.vectorized is None or not rows:
+            return [self.score(row) for row in rows]
+
+        columns = {}
+        ok = np.fromiter((len(row) >= self.width for row in rows), dtype=bool, count=len(rows))
+        for name, position, _ in self.fields:
+            field = self.by_name[name]
+            if isinstance(field, registry.Number):
+                parsed = [_numbers(field, self._column(name, rows, position))]
+            elif isinstance(field, registry.Choice):
+                parsed = [_choices(field.options, self._column(name, rows, position))]
+            elif isinstance(field, registry.Checklist):
+                parsed = [_flags(self._column(name, rows, column)) for column in position]
+            else:  # ChoiceList
+                parsed = [_choices(options, self._column(name, rows, column))
+                          for (_, options), column in zip(field.groups, position)]
+            for _, valid in parsed:
+                ok &= valid
+            columns[name] = [values for values, _ in parsed] if isinstance(position, list) else parsed[0][0]
+
+        with np.errstate(all='ignore'):
+            result, labels = self.vectorized(columns)
+        ok &= result.valid
+        values = result.values.tolist()
+        categories = batch.decode(result.codes, labels).tolist()
+        return [[values[i], categories[i], ''] if ok[i] else self.score(row)
+                for i, row in enumerate(rows)]
+
+
+class _Plan:
+    """Passthrough columns and scorers for one input header"""
+
+    def __init__(self, mapping, header):
+        """Raises MappingError when the mapping is malformed or names missing columns"""
+        calculators = registry.default_registry()
+        positions = {name: i for i, name in enumerate(header)}
+        try:
+            passthrough = mapping.get('passthrough', [])
+            missing = [column for column in passthrough if column not in positions]
+            if missing:
+                raise MappingError(f"passthrough column(s) not found: {', '.join(missing)}")
+            self.passthrough = [positions[column] for column in passthrough]
+            self.header = list(passthrough)
+            self.scorers = []
+            for entry in mapping['scores']:
+                if entry['calculator'] not in calculators:
+                    raise MappingError(f"Unknown calculator: {entry['calculator']}")
+                scorer = _Scorer(calculators.spec(entry['calculator']), entry, header)
+                self.scorers.append(scorer)
+                self.header.extend(scorer.output_columns())
+        except MappingError:
+            raise
+        except KeyError as exc:
+            raise MappingError(f"missing key {exc}") from None
+        except (AttributeError, TypeError, ValueError) as exc:
+            raise MappingError(str(exc)) from None
+
+    def score_rows(self, rows):
+        output = [[row[i] if i < len(row) else '' for i in self.passthrough] for row in rows]
+        for scorer in self.scorers:
+            for scored, columns in zip(output, scorer.score_rows(rows)):
+                scored.extend(columns)
+        return output
+
+
+# Set in each worker process by _init_worker
+_plan = None
+
+
+def _init_worker(mapping, header):
+    global _plan
+    _plan = _Plan(mapping, header)
+
+
+def _score_chunk(rows):
+    return _plan.score_rows(rows)
+
+
+def _chunks(reader, chunk_size):
+    chunk = []
+    for row in reader:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _open_input(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def score_file(input_path, output_path, mapping, workers=None, chunk_size=20000, progress=None):
+    """
+    Score every row of input_path into output_path, in input order
+
+    workers: processes to use (default: all cores); 1 scores in this process
+    progress: called as progress(rows_done, elapsed_seconds) after each chunk
+    Returns (rows, rows with at least one error).
+    """
+    workers = workers or os.cpu_count() or 1
+    done = failed = 0
+    started = time.monotonic()
+
+    with _open_input(input_path) as source, export.open_output(output_path) as target:
+        reader = csv.reader(source)
+        header = next(reader)
+        plan = _Plan(mapping, header)  # validate the mapping before starting workers
+        writer = csv.writer(target)
+        writer.writerow(plan.header)
+        error_columns = [len(plan.passthrough) + 3 * i + 2 for i in range(len(plan.scorers))]
+
+        def write(scored):
+            nonlocal done, failed
+            writer.writerows(scored)
+            done += len(scored)
+            failed += sum(1 for row in scored if any(row[i] for i in error_columns))
+            if progress is not None:
+                progress(done, time.monotonic() - started)
+
+        if workers == 1:
+            for chunk in _chunks(reader, chunk_size):
+                write(plan.score_rows(chunk))
+            return done, failed
+
+        # Futures are kept in submission order; waiting on the oldest keeps
+        # the output ordered and at most 2 * workers chunks in memory
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(mapping, header)) as pool:
+            pending = collections.deque()
+            for chunk in _chunks(reader, chunk_size):
+                pending.append(pool.submit(_score_chunk, chunk))
+                if len(pending) >= 2 * workers:
+                    write(pending.popleft().result())
+            while pending:
+                write(pending.popleft().result())
+    return done, failed
+
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Score a CSV extract with QuickMed Calc calculators")
+    parser.add_argument('input', help="input CSV (.gz accepted)")
+    parser.add_argument('output', help="output CSV; a .gz suffix enables gzip")
+    parser.add_argument('--config', required=True, help="column-mapping JSON")
+    parser.add_argument('--workers', type=int, help="processes (default: all cores)")
+    parser.add_argument('--chunk-size', type=int, default=20000, help="rows per chunk")
+    args = parser.parse_args(argv)
+
+    with open(args.config, encoding='utf-8') as f:
+        mapping = json.load(f)
+
+    def report(done, elapsed):
+        rate = done / elapsed if elapsed else 0
+        print(f"\r{done:,} rows scored ({rate:,.0f} rows/s)", end='', file=sys.stderr, flush=True)
+
+    try:
+        rows, failed = score_file(args.input, args.output, mapping, args.workers, args.chunk_size, report)
+    except MappingError as exc:
+        parser.exit(2, f"Invalid column mapping: {exc}\n")
+    print(f"\r{rows:,} rows scored to {args.output}, {failed:,} with errors", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
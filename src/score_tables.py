@@ -0,0 +1,153 @@
+"""
+QuickMed Calc - Lookup-Table Scoring for Discrete Scores
+GCS, Wells, APGAR and CHADS₂ have small, finite input spaces, so every
+possible answer is precomputed from engine.py once and resolved afterwards
+with a single table lookup.
+
+Inputs are packed into integer keys with a mixed-radix code: component i
+contributes (value - offset) * weight_i, where weight_i is the product of
+the radices before it. For yes/no criteria (Wells, CHADS₂) this is simply a
+bitmask with criterion i in bit i.
+
+Bulk scoring of an integer-encoded column is a NumPy gather (optional
+dependency, see batch.py).
+"""
+
+import engine
+from batch import BatchResult, INVALID, _as_float, np, require_numpy
+
+
+class ScoreTable:
+    """Precomputed results for every input combination of a discrete score"""
+
+    def __init__(self, name, radices, offsets, score):
+        self.name = name
+        self.radices = tuple(radices)
+        self.offsets = tuple(offsets)
+        self.weights = []
+        weight = 1
+        for radix in self.radices:
+            self.weights.append(weight)
+            weight *= radix
+        self.weights = tuple(self.weights)
+        self.size = weight
+
+        self.results = tuple(score(self.decode(key)) for key in range(self.size))
+
+        # Band codes are assigned in order of increasing total
+        labels = []
+        for result in sorted(self.results, key=lambda r: r.value):
+            if result.category not in labels:
+                labels.append(result.category)
+        self.labels = tuple(labels)
+        self._band_of = {label: code for code, label in enumerate(self.labels)}
+        self._arrays = None
+
+    def encode(self, components):
+        """Pack one set of component values into its integer key"""
+        if len(components) != len(self.radices):
+            raise ValueError(f"{self.name} expects {len(self.radices)} components")
+        key = 0
+        for value, radix, offset, weight in zip(components, self.radices, self.offsets, self.weights):
+            # Whole numbers only: int() would truncate 4.9 to 4
+            try:
+                whole = int(value)
+            except (TypeError, ValueError, OverflowError):
+                whole = None
+            if whole is None or whole != value:
+                raise ValueError(f"{self.name} component is not a whole number: {value!r}")
+            digit = whole - offset
+            if not (0 <= digit < radix):
+                raise ValueError(f"{self.name} component out of range: {value}")
+            key += digit * weight
+        return key
+
+    def decode(self, key):
+        """Unpack an integer key into its component values"""
+        if not (0 <= key < self.size):
+            raise ValueError(f"{self.name} key out of range: {key}")
+        components = []
+        for radix, offset in zip(self.radices, self.offsets):
+            key, digit = divmod(key, radix)
+            components.append(digit + offset)
+        return tuple(components)
+
+    def lookup(self, key):
+        """Result (total, band, recommendation, text) for an encoded key"""
+        return self.results[key]
+
+    def score(self, components):
+        """Result for one set of component values"""
+        return self.results[self.encode(components)]
+
+    def band(self, key):
+        """Band code of an encoded key; decode with self.labels"""
+        return self._band_of[self.results[key].category]
+
+    def _gather_arrays(self):
+        if self._arrays is None:
+            totals = np.array([r.value for r in self.results], dtype=np.float64)
+            codes = np.array([self._band_of[r.category] for r in self.results], dtype=np.int8)
+            texts = np.array([r.text for r in self.results], dtype=object)
+            recommendations = np.array([r.recommendation for r in self.results], dtype=object)
+            self._arrays = (totals, codes, texts, recommendations)
+        return self._arrays
+
+    def encode_columns(self, *columns):
+        """
+        Vectorized encode of one column per component; invalid rows get key -1
+
+        A row is invalid where encode() would raise: a missing, fractional
+        or out-of-range component.
+        """
+        require_numpy()
+        if len(columns) != len(self.radices):
+            raise ValueError(f"{self.name} expects {len(self.radices)} columns")
+        keys = None
+        valid = None
+        for column, radix, offset, weight in zip(columns, self.radices, self.offsets, self.weights):
+            values = _as_float(column) - offset
+            with np.errstate(invalid='ignore'):
+                ok = (values >= 0) & (values < radix) & (values == np.floor(values))
+            digits = np.where(ok, values, 0).astype(np.int64)
+            part = digits * weight
+            keys = part if keys is None else keys + part
+            valid = ok if valid is None else valid & ok
+        return np.where(valid, keys, INVALID)
+
+    def _safe_keys(self, keys):
+        keys = np.asarray(keys, dtype=np.int64)
+        valid = (keys >= 0) & (keys < self.size)
+        return np.where(valid, keys, 0), valid
+
+    def bulk(self, keys):
+        """Score a column of encoded keys; out-of-range keys are masked"""
+        require_numpy()
+        totals, codes, _, _ = self._gather_arrays()
+        safe, valid = self._safe_keys(keys)
+        return BatchResult(np.where(valid, totals[safe], np.nan),
+                           np.where(valid, codes[safe], INVALID).astype(np.int8),
+                           valid)
+
+    def bulk_text(self, keys):
+        """Display text and recommendation per encoded key (None where masked)"""
+        require_numpy()
+        _, _, texts, recommendations = self._gather_arrays()
+        safe, valid = self._safe_keys(keys)
+        return (np.where(valid, texts[safe], None),
+                np.where(valid, recommendations[safe], None))
+
+
+GCS = ScoreTable("GCS",
+                 (len(engine.GCS_EYE_OPTIONS), len(engine.GCS_VERBAL_OPTIONS), len(engine.GCS_MOTOR_OPTIONS)),
+                 (1, 1, 1),
+                 lambda c: engine.calculate_gcs(*c))
+
+WELLS = ScoreTable("Wells", (2,) * len(engine.WELLS_CRITERIA), (0,) * len(engine.WELLS_CRITERIA),
+                   engine.calculate_wells)
+
+APGAR = ScoreTable("APGAR", (3,) * len(engine.APGAR_CRITERIA), (0,) * len(engine.APGAR_CRITERIA),
+                   engine.calculate_apgar)
+
+CHADS2 = ScoreTable("CHADS₂", (2,) * len(engine.CHADS2_CRITERIA), (0,) * len(engine.CHADS2_CRITERIA),
+                    engine.calculate_chads2)
@@ -0,0 +1,97 @@
+"""
+QuickMed Calc - Calculator Search Index
+Ranked lookup of calculators by name, synonym or abbreviation.
+
+The index is built once. A query is matched against prefix and trigram
+tables to find candidates, and only those candidates are scored, so search
+cost grows with the number of matches rather than the size of the catalog.
+
+Ranking, best first: exact name or synonym, name or synonym starting with the
+query, every query word starting a word of a term, substring, then fuzzy
+trigram similarity (catches typos such as "creatinin" or "apagr").
+"""
+
+import re
+
+_SUBSCRIPTS = str.maketrans('₀₁₂₃₄₅₆₇₈₉', '0123456789')
+_NON_WORD = re.compile(r'[^0-9a-z]+')
+
+# Minimum trigram similarity (Jaccard) for a fuzzy match
+FUZZY_THRESHOLD = 0.3
+
+
+def normalize(text):
+    """Lowercase, plain digits and single spaces between words"""
+    return _NON_WORD.sub(' ', text.translate(_SUBSCRIPTS).lower()).strip()
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Prefix and trigram index over calculator names and synonyms"""
+
+    def __init__(self):
+        self.order = []    # keys in catalog order, for empty queries and ties
+        self.terms = {}    # key -> [(normalized term, its words, its trigrams)]
+        self._position = {}
+        self._prefixes = {}
+        self._trigrams = {}
+
+    def add(self, key, name, synonyms=()):
+        """Index one calculator"""
+        if key not in self.terms:
+            self._position[key] = len(self.order)
+            self.order.append(key)
+        terms = [normalize(term) for term in (name,) + tuple(synonyms)]
+        self.terms[key] = [(term, term.split(), trigrams(term)) for term in terms if term]
+        for term, words, grams in self.terms[key]:
+            for word in words:
+                for end in range(1, len(word) + 1):
+                    self._prefixes.setdefault(word[:end], set()).add(key)
+            for gram in grams:
+                self._trigrams.setdefault(gram, set()).add(key)
+
+    def _candidates(self, query, query_grams):
+        words = query.split()
+        keys = set.intersection(*(self._prefixes.get(word, set()) for word in words))
+        # Substring and fuzzy matches share a trigram with the query; skip
+        # this for one or two letters, where prefixes already say everything
+        if len(query) >= 3:
+            for gram in query_grams:
+                keys |= self._trigrams.get(gram, set())
+        return keys
+
+    def score(self, key, query, query_grams=None):
+        """Relevance of one calculator for a normalized query (0 = no match)"""
+        if query_grams is None:
+            query_grams = trigrams(query)
+        query_words = query.split()
+        best = 0.0
+        for term, words, grams in self.terms[key]:
+            if term == query:
+                return 1.0
+            if term.startswith(query):
+                best = max(best, 0.9)
+            elif all(any(w.startswith(q) for w in words) for q in query_words):
+                best = max(best, 0.8)
+            elif query in term:
+                best = max(best, 0.6)
+            elif best < 0.5 and len(query) >= 3:
+                similarity = len(query_grams & grams) / len(query_grams | grams)
+                if similarity >= FUZZY_THRESHOLD:
+                    best = max(best, 0.5 * similarity)
+        return best
+
+    def search(self, query):
+        """Matching keys, best first; every key for an empty query"""
+        query = normalize(query)
+        if not query:
+            return list(self.order)
+        query_grams = trigrams(query)
+        scored = [(self.score(key, query, query_grams), key)
+                  for key in self._candidates(query, query_grams)]
+        scored = [(-score, self._position[key], key) for score, key in scored if score > 0]
+        return [key for _, _, key in sorted(scored)]
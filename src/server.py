@@ -0,0 +1,299 @@
+"""
+QuickMed Calc - Scoring Service
+Local HTTP/JSON API over every registered calculator, for EHR integration.
+
+    python src/server.py [--port 8765] [--log-db quickmed_data.db]
+
+Runs on asyncio with the standard library only and binds to 127.0.0.1 by
+default, so it works fully offline. Connections are kept alive and scoring
+runs inline (engine calls take microseconds), so one process serves
+thousands of requests per second.
+
+Endpoints:
+    GET  /health
+    GET  /calculators                 metadata and input fields of every calculator
+    GET  /calculators/<key>           one calculator
+    POST /calculators/<key>           {"inputs": {...}, "patient_info": "..."}
+    POST /batch                       {"requests": [{"calculator": key, "inputs": {...}}, ...]}
+
+Inputs are validated by the calculator spec (ranges, required choices); an
+invalid single request gets 400 and an invalid batch item gets an "error"
+entry in place of its result. With --log-db every result is also saved to
+patient_notes through the batched PersistenceWorker.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from http import HTTPStatus
+
+import records
+import registry
+import storage
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+MAX_BODY_BYTES = 8 * 1024 * 1024
+MAX_BATCH = 10000
+
+# Completion and error callbacks of the logging worker are run this often
+DISPATCH_INTERVAL = 0.5
+
+
+class RequestError(Exception):
+    """A client error, reported with an HTTP status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _describe_field(field):
+    description = field._asdict()
+    description['kind'] = type(field).__name__
+    if isinstance(field, registry.Autocomplete):
+        description['source'] = field.source.names()
+    return description
+
+
+class ScoringService:
+    """Calculator lookup, validation and scoring, independent of the transport"""
+
+    def __init__(self, calculators=None, store=None):
+        """
+        calculators: a registry.Registry (default: manifest plus entry points)
+        store: a started storage.PersistenceWorker to log results to, or None
+        """
+        self.calculators = calculators if calculators is not None else registry.default_registry()
+        self.store = store
+
+    def describe(self, key):
+        if key not in self.calculators:
+            raise RequestError(HTTPStatus.NOT_FOUND, f"Unknown calculator: {key}")
+        info = self.calculators.infos[key]
+        spec = self.calculators.spec(key)
+        return {'key': key, 'name': info.name, 'calculator_type': info.calculator_type,
+                'synonyms': list(info.synonyms), 'title': spec.title,
+                'inputs': [_describe_field(field) for field in spec.inputs]}
+
+    def catalog(self):
+        return [self.describe(key) for key in self.calculators.infos]
+
+    def score(self, key, inputs, patient_info=""):
+        """
+        Validate and score one request
+
+        Raises RequestError for an unknown calculator or invalid inputs.
+        """
+        if not isinstance(key, str):
+            raise RequestError(HTTPStatus.BAD_REQUEST, "calculator must be a string")
+        if key not in self.calculators:
+            raise RequestError(HTTPStatus.NOT_FOUND, f"Unknown calculator: {key}")
+        if not isinstance(inputs, dict):
+            raise RequestError(HTTPStatus.BAD_REQUEST, "inputs must be a JSON object")
+        spec = self.calculators.spec(key)
+        try:
+            values, result = spec.calculate(inputs)
+        except (TypeError, ValueError) as exc:
+            raise RequestError(HTTPStatus.BAD_REQUEST, str(exc)) from None
+
+        if self.store is not None:
+            self.store.add_calculation(spec.calculator_type, spec.summarize(values), spec.saved_text(result),
+                                       str(patient_info or ""), records.make_record(values, result))
+
+        outputs = result._asdict()
+        text = outputs.pop('text')
+        return {'calculator': key, 'inputs': values, 'outputs': outputs, 'text': text}
+
+    def score_batch(self, items):
+        """Score a list of {"calculator", "inputs"} items; failures become {"error": ...}"""
+        if not isinstance(items, list):
+            raise RequestError(HTTPStatus.BAD_REQUEST, "requests must be a JSON array")
+        if len(items) > MAX_BATCH:
+            raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                               f"At most {MAX_BATCH} requests per batch")
+        results = []
+        for item in items:
+            try:
+                if not isinstance(item, dict):
+                    raise RequestError(HTTPStatus.BAD_REQUEST, "each request must be a JSON object")
+                results.append(self.score(item.get('calculator'), item.get('inputs', {}),
+                                          item.get('patient_info', "")))
+            except RequestError as exc:
+                results.append({'calculator': item.get('calculator') if isinstance(item, dict) else None,
+                                'error': str(exc)})
+        return results
+
+    def handle(self, method, path, body):
+        """(status, JSON-ready payload) for one HTTP request"""
+        parts = [part for part in path.split('?', 1)[0].split('/') if part]
+
+        if parts == ['health'] and method == 'GET':
+            return HTTPStatus.OK, {'status': 'ok', 'calculators': len(self.calculators)}
+        if parts == ['calculators'] and method == 'GET':
+            return HTTPStatus.OK, {'calculators': self.catalog()}
+        if len(parts) == 2 and parts[0] == 'calculators':
+            if method == 'GET':
+                return HTTPStatus.OK, self.describe(parts[1])
+            if method == 'POST':
+                request = _load_json(body)
+                return HTTPStatus.OK, self.score(parts[1], request.get('inputs', {}),
+                                                 request.get('patient_info', ""))
+        if parts == ['batch'] and method == 'POST':
+            request = _load_json(body)
+            return HTTPStatus.OK, {'results': self.score_batch(request.get('requests'))}
+
+        if parts in (['health'], ['calculators'], ['batch']) or \
+                len(parts) == 2 and parts[0] == 'calculators':
+            raise RequestError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} not allowed on {path}")
+        raise RequestError(HTTPStatus.NOT_FOUND, f"No such endpoint: {path}")
+
+
+def _load_json(body):
+    try:
+        request = json.loads(body or b'{}')
+    except (UnicodeDecodeError, ValueError):
+        raise RequestError(HTTPStatus.BAD_REQUEST, "Request body is not valid JSON") from None
+    if not isinstance(request, dict):
+        raise RequestError(HTTPStatus.BAD_REQUEST, "Request body must be a JSON object")
+    return request
+
+
+def _response(status, payload, keep_alive):
+    # NaN and Infinity are not JSON: raises ValueError rather than sending them
+    body = json.dumps(payload, ensure_ascii=False, separators=(',', ':'), allow_nan=False).encode('utf-8')
+    head = (f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+            f'Content-Type: application/json; charset=utf-8\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n')
+    return head.encode('latin-1') + body
+
+
+async def _read_request(reader):
+    """(method, path, headers, body) of the next request, or None at end of stream"""
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise RequestError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Request headers too large")
+
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, path, version = lines[0].split(' ')
+    except ValueError:
+        raise RequestError(HTTPStatus.BAD_REQUEST, "Malformed request line") from None
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        if name:
+            headers[name.strip().lower()] = value.strip()
+    if version == 'HTTP/1.0':
+        headers.setdefault('connection', 'close')
+
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        raise RequestError(HTTPStatus.LENGTH_REQUIRED, "Chunked request bodies are not supported")
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise RequestError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length") from None
+    if length < 0:
+        raise RequestError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Body exceeds {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b''
+    return method, path, headers, body
+
+
+async def _serve_connection(service, reader, writer):
+    try:
+        while True:
+            try:
+                request = await _read_request(reader)
+            except RequestError as exc:
+                writer.write(_response(HTTPStatus(exc.status), {'error': str(exc)}, False))
+                break
+            if request is None:
+                break
+            method, path, headers, body = request
+            keep_alive = headers.get('connection', '').lower() != 'close'
+            try:
+                status, payload = service.handle(method, path, body)
+                response = _response(status, payload, keep_alive)
+            except RequestError as exc:
+                response = _response(HTTPStatus(exc.status), {'error': str(exc)}, keep_alive)
+            except Exception as exc:
+                # A bug (or a non-finite result) must not drop the connection without a response
+                print(f"Error handling {method} {path}: {exc!r}", file=sys.stderr)
+                response = _response(HTTPStatus.INTERNAL_SERVER_ERROR, {'error': "Internal server error"},
+                                     keep_alive)
+            writer.write(response)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _dispatch_store(store):
+    while True:
+        await asyncio.sleep(DISPATCH_INTERVAL)
+        store.dispatch()
+
+
+async def serve(service, host=DEFAULT_HOST, port=DEFAULT_PORT, ready=None):
+    """Serve until cancelled; ready(server) is called once listening"""
+    server = await asyncio.start_server(lambda reader, writer: _serve_connection(service, reader, writer),
+                                        host, port)
+    dispatcher = asyncio.ensure_future(_dispatch_store(service.store)) if service.store else None
+    if ready is not None:
+        ready(server)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if dispatcher is not None:
+            dispatcher.cancel()
+
+
+def run_server(host=DEFAULT_HOST, port=DEFAULT_PORT, log_db=None):
+    """Start the scoring service (the headless counterpart of QuickMedCalc.run)"""
+    store = None
+    if log_db:
+        def report_error(exc):
+            print(f"Logging to {log_db} failed: {exc}", file=sys.stderr)
+
+        store = storage.PersistenceWorker(log_db, batch_size=500, flush_interval=1.0, on_error=report_error)
+        store.start()
+    service = ScoringService(store=store)
+
+    def announce(server):
+        print(f"QuickMed Calc scoring service on http://{host}:{port} "
+              f"({len(service.calculators)} calculators)", file=sys.stderr)
+
+    try:
+        asyncio.run(serve(service, host, port, ready=announce))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if store is not None:
+            store.close()
+            store.dispatch()
+
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Serve QuickMed Calc calculators over local HTTP/JSON")
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f"bind address (default {DEFAULT_HOST})")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--log-db', metavar='PATH', help="also save every result to this database")
+    args = parser.parse_args(argv)
+    run_server(args.host, args.port, args.log_db)
+
+
+if __name__ == "__main__":
+    main()
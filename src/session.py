@@ -0,0 +1,72 @@
+"""
+QuickMed Calc - Session History
+The calculations of the running session, kept in memory for instant recall.
+
+SessionHistory is a fixed-size ring buffer: once full, every new entry
+replaces the oldest, so memory stays constant however long the app runs.
+Entries hold the typed inputs (as parsed by the calculator spec) and the
+saved result text, never widgets, and are never read back from SQLite.
+"""
+
+import time
+
+
+class SessionEntry:
+    """One saved calculation"""
+
+    __slots__ = ('calc_key', 'calculator_type', 'values', 'inputs', 'result', 'score', 'category',
+                 'ts_epoch')
+
+    def __init__(self, calc_key, calculator_type, values, inputs, result, score=None, category=None,
+                 ts_epoch=None):
+        self.calc_key = calc_key  # registry key, for recall into the form
+        self.calculator_type = calculator_type
+        self.values = values      # typed inputs: spec.parse() output
+        self.inputs = inputs      # display text, as saved
+        self.result = result
+        self.score = score
+        self.category = category
+        self.ts_epoch = time.time() if ts_epoch is None else ts_epoch
+
+    def label(self):
+        """One-line description for the recent-calculations list"""
+        return f"{time.strftime('%H:%M', time.localtime(self.ts_epoch))}  {self.result}"
+
+
+class SessionHistory:
+    """Bounded history, newest first when indexed or iterated"""
+
+    def __init__(self, capacity=50):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self._entries = [None] * capacity
+        self._next = 0   # slot the next entry is written to
+        self._count = 0
+
+    def append(self, entry):
+        """Add an entry, dropping the oldest when full; returns the dropped entry or None"""
+        dropped = self._entries[self._next] if self._count == self.capacity else None
+        self._entries[self._next] = entry
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+        return dropped
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        """index 0 is the newest entry"""
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("session history index out of range")
+        return self._entries[(self._next - 1 - index) % self.capacity]
+
+    def __iter__(self):
+        for index in range(self._count):
+            yield self[index]
+
+    def clear(self):
+        self._entries = [None] * self.capacity
+        self._next = self._count = 0
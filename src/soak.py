@@ -0,0 +1,307 @@
+"""
+QuickMed Calc - Long-Session Soak Test
+Drives the GUI through a shift's worth of use and checks that memory stays flat.
+
+    xvfb-run -a python src/soak.py --iterations 20000
+    xvfb-run -a python src/soak.py --view-cache-size 0   # rebuild every view on every switch
+
+The app runs against a temporary database, without mainloop: each step
+is one calculator switch, quick search, calculation or recall, performed
+through the widgets (typing into entries, invoking radio buttons, check
+buttons and the Calculate button), followed by root.update() so debounced
+searches, live results and persistence callbacks run as they would.
+
+After --warmup steps (every view built, the recent list full) the baseline
+is taken; every --sample-every steps the app is brought to the same state
+(every calculator opened once, in a fixed order) and RSS, tracemalloc's
+traced memory, the live widget count and the Tcl command count are
+sampled. A leak shows as steady growth; exits 1 if traced memory or RSS
+grew by more than the thresholds, or widgets or Tcl commands grew at all,
+and prints the source lines holding the growth.
+
+Modal dialogs would block an unattended run, so they are counted instead
+of shown. Tk needs a display: use xvfb-run on a headless machine.
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import tkinter as tk
+
+import loadtest
+import main as gui
+import registry
+
+# Relative frequency of each step
+ACTIONS = {'switch': 40, 'search': 20, 'calculate': 35, 'recall': 5}
+
+# Typed into the quick search one keystroke at a time (synonyms and typos included)
+SEARCH_QUERIES = ('bmi', 'coma', 'creat', 'wells dvt', 'apagr', 'af', 'child dose', 'body surf', 'zzz')
+
+
+def rss_bytes():
+    """Current resident set size, or the peak where /proc is unavailable; None if unknown"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class SoakDriver:
+    """Performs user actions on a QuickMedCalc instance through its widgets"""
+
+    def __init__(self, app, seed=0):
+        self.app = app
+        self.rng = random.Random(seed)
+        self.current = None
+        self.dialogs = []
+        self.counts = dict.fromkeys(ACTIONS, 0)
+        self._actions = list(ACTIONS)
+        self._weights = [ACTIONS[action] for action in self._actions]
+        # messagebox is shared by the whole process; close() puts these back
+        self._patched = {name: getattr(gui.messagebox, name)
+                         for name in ('showerror', 'showinfo', 'showwarning')}
+        for name in self._patched:
+            setattr(gui.messagebox, name, lambda title, message, **options: self.dialogs.append(title))
+
+    def close(self):
+        """Restore the messagebox functions replaced to count dialogs"""
+        for name, original in self._patched.items():
+            setattr(gui.messagebox, name, original)
+        self._patched = {}
+
+    def update(self):
+        self.app.root.update()
+
+    def step(self):
+        action = self.rng.choices(self._actions, self._weights)[0]
+        getattr(self, action)()
+        self.counts[action] += 1
+        self.update()
+
+    def switch(self, calc_key=None):
+        self.current = calc_key or self.rng.choice(list(self.app.calculators))
+        self.app.load_calculator(self.current)
+
+    def search(self):
+        query = self.rng.choice(SEARCH_QUERIES)
+        for length in range(1, len(query) + 1):
+            self.app.search_var.set(query[:length])
+            self.update()
+        self.app.open_top_match()
+        if self.app.visible_calculators:
+            self.current = self.app.visible_calculators[0]
+        self.app.search_var.set('')
+        self.app.filter_calculators()
+
+    def calculate(self):
+        if self.current not in self.app.view_cache:
+            self.switch(self.current)
+        spec = self.app.registry.spec(self.current)
+        frame = self.app.view_cache[self.current].frame
+        widgets = list(gui.iter_widgets(frame))
+        raw = loadtest.random_inputs(self.current, spec, self.rng)
+
+        # Entries are created in input order, one per Number or Autocomplete field
+        typed = [field for field in spec.inputs if isinstance(field, (registry.Number, registry.Autocomplete))]
+        entries = [widget for widget in widgets if isinstance(widget, tk.Entry)]
+        for field, entry in zip(typed, entries):
+            entry.delete(0, 'end')
+            entry.insert(0, str(raw[field.name]))
+
+        groups = {}
+        for widget in widgets:
+            if isinstance(widget, tk.Radiobutton):
+                groups.setdefault(str(widget.cget('variable')), []).append(widget)
+            elif isinstance(widget, tk.Checkbutton) and self.rng.random() < 0.25:
+                widget.invoke()
+        for buttons in groups.values():
+            self.rng.choice(buttons).invoke()
+
+        for widget in widgets:
+            if isinstance(widget, tk.Button) and widget.cget('text') == spec.button_text:
+                widget.invoke()
+                break
+
+    def recall(self):
+        size = self.app.recent_list.size()
+        if not size:
+            return
+        index = self.rng.randrange(size)
+        self.app.recent_list.selection_clear(0, 'end')
+        self.app.recent_list.selection_set(index)
+        self.app.recall_selected()
+        if self.app.session[index].calc_key in self.app.view_cache:
+            self.current = self.app.session[index].calc_key
+
+    def settle(self):
+        """Bring the app to the same state before every sample"""
+        # Let live results settle and save, so no save timer is pending
+        deadline = time.monotonic() + 2 * gui.LIVE_SAVE_DELAY_MS / 1000
+        while self.app.pending_saves and time.monotonic() < deadline:
+            self.update()
+            time.sleep(0.01)
+        for calc_key in self.app.calculators:
+            self.switch(calc_key)
+        self.app.search_var.set('')
+        if self.app.search_after_id is not None:
+            self.app.root.after_cancel(self.app.search_after_id)
+        self.app.filter_calculators()
+        self.update()
+        self.app.store.flush(wait=True)
+        self.update()
+        gc.collect()
+
+
+def sample(app, step, started):
+    traced, _ = tracemalloc.get_traced_memory()
+    return {
+        'step': step,
+        'elapsed_s': time.perf_counter() - started,
+        'rss': rss_bytes(),
+        'traced': traced,
+        'widgets': sum(1 for _ in gui.iter_widgets(app.root)),
+        'tcl_commands': len(app.root.tk.splitlist(app.root.tk.call('info', 'commands'))),
+        'python_objects': len(gc.get_objects()),
+    }
+
+
+def _print_sample(row):
+    rss = f"{row['rss'] / 2 ** 20:.1f}" if row['rss'] is not None else '?'
+    print(f"{row['step']:>8} {row['elapsed_s']:>8.1f} {rss:>9} {row['traced'] / 2 ** 20:>10.2f} "
+          f"{row['widgets']:>8} {row['tcl_commands']:>8} {row['python_objects']:>9}", flush=True)
+
+
+def _snapshot():
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        tracemalloc.Filter(False, '<unknown>'),
+    ))
+
+
+def run(iterations=5000, warmup=500, sample_every=500, view_cache_size=3, keep_view_state=True,
+        live_results=True, seed=0, frames=10, top=10, log=print):
+    """Soak one app instance; returns the report dict (samples, growth, top allocation diffs)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        app = gui.QuickMedCalc(db_path=os.path.join(tmp, 'soak.db'), view_cache_size=view_cache_size,
+                               keep_view_state=keep_view_state, live_results=live_results)
+        driver = SoakDriver(app, seed)
+        tracemalloc.start(frames)
+        try:
+            driver.update()
+            for _ in range(warmup):
+                driver.step()
+            driver.settle()
+            baseline = _snapshot()
+            started = time.perf_counter()
+            samples = [sample(app, 0, started)]
+            log(samples[0])
+            for step in range(1, iterations + 1):
+                driver.step()
+                if step % sample_every == 0 or step == iterations:
+                    driver.settle()
+                    samples.append(sample(app, step, started))
+                    log(samples[-1])
+            final = _snapshot()
+        finally:
+            tracemalloc.stop()
+            driver.close()
+            app.on_close()
+
+    first, last = samples[0], samples[-1]
+    growth = final.compare_to(baseline, 'lineno')
+    tracebacks = final.compare_to(baseline, 'traceback')
+    return {
+        'iterations': iterations,
+        'view_cache_size': view_cache_size,
+        'actions': driver.counts,
+        'dialogs': len(driver.dialogs),
+        'samples': samples,
+        'traced_growth': last['traced'] - first['traced'],
+        'rss_growth': (last['rss'] - first['rss']) if first['rss'] is not None else None,
+        'widget_growth': last['widgets'] - first['widgets'],
+        'tcl_command_growth': last['tcl_commands'] - first['tcl_commands'],
+        'top_growth': [str(stat) for stat in growth[:top] if stat.size_diff > 0],
+        'top_tracebacks': [[str(stat)] + stat.traceback.format()
+                           for stat in tracebacks[:3] if stat.size_diff > 0],
+    }
+
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Soak-test the QuickMed Calc GUI for memory growth")
+    parser.add_argument('--iterations', type=int, default=5000, help="steps after warm-up (default 5000)")
+    parser.add_argument('--warmup', type=int, default=500, help="steps before the baseline (default 500)")
+    parser.add_argument('--sample-every', type=int, default=500, help="steps between samples (default 500)")
+    parser.add_argument('--view-cache-size', type=int, default=3,
+                        help="views kept built; below the calculator count forces rebuilds (default 3)")
+    parser.add_argument('--reset-views', action='store_true', help="reset inputs when returning to a view")
+    parser.add_argument('--no-live', action='store_true', help="leave live results off")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--frames', type=int, default=10, help="traceback depth tracemalloc records")
+    parser.add_argument('--top', type=int, default=10, help="allocation sites to report")
+    parser.add_argument('--max-growth-kb', type=float, default=512,
+                        help="allowed traced memory growth (default 512 KiB)")
+    parser.add_argument('--max-rss-growth-mb', type=float, default=16, help="allowed RSS growth (default 16 MiB)")
+    parser.add_argument('-o', '--output', help="write the report as JSON here")
+    args = parser.parse_args(argv)
+
+    try:
+        tk.Tk().destroy()
+    except tk.TclError as exc:
+        print(f"Cannot start Tk ({exc}); on a headless machine run: xvfb-run -a python src/soak.py",
+              file=sys.stderr)
+        return 2
+
+    print(f"{'step':>8} {'time s':>8} {'rss MiB':>9} {'traced MiB':>10} {'widgets':>8} {'tcl cmds':>8} "
+          f"{'objects':>9}")
+    report = run(args.iterations, args.warmup, max(1, args.sample_every), args.view_cache_size,
+                 not args.reset_views, not args.no_live, args.seed, args.frames, args.top, log=_print_sample)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    print(f"\n{sum(report['actions'].values())} steps: "
+          + ", ".join(f"{count} {action}" for action, count in report['actions'].items())
+          + f"; {report['dialogs']} dialogs")
+    print("Largest growth since the baseline:")
+    for line in report['top_growth'] or ["  (none)"]:
+        print(f"  {line}")
+    for lines in report['top_tracebacks']:
+        print("\n" + "\n".join(lines))
+
+    failures = []
+    if report['traced_growth'] > args.max_growth_kb * 1024:
+        failures.append(f"traced memory grew {report['traced_growth'] / 1024:.0f} KiB")
+    if report['rss_growth'] is not None and report['rss_growth'] > args.max_rss_growth_mb * 2 ** 20:
+        failures.append(f"RSS grew {report['rss_growth'] / 2 ** 20:.1f} MiB")
+    if report['widget_growth'] > 0:
+        failures.append(f"{report['widget_growth']} more widgets")
+    if report['tcl_command_growth'] > 0:
+        failures.append(f"{report['tcl_command_growth']} more Tcl commands")
+    for failure in failures:
+        print(f"LEAK: {failure}", file=sys.stderr)
+    if not failures:
+        print(f"Stable over {args.iterations} steps", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,339 @@
+"""
+QuickMed Calc - Persistence
+A background writer thread that owns the SQLite connection, with a
+write-behind queue for calculation history and patient notes.
+
+The Tk thread never touches the database. It submits inserts and jobs to
+PersistenceWorker and receives completion or error callbacks by calling
+dispatch() from a `root.after` poll, so the mainloop never blocks on disk.
+
+Inserts are buffered on the worker and written together in one transaction
+when the buffer reaches `batch_size` rows or its oldest row is
+`flush_interval` seconds old. The database runs in WAL mode with
+synchronous=NORMAL, so a commit appends to the write-ahead log without an
+fsync; durability is restored at checkpoints and by the flush on shutdown.
+
+Several app instances may share one database file. Every connection waits
+up to BUSY_TIMEOUT_S for a lock, and a batch that still hits "database is
+locked" is retried with exponential backoff (its transaction was rolled
+back, so a retry never duplicates rows). With `writer_socket`, batches are
+instead sent to a single writer process (writer.py), falling back to
+writing directly whenever that process is not reachable. Such batches carry
+an id, recorded in write_batches by the transaction that inserts them, so a
+batch resent after a lost reply is committed only once, by either path.
+"""
+
+import json
+import queue
+import random
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime
+
+import schema
+from metrics import METRICS
+
+DEFAULT_DB_PATH = 'quickmed_data.db'
+
+# calculator_type of free-text notes saved from the notes section
+NOTE_TYPE = 'Manual Note'
+
+# Seconds a connection waits for another writer's lock before failing
+BUSY_TIMEOUT_S = 5.0
+
+# Retries of a locked write, sleeping about RETRY_BASE_DELAY_S * 2 ** attempt
+LOCK_RETRIES = 5
+RETRY_BASE_DELAY_S = 0.05
+
+# Batch ids are kept this long; a resend follows its first attempt within seconds
+BATCH_ID_TTL_S = 24 * 3600
+
+INSERT_SQL = '''
+    INSERT INTO patient_notes (timestamp, ts_epoch, calculator_type, patient_info,
+                               calculation_result, notes, score, category, payload)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def connect(db_path, synchronous='NORMAL', timeout=BUSY_TIMEOUT_S, check_same_thread=True):
+    """Open a connection tuned for many small inserts from several processes"""
+    conn = sqlite3.connect(db_path, timeout=timeout, check_same_thread=check_same_thread)
+    # Takes effect only while the file has no tables, i.e. for new databases;
+    # lets retention (archive.py) shrink the file in small steps
+    conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(f'PRAGMA synchronous={synchronous}')
+    return conn
+
+
+def is_locked(exc):
+    """True for the transient errors raised while another connection holds the lock"""
+    message = str(exc)
+    return isinstance(exc, sqlite3.OperationalError) and ('locked' in message or 'busy' in message)
+
+
+def with_retry(fn, retries=LOCK_RETRIES, base_delay=RETRY_BASE_DELAY_S):
+    """
+    fn(), retried with jittered exponential backoff while the database is locked
+
+    fn must be safe to repeat, e.g. a single transaction.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except sqlite3.OperationalError as exc:
+            if attempt == retries or not is_locked(exc):
+                raise
+            METRICS.inc('db_lock_retries_total')
+            time.sleep(base_delay * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+def insert_batch(conn, rows, batch_id=None):
+    """
+    Insert rows in one transaction; with batch_id, only if that id is new
+
+    Returns the number of rows inserted (0 for a batch committed before).
+    """
+    with conn:
+        if batch_id is not None and not claim_batch(conn, batch_id):
+            return 0
+        conn.executemany(INSERT_SQL, rows)
+    return len(rows)
+
+
+def claim_batch(conn, batch_id):
+    """Record batch_id in the open transaction; False if it was already committed"""
+    return conn.execute('INSERT OR IGNORE INTO write_batches (batch_id, ts_epoch) VALUES (?, ?)',
+                        (batch_id, int(time.time()))).rowcount == 1
+
+
+def timestamp_now():
+    """Current time as (local display text, epoch seconds)"""
+    now = time.time()
+    return datetime.fromtimestamp(now).strftime('%Y-%m-%d %H:%M:%S'), int(now)
+
+
+class _Insert:
+    __slots__ = ('row', 'on_done', 'on_error')
+
+    def __init__(self, row, on_done, on_error):
+        self.row = row
+        self.on_done = on_done
+        self.on_error = on_error
+
+
+class _Job:
+    __slots__ = ('fn', 'on_done', 'on_error')
+
+    def __init__(self, fn, on_done, on_error):
+        self.fn = fn
+        self.on_done = on_done
+        self.on_error = on_error
+
+
+_STOP = object()
+
+
+class PersistenceWorker(threading.Thread):
+    """Background thread that owns the database connection"""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, batch_size=50, flush_interval=2.0,
+                 synchronous='NORMAL', on_error=None, writer_socket=None):
+        """
+        writer_socket: Unix socket of a writer.py process to send inserts to;
+        reads and jobs still use this worker's own connection
+        """
+        super().__init__(name='quickmed-persistence', daemon=True)
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.synchronous = synchronous
+        self.on_error = on_error  # default error callback, run on the dispatching thread
+        self.writer_socket = writer_socket
+        self.conn = None
+        self._writer = None  # (socket, file) while connected to the writer process
+        self._queue = queue.Queue()
+        self.completed = queue.Queue()
+
+    # Called from the submitting (Tk) thread
+
+    def add_calculation(self, calc_type, inputs, result, patient_info="", record=None,
+                        on_done=None, on_error=None):
+        """
+        Queue one calculation for saving
+
+        record: (score, category, payload) from records.make_record, if typed
+        """
+        record = record or (None, None, None)
+        self._queue.put(_Insert(timestamp_now() + (calc_type, patient_info, result, inputs) + record,
+                                on_done, on_error))
+
+    def add_note(self, notes, patient_info="", on_done=None, on_error=None):
+        """Queue a free-text note for saving"""
+        self._queue.put(_Insert(timestamp_now() + (NOTE_TYPE, patient_info, None, notes,
+                                                   None, None, None),
+                                on_done, on_error))
+
+    def submit(self, fn, on_done=None, on_error=None):
+        """Run fn(conn) on the worker after pending inserts are written"""
+        self._queue.put(_Job(fn, on_done, on_error))
+
+    def flush(self, wait=False, timeout=None):
+        """Write buffered inserts now; optionally block until they are committed"""
+        barrier = threading.Event()
+        self._queue.put(barrier)
+        if wait:
+            return barrier.wait(timeout)
+        return True
+
+    def close(self, timeout=10.0):
+        """Flush pending inserts, stop the thread and close the connection"""
+        if self.is_alive():
+            self._queue.put(_STOP)
+            self.join(timeout)
+
+    def dispatch(self, limit=100):
+        """
+        Run completion and error callbacks on the calling thread
+
+        A callback that raises is reported on stderr and counted; the
+        callbacks queued after it still run.
+        """
+        count = 0
+        while count < limit:
+            try:
+                callback, args = self.completed.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args)
+            except Exception:
+                METRICS.inc('callback_errors_total')
+                traceback.print_exc()
+            count += 1
+        return count
+
+    # Worker thread
+
+    def _report(self, callback, *args):
+        if callback is not None:
+            self.completed.put((callback, args))
+
+    def _fail(self, item, exc):
+        self._report(item.on_error or self.on_error, exc)
+
+    def _send(self, rows, batch_id):
+        """
+        Write rows through the writer process; False if it is not reachable
+
+        Once sent, the batch may be committed even if the reply is lost. It
+        is then sent again, or written directly, under the same batch_id,
+        which the database accepts only once.
+        """
+        for _ in range(2):  # reconnect once if the writer was restarted
+            try:
+                if self._writer is None:
+                    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    sock.connect(self.writer_socket)
+                    self._writer = sock, sock.makefile('rwb')
+                stream = self._writer[1]
+                stream.write(json.dumps({'id': batch_id, 'rows': rows}).encode('utf-8') + b'\n')
+                stream.flush()
+                line = stream.readline()
+                if not line.endswith(b'\n'):
+                    raise ConnectionError("writer closed the connection")
+                reply = json.loads(line)
+                ok, error = reply['ok'], reply.get('error')
+            # AttributeError: no AF_UNIX on this platform. A malformed reply
+            # (ValueError, KeyError, TypeError) is treated as a lost one.
+            except (AttributeError, OSError, ValueError, KeyError, TypeError):
+                self._close_writer()
+                continue
+            if not ok:
+                raise sqlite3.OperationalError(error)
+            return True
+        METRICS.inc('writer_fallbacks_total')
+        return False
+
+    def _close_writer(self):
+        if self._writer is not None:
+            for closable in reversed(self._writer):
+                try:
+                    closable.close()
+                except OSError:
+                    pass
+            self._writer = None
+
+    def _write(self, pending):
+        if not pending:
+            return
+        rows = [item.row for item in pending]
+        try:
+            with METRICS.timer('db_write_seconds'):
+                batch_id = uuid.uuid4().hex if self.writer_socket else None
+                if not (batch_id and self._send(rows, batch_id)):
+                    if self.conn is None:
+                        raise sqlite3.OperationalError("database is not available")
+                    with_retry(lambda: insert_batch(self.conn, rows, batch_id))
+        except sqlite3.Error as exc:
+            for item in pending:
+                self._fail(item, exc)
+            return
+        for item in pending:
+            self._report(item.on_done)
+
+    def _run_job(self, job):
+        try:
+            if self.conn is None:
+                raise sqlite3.OperationalError("database is not available")
+            result = job.fn(self.conn)
+        except Exception as exc:
+            self._fail(job, exc)
+            return
+        self._report(job.on_done, result)
+
+    def run(self):
+        try:
+            self.conn = connect(self.db_path, self.synchronous)
+            with_retry(lambda: schema.migrate(self.conn))
+        except sqlite3.Error as exc:
+            self.conn = None
+            self._report(self.on_error, exc)
+
+        pending = []
+        deadline = None
+        while True:
+            timeout = None if not pending else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._write(pending)
+                pending = []
+                continue
+
+            if item is _STOP:
+                break
+            if isinstance(item, _Insert):
+                if not pending:
+                    deadline = time.monotonic() + self.flush_interval
+                pending.append(item)
+                if len(pending) >= self.batch_size:
+                    self._write(pending)
+                    pending = []
+            else:
+                # Jobs and flushes see every insert submitted before them
+                self._write(pending)
+                pending = []
+                if isinstance(item, threading.Event):
+                    item.set()
+                else:
+                    self._run_job(item)
+
+        self._write(pending)
+        self._close_writer()
+        if self.conn is not None:
+            self.conn.close()
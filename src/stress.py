@@ -0,0 +1,150 @@
+"""
+QuickMed Calc - Concurrent Writer Stress Test
+Many processes saving to one database at once; checks that no save is lost.
+
+    python src/stress.py --writers 24 --rows 200
+    python src/stress.py --writers 24 --writer-process   # through writer.py
+    python src/stress.py --writers 24 --legacy           # the old setup, for comparison
+
+Each writer process runs its own PersistenceWorker, like one app instance,
+and saves --rows calculations tagged with its number and a sequence number.
+Afterwards every tag must be in the database exactly once. --legacy writes
+the way the app used to (rollback journal, no busy timeout, no retry) to
+show the "database is locked" failures this replaces. Exits 1 if any save
+was lost or duplicated.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import schema
+import storage
+
+STRESS_TYPE = 'Stress Test'
+
+
+def _tag(writer, seq):
+    return f'stress-{writer}-{seq}'
+
+
+def _legacy_writer(db_path, writer, rows):
+    conn = sqlite3.connect(db_path, timeout=0)
+    errors = []
+    for seq in range(rows):
+        try:
+            with conn:
+                conn.execute(storage.INSERT_SQL, storage.timestamp_now() + (
+                    STRESS_TYPE, _tag(writer, seq), 'ok', f'row {seq}', None, None, None))
+        except sqlite3.Error as exc:
+            errors.append(str(exc))
+    conn.close()
+    return errors
+
+
+def _writer(db_path, writer, rows, batch_size, writer_socket, legacy):
+    """One simulated app instance; returns the error messages its saves reported"""
+    if legacy:
+        return _legacy_writer(db_path, writer, rows)
+    errors = []
+    store = storage.PersistenceWorker(db_path, batch_size=batch_size, flush_interval=0.05,
+                                      on_error=lambda exc: errors.append(str(exc)),
+                                      writer_socket=writer_socket)
+    store.start()
+    for seq in range(rows):
+        store.add_calculation(STRESS_TYPE, f'row {seq}', 'ok', patient_info=_tag(writer, seq))
+    store.close(timeout=None)
+    while store.dispatch():
+        pass
+    return errors
+
+
+def _start_writer_process(db_path, socket_path):
+    import multiprocessing
+    import writer
+
+    process = multiprocessing.Process(target=writer.main, args=(['--db', db_path, '--socket', socket_path],),
+                                      daemon=True)
+    process.start()
+    deadline = time.monotonic() + 10
+    while not os.path.exists(socket_path):
+        if time.monotonic() > deadline or not process.is_alive():
+            raise RuntimeError("writer process did not start")
+        time.sleep(0.05)
+    return process
+
+
+def run(db_path, writers=24, rows=200, batch_size=1, writer_process=False, legacy=False):
+    """Run the stress test against db_path; returns the report dict"""
+    if legacy:
+        conn = sqlite3.connect(db_path)
+        conn.execute('PRAGMA journal_mode=DELETE')
+    else:
+        conn = storage.connect(db_path)
+    schema.migrate(conn)
+    conn.close()
+
+    process = socket_path = None
+    if writer_process:
+        socket_path = os.path.join(os.path.dirname(os.path.abspath(db_path)), 'stress.writer.sock')
+        process = _start_writer_process(db_path, socket_path)
+
+    started = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(writers) as pool:
+            futures = [pool.submit(_writer, db_path, writer, rows, batch_size, socket_path, legacy)
+                       for writer in range(writers)]
+            errors = [message for future in futures for message in future.result()]
+    finally:
+        if process is not None:
+            process.terminate()
+            process.join()
+    elapsed = time.perf_counter() - started
+
+    conn = sqlite3.connect(db_path)
+    saved = [info for (info,) in conn.execute('SELECT patient_info FROM patient_notes WHERE calculator_type = ?',
+                                              (STRESS_TYPE,))]
+    conn.close()
+    expected = {_tag(writer, seq) for writer in range(writers) for seq in range(rows)}
+    found = set(saved)
+    return {
+        'writers': writers,
+        'rows': writers * rows,
+        'elapsed_s': elapsed,
+        'rows_per_s': len(saved) / elapsed,
+        'errors': len(errors),
+        'error_kinds': sorted(set(errors)),
+        'lost': len(expected - found),
+        'duplicated': len(saved) - len(found),
+    }
+
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Stress-test concurrent saves to one database")
+    parser.add_argument('--writers', type=int, default=24, help="concurrent writer processes")
+    parser.add_argument('--rows', type=int, default=200, help="saves per writer")
+    parser.add_argument('--batch-size', type=int, default=1, help="PersistenceWorker batch size")
+    parser.add_argument('--db', help="database to write to (default: a temporary file)")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--writer-process', action='store_true', help="send writes through writer.py")
+    mode.add_argument('--legacy', action='store_true', help="rollback journal, no timeout or retry")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        report = run(args.db or os.path.join(tmp, 'stress.db'), args.writers, args.rows, args.batch_size,
+                     args.writer_process, args.legacy)
+    print(f"{report['writers']} writers, {report['rows']} saves in {report['elapsed_s']:.1f} s "
+          f"({report['rows_per_s']:.0f} rows/s)")
+    print(f"errors reported: {report['errors']}, lost: {report['lost']}, duplicated: {report['duplicated']}")
+    for message in report['error_kinds']:
+        print(f"  {message}")
+    return 1 if report['lost'] or report['duplicated'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""
+QuickMed Calc - Writer Process
+A single local process that performs every write to a shared database.
+
+    python src/writer.py [--db quickmed_data.db] [--socket PATH]
+    python src/main.py --writer-socket PATH
+
+With many app instances on one terminal, each instance writing for itself
+means they queue on SQLite's single write lock. Instead, instances started
+with --writer-socket send their insert batches over a Unix socket to this
+process, which owns the only writing connection and commits whatever batches
+arrived together in one transaction (group commit). A batch is acknowledged
+only after its commit. Instances fall back to writing directly when the
+writer is not running, so it can be started and stopped at any time.
+
+Commits, with their lock waits and retry backoff, run on one worker thread,
+so a contended database never stalls the event loop serving the clients.
+
+Protocol: one JSON object per line. A request {"id": "...", "rows": [[...],
+...]} holds rows in storage.INSERT_SQL column order; the reply is {"ok":
+true, "count": n} or {"ok": false, "error": "..."}. The optional id names
+the batch: one already in write_batches was committed before (its reply
+was lost) and is acknowledged again without inserting its rows. Unix
+sockets only (POSIX).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import schema
+import storage
+
+# Rows committed per transaction at most
+MAX_GROUP_ROWS = 5000
+
+# Seconds between prunes of batch ids older than storage.BATCH_ID_TTL_S
+PRUNE_INTERVAL_S = 600
+
+
+def default_socket_path(db_path):
+    """Socket next to the database, so instances sharing a file find the same writer"""
+    return os.path.abspath(db_path) + '.writer.sock'
+
+
+class GroupWriter:
+    """Commits the batches queued by all clients, several per transaction"""
+
+    def __init__(self, conn):
+        """conn: opened with check_same_thread=False; only the commit thread uses it"""
+        self.conn = conn
+        self.queue = asyncio.Queue()
+        self.committed = 0
+        self.duplicates = 0  # resent batches acknowledged without inserting
+        self._pruned = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    async def write(self, rows, batch_id=None):
+        """Queue rows; returns once they are committed (raises sqlite3.Error if not)"""
+        done = asyncio.get_running_loop().create_future()
+        await self.queue.put((rows, batch_id, done))
+        return await done
+
+    def _insert(self, group):
+        """Commit the group in one transaction; the rows inserted per batch (0 if resent)"""
+        inserted = []
+        with self.conn:
+            for rows, batch_id, _ in group:
+                if batch_id is not None and not storage.claim_batch(self.conn, batch_id):
+                    inserted.append(0)
+                    continue
+                self.conn.executemany(storage.INSERT_SQL, rows)
+                inserted.append(len(rows))
+            if time.monotonic() - self._pruned > PRUNE_INTERVAL_S:
+                self.conn.execute('DELETE FROM write_batches WHERE ts_epoch < ?',
+                                  (int(time.time() - storage.BATCH_ID_TTL_S),))
+                self._pruned = time.monotonic()
+        return inserted
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                group = [await self.queue.get()]
+                count = len(group[0][0])
+                while count < MAX_GROUP_ROWS and not self.queue.empty():
+                    group.append(self.queue.get_nowait())
+                    count += len(group[-1][0])
+                try:
+                    inserted = await loop.run_in_executor(
+                        self._executor, storage.with_retry, lambda: self._insert(group))
+                except sqlite3.Error as exc:
+                    for _, _, done in group:
+                        if not done.done():
+                            done.set_exception(exc)
+                    continue
+                self.committed += sum(inserted)
+                self.duplicates += inserted.count(0)
+                for (rows, _, done), _ in zip(group, inserted):
+                    if not done.done():  # the client may have gone
+                        done.set_result(len(rows))
+        finally:
+            self._executor.shutdown(wait=True)
+
+
+async def _serve_client(group_writer, reader, writer):
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                request = json.loads(line)
+                rows = [tuple(row) for row in request['rows']]
+                if any(len(row) != 9 for row in rows):
+                    raise ValueError("rows must have 9 columns")
+                batch_id = request.get('id')
+                if batch_id is not None and not isinstance(batch_id, str):
+                    raise ValueError("id must be a string")
+                reply = {'ok': True, 'count': await group_writer.write(rows, batch_id)}
+            except (KeyError, TypeError, ValueError, sqlite3.Error) as exc:
+                reply = {'ok': False, 'error': str(exc)}
+            writer.write(json.dumps(reply).encode('utf-8') + b'\n')
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(db_path, socket_path, ready=None):
+    """Serve until cancelled; ready(server) is called once listening"""
+    conn = storage.connect(db_path, check_same_thread=False)
+    storage.with_retry(lambda: schema.migrate(conn))
+    group_writer = GroupWriter(conn)
+    committer = asyncio.ensure_future(group_writer.run())
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)  # left behind by a writer that did not shut down cleanly
+    server = await asyncio.start_unix_server(
+        lambda reader, writer: _serve_client(group_writer, reader, writer), socket_path)
+    if ready is not None:
+        ready(server)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        committer.cancel()
+        try:
+            await committer  # lets a commit in progress finish before closing
+        except asyncio.CancelledError:
+            pass
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        conn.close()
+
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Serialize QuickMed Calc writes through one process")
+    parser.add_argument('--db', default=storage.DEFAULT_DB_PATH, help="database path")
+    parser.add_argument('--socket', help="socket path (default: <database>.writer.sock)")
+    args = parser.parse_args(argv)
+    socket_path = args.socket or default_socket_path(args.db)
+
+    def announce(server):
+        print(f"QuickMed Calc writer for {args.db} on {socket_path}", file=sys.stderr)
+
+    try:
+        asyncio.run(serve(args.db, socket_path, ready=announce))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
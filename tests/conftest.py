@@ -0,0 +1,6 @@
+"""Test setup: the application modules live flat in src/ and import each other by name"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
@@ -0,0 +1,108 @@
+"""Archival round trip: a month moved to its partition reads back unchanged"""
+
+import calendar
+import json
+import os
+import random
+import sqlite3
+
+import pytest
+
+import archive
+import history
+import schema
+import storage
+
+DECEMBER = calendar.timegm((2025, 12, 1, 0, 0, 0))
+JANUARY = calendar.timegm((2026, 1, 1, 0, 0, 0))
+FEBRUARY = calendar.timegm((2026, 2, 1, 0, 0, 0))
+
+
+def _row(rng, ts_epoch):
+    calc_type = rng.choice(['BMI Calculator', 'GCS', 'Manual Note'])
+    payload = json.dumps({'inputs': {'weight': rng.randrange(40, 120), 'height_cm': rng.randrange(150, 200)},
+                          'outputs': {'value': rng.random() * 40, 'category': 'Normal weight'}})
+    notes = rng.choice(['', None, 'ok', 'Café au lait spots; review in 2 weeks ' * rng.randrange(1, 6)])
+    return ('2025-12-01 00:00:00', ts_epoch, calc_type, rng.choice(['Bed 4', 'J. Doe, 67', '']),
+            f'BMI: {rng.random() * 40:.1f} | Category: Normal weight', notes,
+            rng.choice([None, rng.random() * 40]), rng.choice([None, 'Normal weight']), payload)
+
+
+@pytest.fixture
+def conn(tmp_path):
+    rng = random.Random(9)
+    conn = storage.connect(str(tmp_path / 'test.db'))
+    schema.migrate(conn)
+    # December is archived; January stays live
+    rows = [_row(rng, rng.randrange(DECEMBER, JANUARY)) for _ in range(400)]
+    rows += [_row(rng, rng.randrange(JANUARY, FEBRUARY)) for _ in range(150)]
+    rng.shuffle(rows)
+    with conn:
+        conn.executemany(storage.INSERT_SQL, rows)
+    yield conn
+    conn.close()
+
+
+def _all_rows(conn, where=''):
+    return conn.execute(f'SELECT {", ".join(archive.ARCHIVE_COLUMNS)} FROM patient_notes {where} '
+                        'ORDER BY id').fetchall()
+
+
+def _all_history(conn, archive_dir, **filters):
+    rows, cursor = [], None
+    while True:
+        page = archive.query_history_all(conn, archive_dir, cursor=cursor, limit=37, **filters)
+        rows.extend(page.rows)
+        cursor = page.next_cursor
+        if cursor is None:
+            return rows
+
+
+def test_archived_month_reads_back_unchanged(conn, tmp_path):
+    archive_dir = str(tmp_path / 'archive')
+    before = _all_rows(conn)
+    december = [row for row in before if row[2] < JANUARY]
+    history_before = _all_history(conn, archive_dir)
+
+    moved = 0
+    while True:
+        count = archive.archive_chunk(conn, archive_dir, JANUARY, chunk_size=64)
+        if not count:
+            break
+        moved += count
+    assert moved == len(december)
+    assert archive.list_partitions(archive_dir) == [os.path.join(archive_dir, 'notes-2025-12.db')]
+    assert _all_rows(conn) == [row for row in before if row[2] >= JANUARY]
+
+    partition = sqlite3.connect(archive.list_partitions(archive_dir)[0])
+    try:
+        stored = partition.execute(f'SELECT {", ".join(archive.ARCHIVE_COLUMNS)} FROM patient_notes '
+                                   'ORDER BY id').fetchall()
+    finally:
+        partition.close()
+    assert any(isinstance(value, bytes) for row in stored for value in row)  # some text was compressed
+    assert [tuple(archive.unzip_text(value) for value in row) for row in stored] == december
+
+    # Paged history over the live table and the partition is what it was before archiving
+    assert _all_history(conn, archive_dir) == history_before
+    gcs = _all_history(conn, archive_dir, calculator_type='GCS', start=DECEMBER, end=JANUARY)
+    assert gcs == [row for row in history_before if row.calculator_type == 'GCS' and row.ts_epoch < JANUARY]
+    assert len(gcs) == sum(1 for row in december if row[3] == 'GCS')
+
+
+def test_repeated_archiving_does_not_duplicate_rows(conn, tmp_path):
+    archive_dir = str(tmp_path / 'archive')
+    december = _all_rows(conn, f'WHERE ts_epoch < {JANUARY}')
+    archive.apply_retention(conn, archive_dir, retention_days=31, now=FEBRUARY)
+
+    # As if the live delete had been lost after the copy committed
+    with conn:
+        conn.executemany(f'INSERT INTO patient_notes ({", ".join(archive.ARCHIVE_COLUMNS)}) '
+                         f'VALUES ({", ".join("?" * len(archive.ARCHIVE_COLUMNS))})', december)
+    assert archive.apply_retention(conn, archive_dir, retention_days=31, now=FEBRUARY) == len(december)
+
+    archived = [row for row in _all_history(conn, archive_dir) if row.ts_epoch < JANUARY]
+    assert sorted(row.id for row in archived) == [row[0] for row in december]
+    newest_first = sorted(december, key=lambda row: (row[2], row[0]), reverse=True)
+    # ARCHIVE_COLUMNS order is id, timestamp, ts_epoch, ...; history rows swap the two
+    assert archived == [history.HistoryRow(row[0], row[2], row[1], *row[3:7]) for row in newest_first]
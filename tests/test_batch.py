@@ -0,0 +1,57 @@
+"""Vectorized batch scoring: every row matches the scalar engine, or is masked where it raises"""
+
+import math
+
+import pytest
+
+import batch
+import engine
+
+pytest.importorskip('numpy')
+
+WEIGHTS = [70, 82.5, 3.2, 0, -5, math.nan, math.inf, 'n/a']
+HEIGHTS = [175, 160.4, 50, 0, -170, math.nan]
+AGES = [0, 45, 89.5, 139.9, 140, -1, math.nan]
+CREATININES = [1.0, 0.6, 4.2, 0, -1, math.inf]
+SEXES = ['male', 'female', 'Male', ' FEMALE ', 'female ', 'm', '']
+
+
+def _scalar(formula, *args):
+    try:
+        result = formula(*args)
+    except (TypeError, ValueError):
+        return None
+    return result.value, result.category
+
+
+def _check(result, labels, expected):
+    categories = batch.decode(result.codes, labels)
+    for row, scalar in enumerate(expected):
+        if scalar is None:
+            assert not result.valid[row] and math.isnan(result.values[row]), row
+            assert result.codes[row] == batch.INVALID and categories[row] is None, row
+        else:
+            assert result.valid[row], row
+            assert (result.values[row], categories[row] or '') == scalar, row
+
+
+def test_bmi_and_bsa_match_the_scalar_engine():
+    rows = [(weight, height) for weight in WEIGHTS for height in HEIGHTS]
+    weights, heights = zip(*rows)
+    _check(batch.bmi_batch(weights, heights), batch.BMI_LABELS,
+           [_scalar(engine.calculate_bmi, *row) for row in rows])
+    _check(batch.bsa_batch(weights, heights), ('',),
+           [_scalar(engine.calculate_bsa, *row) for row in rows])
+
+
+def test_crcl_matches_the_scalar_engine_including_the_sex_column():
+    rows = [(age, weight, creatinine, sex) for age in AGES for weight in WEIGHTS[:6]
+            for creatinine in CREATININES for sex in SEXES]
+    _check(batch.crcl_batch(*zip(*rows)), batch.CRCL_LABELS,
+           [_scalar(engine.calculate_creatinine, *row) for row in rows])
+
+
+def test_crcl_accepts_a_boolean_sex_column():
+    result = batch.crcl_batch([60, 60], [70, 70], [1.0, 1.0], [False, True])
+    assert result.values.tolist() == [engine.calculate_creatinine(60, 70, 1.0, 'male').value,
+                                      engine.calculate_creatinine(60, 70, 1.0, 'female').value]
@@ -0,0 +1,29 @@
+"""Benchmark comparison: metrics are medians over repeats, so one slow run is not a regression"""
+
+import itertools
+
+import benchmarks
+
+
+def _fake_section(samples):
+    values = itertools.cycle(samples)
+    return lambda quick: {'fake.latency_ms': benchmarks._metric(next(values), 'ms', 'lower')}
+
+
+def test_a_single_slow_run_does_not_move_the_median(monkeypatch):
+    monkeypatch.setitem(benchmarks.BENCHMARKS, 'fake', _fake_section([10.0, 10.4, 30.0]))
+    baseline = {'metrics': {'fake.latency_ms': benchmarks._metric(10.0, 'ms', 'lower')}}
+
+    report = benchmarks.run(['fake'], repeat=3)
+    metric = report['metrics']['fake.latency_ms']
+    assert metric['samples'] == [10.0, 10.4, 30.0]
+    assert metric['value'] == 10.4
+    assert benchmarks.compare(report, baseline) == []
+
+
+def test_a_consistent_slowdown_is_reported(monkeypatch):
+    monkeypatch.setitem(benchmarks.BENCHMARKS, 'fake', _fake_section([13.0, 12.5, 14.0]))
+    baseline = {'metrics': {'fake.latency_ms': benchmarks._metric(10.0, 'ms', 'lower')}}
+
+    report = benchmarks.run(['fake'], repeat=3)
+    assert benchmarks.compare(report, baseline) == [('fake.latency_ms', 10.0, 13.0, 0.3)]
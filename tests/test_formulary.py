@@ -0,0 +1,103 @@
+"""Formulary dosing: cap detection and agreement of the scalar and batch paths"""
+
+import itertools
+import os
+import subprocess
+import sys
+
+import pytest
+
+import formulary
+
+
+def _drug(name='Testdrug', min_per_kg=10, max_per_kg=100, frequencies=(1, 2, 3, 4, 6),
+          max_single_mg=400, max_daily_mg=1200):
+    return formulary.Drug(name, (), float(min_per_kg), float(max_per_kg), tuple(frequencies),
+                          float(min_per_kg), frequencies[0], float(max_single_mg), float(max_daily_mg))
+
+
+def test_reported_example_is_not_capped():
+    dose = formulary.pediatric_dose(39.3, 25, 3, 'Ibuprofen')
+    assert dose.single_dose == pytest.approx(327.5)
+    assert dose.daily_dose == pytest.approx(982.5)
+    assert '(capped)' not in dose.text
+    assert 'CAPPED' not in dose.recommendation
+
+
+@pytest.mark.parametrize('frequency', [3, 4])
+def test_non_terminating_fractions_are_not_capped(frequency):
+    # weight * dose_per_kg / frequency is inexact for these, yet far below both caps
+    ibuprofen = formulary.default_formulary().get('Ibuprofen')
+    for tenths, dose_per_kg in itertools.product(range(20, 400), (20, 25, 30)):
+        weight = tenths / 10
+        requested = weight * dose_per_kg
+        if requested > ibuprofen.max_daily_mg or requested / frequency > ibuprofen.max_single_mg:
+            continue
+        dose = formulary.capped_dose(weight, dose_per_kg, frequency, ibuprofen)
+        assert '(capped)' not in dose.text, (weight, dose_per_kg, frequency)
+
+
+def test_single_and_daily_caps_are_reported():
+    drug = _drug()
+    single_only = formulary.capped_dose(10, 50, 1, drug)      # 500 mg once: single cap binds
+    assert single_only.single_dose == 400 and '(capped)' in single_only.text
+    daily = formulary.capped_dose(40, 50, 4, drug)            # 2000 mg/day: daily cap binds
+    assert daily.daily_dose == 1200 and '(capped)' in daily.text
+    exact = formulary.capped_dose(12, 100, 3, drug)           # exactly at both caps
+    assert exact.daily_dose == 1200 and '(capped)' not in exact.text
+
+
+def test_rejects_dose_and_frequency_outside_entry():
+    with pytest.raises(ValueError):
+        formulary.pediatric_dose(10, 100, 4, 'Paracetamol')
+    with pytest.raises(ValueError):
+        formulary.pediatric_dose(10, 60, 3, 'Paracetamol')
+    with pytest.raises(ValueError):
+        formulary.pediatric_dose(10, 60, 4, 'no such drug')
+
+
+@pytest.mark.parametrize('weight', [float('nan'), float('inf'), 0, -4.2])
+def test_rejects_weight_that_is_not_a_positive_number(weight):
+    # As the uncapped path does: naming a drug must not drop the weight check
+    with pytest.raises(ValueError, match="Weight must be a positive number"):
+        formulary.pediatric_dose(weight, 40, 3, 'Ibuprofen')
+    with pytest.raises(ValueError, match="Weight must be a positive number"):
+        formulary.pediatric_dose(weight, 40, 3)
+
+
+def test_batch_matches_scalar_row_for_row():
+    pytest.importorskip('numpy')
+    table = formulary.Formulary([_drug(), _drug('Other', 5, 40, (1, 2), 250, 500)])
+    rows = []
+    for name, weight, dose_per_kg, frequency in itertools.product(
+            ('Testdrug', 'Other', 'unknown'), (0.7, 3.3, 9.9, 13.1, 39.3, 80, float('nan'), float('inf'), 0, -1), (5, 25, 33.3, 100, 120),
+            (1, 2, 3, 5, 6)):
+        rows.append((name, weight, dose_per_kg, frequency))
+    batch = formulary.dose_batch([row[1] for row in rows], [row[0] for row in rows],
+                                 [row[2] for row in rows], [row[3] for row in rows], table)
+
+    single_capped = 0
+    for i, (name, weight, dose_per_kg, frequency) in enumerate(rows):
+        drug = table.get(name)
+        try:
+            if drug is None:
+                raise ValueError(name)
+            scalar = formulary.capped_dose(weight, dose_per_kg, frequency, drug)
+        except ValueError:
+            assert not batch.valid[i], rows[i]
+            continue
+        assert batch.valid[i], rows[i]
+        assert batch.single[i] == scalar.single_dose, rows[i]
+        assert batch.daily[i] == scalar.daily_dose, rows[i]
+        assert bool(batch.capped[i]) == ('(capped)' in scalar.text), rows[i]
+        requested = weight * dose_per_kg
+        if requested <= drug.max_daily_mg and requested / frequency > drug.max_single_mg:
+            single_capped += 1
+    assert single_capped, "no row exercised the single-dose cap alone"
+
+
+def test_scalar_path_does_not_import_numpy():
+    code = ("import sys, records, formulary; formulary.pediatric_dose(10, 60, 4, 'Paracetamol'); "
+            "sys.exit('numpy' in sys.modules)")
+    result = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(formulary.__file__)))
+    assert result.returncode == 0
@@ -0,0 +1,35 @@
+"""Calculator specs: input validation shared by the GUI, the server and the CSV scorer"""
+
+import pytest
+
+import registry
+
+WEIGHT = registry.Number('weight', "Weight (kg):", 0.2, 650)
+FREQUENCY = registry.Number('frequency', "Frequency (doses per day):", 1, 24, integer=True)
+
+
+@pytest.mark.parametrize('raw', ['nan', 'NaN', ' inf ', '-Infinity', float('nan'), float('inf')])
+def test_number_rejects_non_finite_values(raw):
+    with pytest.raises(ValueError, match="Please enter a valid number for Weight"):
+        WEIGHT.parse(raw)
+
+
+@pytest.mark.parametrize('raw', [float('nan'), float('inf'), 'nan', '2.5'])
+def test_whole_number_rejects_non_finite_and_fractional_values(raw):
+    with pytest.raises(ValueError, match="Please enter a valid"):
+        FREQUENCY.parse(raw)
+
+
+def test_number_accepts_values_within_range():
+    assert WEIGHT.parse(' 70.5 ') == 70.5
+    assert WEIGHT.parse(650) == 650
+    assert FREQUENCY.parse('3') == 3
+    with pytest.raises(ValueError, match="at most 650"):
+        WEIGHT.parse('651')
+
+
+def test_nan_weight_is_rejected_by_every_dosing_path():
+    spec = registry.default_registry().spec('pediatric')
+    for drug in ('', 'Ibuprofen'):
+        with pytest.raises(ValueError, match="valid number"):
+            spec.calculate({'weight': 'nan', 'dose_per_kg': '10', 'frequency': '3', 'drug': drug})
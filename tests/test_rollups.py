@@ -0,0 +1,147 @@
+"""Usage rollups: the trigger-kept counts always equal a GROUP BY over every row saved"""
+
+import os
+import random
+import sqlite3
+
+import pytest
+
+import archive
+import rollups
+import schema
+import storage
+
+NOW = 1767225600  # 2026-01-01 UTC
+DAY = 24 * 60 * 60
+TYPES = {
+    'GCS': ['Severe brain injury', 'Moderate brain injury', 'Mild brain injury'],
+    'CHADS2': ['Low (1.9% annual stroke risk)', 'High (4.5% annual stroke risk)'],
+    'Wells DVT': ['Low (DVT unlikely)', 'High (DVT likely)'],
+    'Manual Note': [None],
+}
+
+# Day, type and category exactly as the rollup triggers key them
+GROUPED = '''
+    SELECT COALESCE(date(ts_epoch, 'unixepoch', 'localtime'), '') AS day,
+           COALESCE(calculator_type, '') AS type, COALESCE(category, '') AS cat,
+           COUNT(*), TOTAL(score)
+    FROM {table} GROUP BY day, type, cat
+'''
+
+
+def _rows(rng, count, days=400):
+    rows = []
+    for _ in range(count):
+        calc_type = rng.choice(list(TYPES))
+        ts_epoch = NOW - rng.randrange(days * DAY)
+        score = None if calc_type == 'Manual Note' else rng.randrange(0, 150) / 10
+        rows.append(('', ts_epoch, calc_type, 'patient', 'result', 'notes', score,
+                     rng.choice(TYPES[calc_type]), None))
+    return rows
+
+
+def _add(totals, groups):
+    for day, calc_type, category, count, score_sum in groups:
+        key = day, calc_type, category
+        old_count, old_sum = totals.get(key, (0, 0.0))
+        totals[key] = (old_count + count, old_sum + score_sum)
+    return totals
+
+
+def _rollup(conn):
+    return {row[:3]: (row[3], pytest.approx(row[4]))
+            for row in conn.execute('SELECT * FROM daily_rollup WHERE count != 0')}
+
+
+def _expected(conn, archive_dir=None, extra_table=None):
+    """GROUP BY over the live rows, plus the archived and the separately kept deleted ones"""
+    totals = _add({}, conn.execute(GROUPED.format(table='patient_notes')))
+    if extra_table:
+        _add(totals, conn.execute(GROUPED.format(table=extra_table)))
+    for path in archive.list_partitions(archive_dir) if archive_dir else []:
+        partition = sqlite3.connect(path)
+        _add(totals, partition.execute(GROUPED.format(table='patient_notes')))
+        partition.close()
+    return {key: (count, score_sum) for key, (count, score_sum) in totals.items()}
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = storage.connect(str(tmp_path / 'test.db'))
+    yield conn
+    conn.close()
+
+
+def _recategorize(conn, rng, fraction=0.2):
+    ids = [row[0] for row in conn.execute('SELECT id FROM patient_notes WHERE calculator_type = ?', ('GCS',))]
+    with conn:
+        conn.executemany('UPDATE patient_notes SET category = ?, score = ? WHERE id = ?',
+                         [(rng.choice(TYPES['GCS']), rng.randrange(3, 16), row_id)
+                          for row_id in rng.sample(ids, int(len(ids) * fraction))])
+
+
+def test_rollups_equal_a_group_by_after_inserts_updates_deletes_and_retention(conn, tmp_path):
+    rng = random.Random(3)
+    schema.migrate(conn)
+    for _ in range(5):
+        with conn:
+            conn.executemany(storage.INSERT_SQL, _rows(rng, 300))
+    _recategorize(conn, rng)
+    assert _rollup(conn) == _expected(conn)
+
+    # Deleted rows keep their counts: compare with the GROUP BY taken over them too
+    with conn:
+        conn.execute('CREATE TEMP TABLE deleted AS SELECT * FROM patient_notes WHERE id % 7 = 0')
+        conn.execute('DELETE FROM patient_notes WHERE id % 7 = 0')
+    archive_dir = os.path.join(str(tmp_path), 'archive')
+    moved = archive.apply_retention(conn, archive_dir, retention_days=180, chunk_size=97, now=NOW)
+    assert moved > 0 and archive.list_partitions(archive_dir)
+    assert conn.execute('SELECT MIN(ts_epoch) FROM patient_notes').fetchone()[0] >= NOW - 180 * DAY
+
+    with conn:
+        conn.executemany(storage.INSERT_SQL, _rows(rng, 200, days=30))
+    _recategorize(conn, rng)
+    assert _rollup(conn) == _expected(conn, archive_dir, 'temp.deleted')
+
+
+def _create_v4(conn, rows):
+    """A database from before the rollups, with history in it"""
+    conn.execute('CREATE TABLE schema_version (version INTEGER NOT NULL)')
+    for version, migration in schema.MIGRATIONS[:4]:
+        migration(conn)
+        conn.execute('INSERT INTO schema_version VALUES (?)', (version,))
+    conn.executemany(storage.INSERT_SQL, rows)
+    conn.commit()
+
+
+def test_interrupted_backfill_resumes_without_double_counting(tmp_path):
+    rng = random.Random(5)
+    path = str(tmp_path / 'test.db')
+    conn = storage.connect(path)
+    _create_v4(conn, _rows(rng, 500))
+    schema.migrate(conn)
+    assert rollups.backfill_remaining(conn) == 500
+
+    with conn:
+        conn.executemany(storage.INSERT_SQL, _rows(rng, 50, days=10))  # counted by the trigger
+    assert rollups.backfill_step(conn, chunk_size=120) == 380
+    _recategorize(conn, rng)  # rows both counted and not yet counted move category
+
+    # A crash after counting a chunk but before recording progress
+    conn.execute('''CREATE TEMP TRIGGER crash BEFORE UPDATE ON rollup_backfill
+                    BEGIN SELECT RAISE(ABORT, 'interrupted'); END''')
+    with pytest.raises(sqlite3.IntegrityError, match='interrupted'):
+        rollups.backfill_step(conn, chunk_size=120)
+    conn.close()
+
+    conn = storage.connect(path)
+    try:
+        assert rollups.backfill_remaining(conn) == 380
+        steps = 0
+        while rollups.backfill_step(conn, chunk_size=120):
+            steps += 1
+        assert steps == 3
+        assert rollups.backfill_step(conn) == 0  # a finished backfill adds nothing
+        assert _rollup(conn) == _expected(conn)
+    finally:
+        conn.close()
@@ -0,0 +1,80 @@
+"""Schema migrations: upgrading a version 1 database keeps its rows, and is idempotent"""
+
+import sqlite3
+import time
+
+import pytest
+
+import schema
+
+V1_NOTES = [
+    ('2024-03-05 09:15:00', 'BMI Calculator', 'Bed 4', 'BMI: 22.9 | Category: Normal weight', ''),
+    ('2024-07-21 14:02:33', 'Manual Note', 'J. Doe, 67', '', 'Café visit; renal function reviewed'),
+    ('2025-01-10 23:59:59', 'GCS', None, 'GCS: 15/15', None),
+]
+V1_FAVORITES = ['BMI Calculator', 'GCS']
+
+
+def _local_epoch(timestamp):
+    return int(time.mktime(time.strptime(timestamp, '%Y-%m-%d %H:%M:%S')))
+
+
+@pytest.fixture(params=['unversioned', 'versioned'])
+def v1_db(request, tmp_path):
+    """A database as version 1 of the app left it; the oldest builds had no schema_version"""
+    path = str(tmp_path / 'v1.db')
+    conn = sqlite3.connect(path)
+    schema._create_base_tables(conn)
+    conn.executemany('INSERT INTO patient_notes (timestamp, calculator_type, patient_info, '
+                     'calculation_result, notes) VALUES (?, ?, ?, ?, ?)', V1_NOTES)
+    conn.executemany('INSERT INTO favorites (calculator_name) VALUES (?)', [(name,) for name in V1_FAVORITES])
+    if request.param == 'versioned':
+        conn.execute('CREATE TABLE schema_version (version INTEGER NOT NULL)')
+        conn.execute('INSERT INTO schema_version VALUES (1)')
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_migrating_twice_upgrades_once_and_keeps_every_row(v1_db):
+    schema.migrate(v1_db)
+    schema.migrate(v1_db)
+
+    versions = [row[0] for row in v1_db.execute('SELECT version FROM schema_version ORDER BY version')]
+    assert versions == [version for version, _ in schema.MIGRATIONS]
+    assert schema.current_version(v1_db) == schema.SCHEMA_VERSION
+
+    rows = v1_db.execute('SELECT timestamp, calculator_type, patient_info, calculation_result, notes, '
+                         'ts_epoch, score, category, payload FROM patient_notes ORDER BY id').fetchall()
+    assert [row[:5] for row in rows] == V1_NOTES
+    # Version 2 backfills the epoch from the local timestamp text
+    assert [row[5] for row in rows] == [_local_epoch(note[0]) for note in V1_NOTES]
+    # Version 3 columns stay empty until records.backfill parses the text
+    assert [row[6:] for row in rows] == [(None, None, None)] * len(V1_NOTES)
+    assert [row[0] for row in v1_db.execute('SELECT calculator_name FROM favorites ORDER BY id')] == V1_FAVORITES
+
+
+def test_migrated_rows_are_indexed_and_queued_for_the_rollup_backfill(v1_db):
+    schema.migrate(v1_db)
+    schema.migrate(v1_db)
+
+    if v1_db.execute("SELECT 1 FROM sqlite_master WHERE name = 'notes_fts'").fetchone():
+        matches = v1_db.execute("SELECT rowid FROM notes_fts WHERE notes_fts MATCH 'cafe'").fetchall()
+        assert matches == [(2,)]
+
+    # Rows older than the rollup triggers are counted by rollups.backfill_step, once
+    assert v1_db.execute('SELECT done_id, end_id FROM rollup_backfill').fetchall() == [(0, len(V1_NOTES))]
+    assert v1_db.execute('SELECT COUNT(*) FROM daily_rollup').fetchone()[0] == 0
+    assert v1_db.execute('SELECT COUNT(*) FROM write_batches').fetchone()[0] == 0
+
+
+def test_rows_saved_after_migrating_use_the_new_columns(v1_db):
+    schema.migrate(v1_db)
+    v1_db.execute("INSERT INTO patient_notes (timestamp, ts_epoch, calculator_type, score, category) "
+                  "VALUES ('2025-02-01 08:00:00', ?, 'BMI Calculator', 31.2, 'Obese')",
+                  (_local_epoch('2025-02-01 08:00:00'),))
+    schema.migrate(v1_db)
+
+    assert v1_db.execute('SELECT COUNT(*) FROM patient_notes').fetchone()[0] == len(V1_NOTES) + 1
+    assert v1_db.execute('SELECT day, calculator_type, category, count FROM daily_rollup').fetchall() == \
+        [('2025-02-01', 'BMI Calculator', 'Obese', 1)]
@@ -0,0 +1,111 @@
+"""CSV batch scorer: vectorized chunks match the per-row spec path"""
+
+import csv
+import json
+import random
+
+import pytest
+
+import score_csv
+
+pytest.importorskip('numpy')
+
+MAPPING = {
+    'passthrough': ['mrn'],
+    'scores': [
+        {'calculator': 'bmi', 'columns': {'weight': 'wt', 'height_cm': 'ht'}},
+        {'calculator': 'bsa', 'columns': {'weight': 'wt', 'height_cm': 'ht'}},
+        {'calculator': 'creatinine', 'prefix': 'crcl',
+         'columns': {'age': 'age', 'weight': 'wt', 'creatinine': 'scr', 'gender': 'sex'},
+         'values': {'gender': {'M': 'male', 'F': 'female'}}},
+        {'calculator': 'gcs'},
+        {'calculator': 'wells', 'columns': {'criteria': [f'w{i}' for i in range(10)]}},
+        {'calculator': 'apgar', 'columns': {'scores': [f'a{i}' for i in range(5)]}},
+        {'calculator': 'chads2', 'columns': {'criteria': [f'c{i}' for i in range(5)]}},
+        {'calculator': 'pediatric', 'columns': {'weight': 'wt', 'dose_per_kg': 'dpk', 'frequency': 'freq'}},
+    ],
+}
+
+HEADER = (['mrn', 'wt', 'ht', 'age', 'scr', 'sex', 'eye', 'verbal', 'motor', 'dpk', 'freq']
+          + [f'w{i}' for i in range(10)] + [f'a{i}' for i in range(5)] + [f'c{i}' for i in range(5)])
+
+
+def _random_row(rng, number):
+    def pick(*cells):
+        return rng.choice(cells)
+
+    def number_cell(low, high):
+        # Mostly valid, with the cells a real extract holds: blanks, junk, out of range
+        return pick(f'{rng.uniform(low, high):.2f}', f'{rng.uniform(low, high):.2f}', f'{rng.uniform(low, high):.2f}',
+                    '', ' ', 'n/a', '-1', '0', str(high * 10), '1e2', ' 70 ', 'nan', 'inf')
+
+    row = [str(number), number_cell(1, 200), number_cell(40, 210), number_cell(0, 120),
+           number_cell(0.2, 8), pick('M', 'F', 'male', 'female', 'Male', '', 'x'),
+           pick('1', '2', '3', '4', '4', '0', '5', '', 'x', '4.0'),
+           pick('1', '2', '3', '4', '5', '0', ''), pick('1', '2', '3', '4', '5', '6', '7', ''),
+           number_cell(0.01, 50), pick('1', '2', '3', '4', '24', '0', '2.5', '')]
+    row += [pick('1', '0', 'y', 'N', 'Yes', 'false', ' true ', '', '2', 'maybe') for _ in range(10)]
+    row += [pick('0', '1', '2', '2', '3', '', 'x') for _ in range(5)]
+    row += [pick('1', '0', 'T', 'f', '', '?') for _ in range(5)]
+    if rng.random() < 0.02:
+        row = row[:rng.randrange(len(row))]  # truncated line
+    return row
+
+
+def test_vectorized_chunks_match_per_row_scoring():
+    rng = random.Random(7)
+    rows = [_random_row(rng, number) for number in range(3000)]
+    plan = score_csv._Plan(MAPPING, HEADER)
+    assert [scorer.vectorized is not None for scorer in plan.scorers] == [True] * 7 + [False]
+
+    expected = [[row[0] if row else ''] + [cell for scorer in plan.scorers for cell in scorer.score(row)]
+                for row in rows]
+    scored = plan.score_rows(rows)
+    assert scored == expected
+    for column in range(1, len(plan.header)):
+        # Same Python types too, so the CSV text is identical
+        assert [type(row[column]) for row in scored] == [type(row[column]) for row in expected]
+    assert any(row[3] == '' for row in scored) and any(row[3] for row in scored)
+
+
+def test_score_file_writes_the_same_csv_with_one_or_more_workers(tmp_path):
+    rng = random.Random(11)
+    source = tmp_path / 'cohort.csv'
+    with open(source, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        writer.writerows(_random_row(rng, number) for number in range(500))
+
+    outputs = []
+    for workers in (1, 2):
+        target = tmp_path / f'scored_{workers}.csv'
+        score_csv.score_file(str(source), str(target), MAPPING, workers=workers, chunk_size=64)
+        outputs.append(target.read_text(encoding='utf-8'))
+    assert outputs[0] == outputs[1]
+
+
+@pytest.mark.parametrize('mapping, message', [
+    ({'scores': [{'calculator': 'bmi', 'columns': {'weight': 'missing'}}]}, "not found: missing"),
+    ({'scores': [{'calculator': 'nope'}]}, "Unknown calculator"),
+    ({'passthrough': ['weight']}, "missing key 'scores'"),
+    ({'scores': [{'columns': {}}]}, "missing key 'calculator'"),
+])
+def test_bad_mapping_is_reported_as_such(tmp_path, capsys, mapping, message):
+    source = tmp_path / 'in.csv'
+    source.write_text('weight,height_cm\n70,175\n', encoding='utf-8')
+    config = tmp_path / 'mapping.json'
+    config.write_text(json.dumps(mapping), encoding='utf-8')
+    with pytest.raises(SystemExit) as exit_info:
+        score_csv.main([str(source), str(tmp_path / 'out.csv'), '--config', str(config), '--workers', '1'])
+    assert exit_info.value.code == 2
+    err = capsys.readouterr().err
+    assert "Invalid column mapping" in err and message in err
+
+
+def test_other_errors_are_not_reported_as_a_bad_mapping(tmp_path):
+    config = tmp_path / 'mapping.json'
+    config.write_text(json.dumps({'scores': [{'calculator': 'bmi'}]}), encoding='utf-8')
+    source = tmp_path / 'in.csv'
+    source.write_bytes(b'weight,height_cm\n70,175\n' * 10 + b'\xff\xfe,180\n')  # not UTF-8
+    with pytest.raises(UnicodeDecodeError):
+        score_csv.main([str(source), str(tmp_path / 'out.csv'), '--config', str(config), '--workers', '1'])
@@ -0,0 +1,51 @@
+"""Lookup-table scores: every key matches engine.py, and bad components are rejected or masked"""
+
+import math
+
+import pytest
+
+import engine
+import score_tables
+
+TABLES = [score_tables.GCS, score_tables.WELLS, score_tables.APGAR, score_tables.CHADS2]
+
+
+@pytest.mark.parametrize('table', TABLES, ids=lambda table: table.name)
+def test_every_key_round_trips_and_matches_the_engine(table):
+    formula = {'GCS': lambda c: engine.calculate_gcs(*c), 'Wells': engine.calculate_wells,
+               'APGAR': engine.calculate_apgar, 'CHADS₂': engine.calculate_chads2}[table.name]
+    for key in range(table.size):
+        components = table.decode(key)
+        assert table.encode(components) == key
+        assert table.lookup(key) == formula(components)
+
+
+@pytest.mark.parametrize('eye', [4.9, 3.5, math.nan, math.inf, None, 'four'])
+def test_encode_rejects_components_that_are_not_whole_numbers(eye):
+    with pytest.raises(ValueError, match="not a whole number"):
+        score_tables.GCS.score((eye, 5, 6))
+
+
+def test_encode_accepts_integral_values_of_any_numeric_type():
+    assert score_tables.GCS.score((4.0, 5, 6)) == engine.calculate_gcs(4, 5, 6)
+    assert score_tables.CHADS2.score((True, False, 1, 0, 1)) == engine.calculate_chads2([1, 0, 1, 0, 1])
+    with pytest.raises(ValueError, match="out of range"):
+        score_tables.GCS.score((5, 5, 6))
+
+
+def test_encode_columns_masks_the_rows_encode_rejects():
+    np = pytest.importorskip('numpy')
+    eye = [4, 4.9, math.nan, 0, 5, 1.0, math.inf, 3]
+    keys = score_tables.GCS.encode_columns(eye, [5] * len(eye), [6] * len(eye))
+    for value, key in zip(eye, keys.tolist()):
+        try:
+            expected = score_tables.GCS.encode((value, 5, 6))
+        except ValueError:
+            expected = score_tables.INVALID
+        assert key == expected, value
+
+    result = score_tables.GCS.bulk(keys)
+    assert result.valid.tolist() == [key != score_tables.INVALID for key in keys.tolist()]
+    assert np.isnan(result.values[~result.valid]).all()
+    assert result.values[result.valid].tolist() == [score_tables.GCS.lookup(key).value
+                                                    for key in keys.tolist() if key >= 0]
@@ -0,0 +1,101 @@
+"""Scoring service: malformed requests get an HTTP response, never a dropped connection"""
+
+import asyncio
+import json
+from http import HTTPStatus
+
+import pytest
+
+import server
+
+
+@pytest.fixture(scope='module')
+def service():
+    return server.ScoringService()
+
+
+def _send(service, request):
+    """Send raw request bytes over a real socket; returns (status, JSON body)"""
+    async def run():
+        ready = asyncio.get_running_loop().create_future()
+        task = asyncio.ensure_future(server.serve(service, port=0, ready=ready.set_result))
+        listening = await ready
+        port = listening.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(request)
+        response = await reader.read()
+        writer.close()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return response
+
+    response = asyncio.run(run())
+    head, _, body = response.partition(b'\r\n\r\n')
+    assert head, "connection closed without a response"
+    return int(head.split(b' ')[1]), json.loads(body)
+
+
+def _exchange(service, method, path, payload):
+    body = json.dumps(payload).encode('utf-8')
+    return _send(service, f'{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\n'
+                          f'Connection: close\r\n\r\n'.encode('latin-1') + body)
+
+
+@pytest.mark.parametrize('calculator', [['bmi'], {'key': 'bmi'}, 7, None, True])
+def test_malformed_batch_items_get_error_entries(service, calculator):
+    results = service.score_batch([{'calculator': calculator, 'inputs': {}},
+                                   'not an object',
+                                   {'calculator': 'bmi', 'inputs': {'weight': 70, 'height_cm': 175}}])
+    assert 'error' in results[0]
+    assert 'error' in results[1]
+    assert results[2]['outputs']['category'] == 'Normal weight'
+
+
+def test_non_string_key_is_a_bad_request(service):
+    with pytest.raises(server.RequestError) as raised:
+        service.score(['bmi'], {})
+    assert raised.value.status == HTTPStatus.BAD_REQUEST
+
+
+def test_malformed_batch_over_http(service):
+    status, body = _exchange(service, 'POST', '/batch', {'requests': [{'calculator': ['bmi']}]})
+    assert status == 200
+    assert body['results'][0]['error'] == "calculator must be a string"
+
+
+def test_unexpected_error_returns_500():
+    class Broken(server.ScoringService):
+        def handle(self, method, path, body):
+            raise KeyError('boom')
+
+    status, body = _exchange(Broken(), 'GET', '/health', {})
+    assert status == 500
+    assert body == {'error': "Internal server error"}
+
+
+def test_negative_content_length_is_a_bad_request(service):
+    status, body = _send(service, b'POST /batch HTTP/1.1\r\nContent-Length: -5\r\n\r\n')
+    assert status == 400
+    assert body == {'error': "Invalid Content-Length"}
+
+
+def test_non_finite_result_is_never_sent_as_json():
+    class NotANumber(server.ScoringService):
+        def handle(self, method, path, body):
+            return HTTPStatus.OK, {'value': float('nan')}
+
+    # json.loads would accept a bare NaN token; the 500 body is strict JSON
+    status, body = _exchange(NotANumber(), 'GET', '/health', {})
+    assert status == 500
+    assert body == {'error': "Internal server error"}
+
+
+@pytest.mark.parametrize('drug', ['', 'Ibuprofen'])
+def test_nan_weight_is_rejected(service, drug):
+    status, body = _exchange(service, 'POST', '/calculators/pediatric',
+                             {'inputs': {'weight': 'nan', 'dose_per_kg': 40, 'frequency': 3, 'drug': drug}})
+    assert status == 400
+    assert "valid number" in body['error']
@@ -0,0 +1,20 @@
+"""PersistenceWorker callbacks: a failing callback does not starve the rest"""
+
+import storage
+
+
+def test_dispatch_runs_callbacks_after_one_that_raises(tmp_path, capsys):
+    store = storage.PersistenceWorker(str(tmp_path / 'test.db'), batch_size=1, flush_interval=0.01)
+    store.start()
+    done = []
+
+    def broken():
+        raise RuntimeError("callback failed")
+
+    store.add_note("first", on_done=broken)
+    store.add_note("second", on_done=lambda: done.append('second'))
+    store.flush(wait=True)
+    assert store.dispatch() == 2
+    assert done == ['second']
+    assert "callback failed" in capsys.readouterr().err
+    store.close()
@@ -0,0 +1,128 @@
+"""Writer process: a batch whose reply is lost is committed exactly once"""
+
+import asyncio
+import json
+import socket
+import sqlite3
+import threading
+
+import pytest
+
+import schema
+import storage
+import writer
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="Unix sockets only")
+
+
+class KilledAfterCommit:
+    """
+    A writer that commits the first batch, then dies before replying
+
+    With restart, later connections are served by the real writer again;
+    without, the socket is gone and clients fall back to writing directly.
+    reply: what it writes before dying, e.g. half a reply line
+    """
+
+    def __init__(self, db_path, socket_path, restart, reply=b''):
+        self.socket_path = socket_path
+        self.restart = restart
+        self.reply = reply
+        self.conn = storage.connect(db_path, check_same_thread=False)
+        schema.migrate(self.conn)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.killed = False
+
+    def start(self):
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self.loop).result(5)
+
+    async def _start(self):
+        self.group_writer = writer.GroupWriter(self.conn)
+        self.committer = asyncio.ensure_future(self.group_writer.run())
+        self.server = await asyncio.start_unix_server(self._handle, self.socket_path)
+
+    async def _handle(self, reader, stream):
+        if self.killed:
+            return await writer._serve_client(self.group_writer, reader, stream)
+        self.killed = True
+        request = json.loads(await reader.readline())
+        await self.group_writer.write([tuple(row) for row in request['rows']], request['id'])
+        if not self.restart:
+            self.server.close()  # stops listening: reconnecting fails
+        stream.write(self.reply)
+        await stream.drain()
+        stream.close()
+
+    def stop(self):
+        async def _stop():
+            self.server.close()
+            self.committer.cancel()
+            try:
+                await self.committer
+            except asyncio.CancelledError:
+                pass
+
+        asyncio.run_coroutine_threadsafe(_stop(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+        self.loop.close()
+        self.conn.close()
+
+
+@pytest.mark.parametrize('reply', [b'', b'{"ok": tr', b'not json\n', b'[]\n', b'{}\n'],
+                         ids=['none', 'truncated', 'garbage', 'not-an-object', 'no-ok'])
+@pytest.mark.parametrize('restart', [True, False], ids=['resent', 'fallback'])
+def test_batch_committed_before_a_lost_reply_is_not_duplicated(tmp_path, restart, reply):
+    db_path = str(tmp_path / 'test.db')
+    fake = KilledAfterCommit(db_path, str(tmp_path / 'writer.sock'), restart, reply)
+    fake.start()
+    errors = []
+    store = storage.PersistenceWorker(db_path, batch_size=3, flush_interval=10,
+                                      on_error=errors.append, writer_socket=fake.socket_path)
+    store.start()
+    try:
+        for number in range(3):
+            store.add_note(f"note {number}")
+        # A persistence thread killed by the reply would never reach the barrier
+        assert store.flush(wait=True, timeout=10)
+    finally:
+        store.close()
+        fake.stop()
+
+    assert errors == []
+    assert not store.is_alive()  # stopped by close(), not by an exception
+    assert fake.group_writer.committed == 3
+    assert fake.group_writer.duplicates == (1 if restart else 0)
+    conn = sqlite3.connect(db_path)
+    notes = [row[0] for row in conn.execute('SELECT notes FROM patient_notes ORDER BY id')]
+    batches = conn.execute('SELECT COUNT(*) FROM write_batches').fetchone()[0]
+    conn.close()
+    assert notes == ["note 0", "note 1", "note 2"]
+    assert batches == 1
+
+
+def test_group_writer_acknowledges_a_resent_batch_without_inserting(tmp_path):
+    conn = storage.connect(str(tmp_path / 'test.db'), check_same_thread=False)
+    schema.migrate(conn)
+    row = ('2026-01-01 00:00:00', 0, storage.NOTE_TYPE, '', '', 'note', None, None, None)
+
+    async def scenario():
+        group_writer = writer.GroupWriter(conn)
+        committer = asyncio.ensure_future(group_writer.run())
+        counts = [await group_writer.write([row, row], 'batch-1'),
+                  await group_writer.write([row, row], 'batch-1'),
+                  await group_writer.write([row])]
+        committer.cancel()
+        try:
+            await committer
+        except asyncio.CancelledError:
+            pass
+        return counts, group_writer
+
+    counts, group_writer = asyncio.run(scenario())
+    assert counts == [2, 2, 1]
+    assert (group_writer.committed, group_writer.duplicates) == (3, 1)
+    assert conn.execute('SELECT COUNT(*) FROM patient_notes').fetchone()[0] == 3
+    conn.close()